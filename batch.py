@@ -0,0 +1,243 @@
+#  Symulacje wsadowe bez okna (bez ursina). Uruchomienie:
+#       python batch.py scenariusze.json [--output katalog] [--workers N] [opcje]    (python batch.py -h)
+#
+#  Plik scenariuszy (JSON) to lista scenariuszy albo słownik {"defaults": {...}, "scenarios": [...]}, gdzie
+#  "defaults" to wartości wspólne dla wszystkich scenariuszy. Klucze scenariusza:
+#       name             nazwa scenariusza i jego katalogu wyników (domyślnie scenario-<numer>)
+#       heightmap        ścieżka mapy wysokości (względna - względem katalogu pliku scenariuszy)
+#       height           wysokość basenu
+#       storage          tryb przechowywania wypełnienia basenu (domyślnie 'arrays')
+#       engine           silnik rozchodzenia się dźwięku (domyślnie 'wavefront')
+#       enhanced_realism tryb realizmu silnika 'curve' (domyślnie true)
+#       downsample       współczynnik zgrubnej siatki (domyślnie 1)
+#       line_of_sight    odległość w linii prostej dla sześcianów widocznych ze źródła (silnik 'curve', domyślnie false)
+#       sound_intensity  natężenie dźwięku źródła (domyślnie 1000)
+#       source           współrzędne źródła dźwięku [x, y] albo [x, y, z]; null - losowe
+#       submarines       lista współrzędnych łodzi podwodnych [x, y] albo [x, y, z] albo liczba łodzi na losowych
+#                        współrzędnych (domyślnie 1)
+#       max_steps        maksymalna liczba ruchów łodzi (domyślnie null - do dopłynięcia)
+#       seed             ziarno losowania współrzędnych (domyślnie numer scenariusza)
+#       sweep            słownik {klucz: [wartości, ...]} - scenariusz rozwija się w iloczyn kartezjański wartości
+#
+#  Przykład:
+#       {"defaults": {"heightmap": "Heightmaps/heightmap15.jpg", "height": 70, "engine": "wavefront"},
+#        "scenarios": [{"name": "corner", "source": [3, 4], "submarines": [[0, 0, 69], [14, 14, 60]]},
+#                      {"name": "sweep", "submarines": 16, "sweep": {"source": [[1, 1], [7, 7], [13, 2]]}}]}
+#
+#  Wyniki każdego scenariusza zapisują się w katalogu <output>/<name>/: field.npy - pole natężeń dźwięku [z, y, x]
+#  (NaN dla niezdefiniowanych), trajectories.npz - trajektorie łodzi ('trajectories' (T, N, 3), 'arrival_steps' (N))
+#  w formacie Fleet().move(), result.json - parametry, współrzędne źródła, czasy faz. Podsumowania wszystkich
+#  scenariuszy trafiają dodatkowo do <output>/results.jsonl (w kolejności ukończenia).
+
+import os
+import json
+import random
+import argparse
+import traceback
+from itertools import product
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULTS = {'storage': 'arrays',
+            'engine': 'wavefront',
+            'enhanced_realism': True,
+            'downsample': 1,
+            'line_of_sight': False,
+            'sound_intensity': 1000,
+            'source': None,
+            'submarines': 1,
+            'max_steps': None}
+
+
+def load_scenarios(path):
+    """ Wczytuje plik scenariuszy i rozwija go w listę pełnych opisów scenariuszy.
+
+    Args:
+        path (str): ścieżka pliku scenariuszy (JSON).
+
+    Returns:
+        list: lista słowników - scenariuszy z uzupełnionymi wartościami domyślnymi, rozwiniętym kluczem 'sweep',
+            unikalną nazwą ('name'), ziarnem ('seed') i bezwzględną ścieżką mapy wysokości.
+
+    Raises:
+        ValueError: jeżeli scenariusz nie podaje mapy wysokości lub wysokości basenu albo nazwy się powtarzają.
+
+    """
+
+    with open(path, encoding='utf-8') as file:
+        document = json.load(file)
+    if isinstance(document, list):
+        document = {'scenarios': document}
+    defaults = dict(DEFAULTS, **document.get('defaults', {}))
+    base = os.path.dirname(os.path.abspath(path))
+
+    scenarios = []
+    for number, entry in enumerate(document['scenarios']):
+        entry = dict(defaults, **entry)
+        entry.setdefault('name', 'scenario-{}'.format(number))
+        sweep = entry.pop('sweep', None) or {}
+        keys = sorted(sweep)
+        for values in product(*(sweep[key] for key in keys)):
+            scenario = dict(entry, **dict(zip(keys, values)))
+            if keys:
+                scenario['name'] = entry['name'] + '-' + '-'.join(
+                    '{}={}'.format(key, 'x'.join(str(item) for item in value) if isinstance(value, list) else value)
+                    for key, value in zip(keys, values))
+            scenarios.append(scenario)
+
+    for number, scenario in enumerate(scenarios):
+        assert 'heightmap' in scenario and 'height' in scenario, \
+            ValueError('Scenario ' + scenario['name'] + ' must define heightmap and height.')
+        scenario['heightmap'] = os.path.join(base, scenario['heightmap'])
+        scenario.setdefault('seed', number)
+    names = [scenario['name'] for scenario in scenarios]
+    assert len(set(names)) == len(names), ValueError('Scenario names must be unique.')
+    return scenarios
+
+
+def run_scenario(scenario, output, save_field=True, cache_directory=None):
+    """ Wykonuje jeden scenariusz: buduje basen, dodaje źródło dźwięku, przemieszcza łodzie podwodne do źródła
+    i zapisuje wyniki do katalogu <output>/<name>/.
+
+    Note:
+        Funkcja uruchamia się w procesach pobocznych, dlatego przyjmuje i zwraca tylko proste typy.
+
+    Args:
+        scenario (dict): opis scenariusza (patrz load_scenarios()).
+        output (str): katalog wyników.
+        save_field (bool): jeżeli False - pole natężeń dźwięku nie zapisuje się (tylko trajektorie i podsumowanie).
+        cache_directory (str|None): katalog trwałej pamięci podręcznej pól (FieldCache); None - bez niej.
+
+    Returns:
+        dict: podsumowanie scenariusza (zawartość result.json); przy błędzie - z kluczem 'error'.
+
+    """
+
+    import numpy as np
+    from classes import Pool, Fleet, Submarine
+    from field_cache import FieldCache
+    from instrumentation import Profiler
+
+    directory = os.path.join(output, scenario['name'])
+    os.makedirs(directory, exist_ok=True)
+    result = {'scenario': scenario}
+    start = perf_counter()
+    try:
+        random.seed(scenario['seed'])  # współrzędne losowe (źródło, łodzie bez z) są powtarzalne
+        with Profiler() as profiler:
+            pool = Pool(scenario['height'], scenario['heightmap'], storage=scenario['storage'])
+            source = scenario['source'] or [None, None, None]
+            pool.add_sound_source(scenario['sound_intensity'], *source, enhanced_realism=scenario['enhanced_realism'],
+                                  engine=scenario['engine'], downsample=scenario['downsample'],
+                                  cache=FieldCache(cache_directory) if cache_directory else None,
+                                  line_of_sight=scenario['line_of_sight'])
+
+            if isinstance(scenario['submarines'], int):
+                fleet = Fleet.random(pool, scenario['submarines'], scenario['seed'])
+            else:
+                starts = []
+                for position in scenario['submarines']:
+                    submarine = Submarine(pool, *position)  # brakujące z wyznacza się tak jak w Submarine()
+                    starts.append((submarine.x_position, submarine.y_position, submarine.z_position))
+                fleet = Fleet(pool, starts)
+            trajectories, arrival_steps = fleet.move(scenario['max_steps'])
+
+        if save_field:
+            np.save(os.path.join(directory, 'field.npy'), pool.sound_field())
+        np.savez_compressed(os.path.join(directory, 'trajectories.npz'), trajectories=trajectories,
+                            arrival_steps=arrival_steps)
+        result.update({'sound_source': [pool.sound_source.x_position, pool.sound_source.y_position,
+                                        pool.sound_source.z_position],
+                       'submarines': len(arrival_steps),
+                       'arrived': int((arrival_steps >= 0).sum()),
+                       'arrival_steps': arrival_steps.tolist(),
+                       'phases': profiler.summary()['phases']})
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['time_s'] = perf_counter() - start
+
+    with open(os.path.join(directory, 'result.json'), 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2)
+    return result
+
+
+def run_batch(scenarios, output, workers=None, save_field=True, cache_directory=None, skip_existing=False,
+              callback=None):
+    """ Wykonuje scenariusze w puli procesów (ProcessPoolExecutor) i dopisuje ich podsumowania do
+    <output>/results.jsonl.
+
+    Args:
+        scenarios (list): scenariusze (patrz load_scenarios()).
+        output (str): katalog wyników.
+        workers (int|None): liczba procesów; None - liczba procesorów, 1 - bez procesów pobocznych.
+        save_field (bool): czy zapisywać pola natężeń dźwięku.
+        cache_directory (str|None): katalog trwałej pamięci podręcznej pól; None - bez niej.
+        skip_existing (bool): jeżeli True - pomija scenariusze, które mają już zapisany wynik bez błędu (wznowienie
+            przerwanego przebiegu).
+        callback (callable|None): funkcja wywoływana z podsumowaniem każdego ukończonego scenariusza.
+
+    Returns:
+        list: podsumowania wykonanych scenariuszy (w kolejności ukończenia).
+
+    """
+
+    os.makedirs(output, exist_ok=True)
+    if skip_existing:
+        scenarios = [scenario for scenario in scenarios if not _finished(output, scenario['name'])]
+
+    results = []
+    with open(os.path.join(output, 'results.jsonl'), 'a', encoding='utf-8') as log:
+        def record(result):
+            log.write(json.dumps({key: value for key, value in result.items() if key != 'arrival_steps'}) + '\n')
+            log.flush()
+            results.append(result)
+            if callback is not None:
+                callback(result)
+
+        if workers == 1:
+            for scenario in scenarios:
+                record(run_scenario(scenario, output, save_field, cache_directory))
+            return results
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_scenario, scenario, output, save_field, cache_directory)
+                       for scenario in scenarios]
+            for future in as_completed(futures):
+                record(future.result())
+    return results
+
+
+def _finished(output, name):
+    """ Sprawdza, czy scenariusz ma już zapisany wynik bez błędu. """
+
+    try:
+        with open(os.path.join(output, name, 'result.json'), encoding='utf-8') as file:
+            return 'error' not in json.load(file)
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Symulacje wsadowe wodnego środowiska bez okna.')
+    parser.add_argument('scenarios', help='plik scenariuszy (JSON)')
+    parser.add_argument('--output', default='batch_results', help='katalog wyników')
+    parser.add_argument('--workers', type=int, default=None, help='liczba procesów (domyślnie liczba procesorów)')
+    parser.add_argument('--no-field', action='store_true', help='nie zapisuje pól natężeń dźwięku')
+    parser.add_argument('--cache', default=None, help='katalog trwałej pamięci podręcznej pól (field_cache.py)')
+    parser.add_argument('--skip-existing', action='store_true', help='pomija scenariusze z zapisanym wynikiem')
+    args = parser.parse_args()
+
+    def report(result):
+        name = result['scenario']['name']
+        if 'error' in result:
+            print('{:<50} FAILED\n{}'.format(name, result['error']))
+        else:
+            print('{:<50} {:>8.2f} s  arrived {}/{}'.format(name, result['time_s'], result['arrived'],
+                                                          result['submarines']))
+
+    batch = load_scenarios(args.scenarios)
+    print(len(batch), 'scenarios')
+    finished = run_batch(batch, args.output, args.workers, not args.no_field, args.cache, args.skip_existing, report)
+    failed = sum('error' in result for result in finished)
+    print('done: {} scenarios, {} failed, results in {}'.format(len(finished), failed, args.output))
+    raise SystemExit(1 if failed else 0)
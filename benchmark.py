@@ -0,0 +1,573 @@
+#  Pomiary wydajności symulacji. Uruchomienie:
+#       python benchmark.py storage [ścieżka mapy wysokości ...]     czas budowy i pamięć trybów przechowywania
+#       python benchmark.py engines [ścieżka mapy wysokości ...]     czas i błąd pola silników rozchodzenia się dźwięku
+#       python benchmark.py suite [--output plik.json] [opcje]        krzywe skalowania (python benchmark.py suite -h)
+#       python benchmark.py lod [ścieżka mapy wysokości ...]         czas i błąd pola zgrubnej siatki (downsample)
+#       python benchmark.py imports [moduł ...]                       czas importu modułów w nowym procesie
+#  Bez ścieżek mierzone są wszystkie mapy wysokości z katalogu Heightmaps/.
+#
+#  Zestaw 'suite' mierzy budowę basenu (Pool.__init__), add_sound_source() w obu trybach realizmu oraz
+#  Submarine.move(True) na syntetycznych mapach wysokości o rosnących rozmiarach (16² ... 512²) i różnej gęstości
+#  przeszkód oraz na mapach z katalogu Heightmaps/. Dla każdej fazy zapisuje czas, pamięć zajętą w trakcie fazy
+#  (tracemalloc - szczyt i przyrost liczone osobno dla każdej fazy) i liczbę sześcianów na sekundę do pliku JSON,
+#  a na koniec wypisuje wykładniki skalowania czasu względem liczby sześcianów (nachylenie prostej w skali log-log).
+#  Szczytowe RSS (ru_maxrss) nigdy nie maleje, więc mierzy się je tylko raz na scenariusz, w osobnym procesie.
+
+import os
+import sys
+import io
+import json
+import argparse
+import platform
+import subprocess
+import resource
+import tracemalloc
+import contextlib
+from glob import glob
+from time import perf_counter
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+SUITE_SIZES = (16, 32, 64, 128, 256, 512)
+SUITE_DENSITIES = (0.0, 0.1, 0.3)
+SUITE_PHASES = ('build', 'field', 'field_realism', 'route')
+IMPORT_MODULES = ('classes', 'batch', 'heightmap_loader')
+# moduły, których import symulacji bez okna nie powinien wczytywać
+HEAVY_MODULES = ('ursina', 'PIL', 'tempfile', 'concurrent.futures.process')
+
+
+def peak_rss_mb():
+    """ Zwraca szczytowe zużycie pamięci rezydentnej (peak RSS) bieżącego procesu w megabajtach.
+
+    Note:
+        To szczyt z całego życia procesu - nie maleje po zwolnieniu pamięci, więc różnica dwóch odczytów nie mówi nic
+        o późniejszych, mniejszych fazach. Pamięć pojedynczych faz mierzy tracemalloc (_measure_scenario()).
+
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje wartość w kilobajtach, macOS - w bajtach
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure_storage(heightmap, height, storage, results):
+    """ Buduje basen w podanym trybie przechowywania i zapisuje czas budowy oraz szczytowe zużycie pamięci.
+
+    Note:
+        Funkcja uruchamia się w osobnym procesie, dlatego szczytowe zużycie pamięci dotyczy tylko jednego basenu.
+
+    Args:
+        heightmap (str): ścieżka mapy wysokości.
+        height (int): wysokość basenu.
+        storage (str): tryb przechowywania wypełnienia basenu.
+        results (multiprocessing.Queue): kolejka, do której trafia wynik pomiaru.
+
+    """
+
+    from classes import Pool
+
+    rss_before = peak_rss_mb()
+    start = perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pool = Pool(height, heightmap, storage=storage)
+    build_time = perf_counter() - start
+    results.put({'heightmap': heightmap,
+                 'storage': storage,
+                 'voxels': pool.height * pool.width * pool.length,
+                 'build_time_s': build_time,
+                 'peak_rss_mb': peak_rss_mb(),
+                 'pool_rss_mb': peak_rss_mb() - rss_before})
+
+
+def measure_storage(heightmap, height=None, storage='objects'):
+    """ Mierzy czas budowy basenu i szczytowe zużycie pamięci dla jednego trybu przechowywania.
+
+    Args:
+        heightmap (str): ścieżka mapy wysokości.
+        height (int|None): wysokość basenu; jeżeli None - o 1 wyższa od maksymalnej wysokości terenu.
+        storage (str): tryb przechowywania wypełnienia basenu ('objects', 'arrays', 'chunked' albo 'columns').
+
+    Returns:
+        dict: wynik pomiaru (liczba sześcianów, czas budowy, szczytowe RSS procesu i przyrost RSS przez basen).
+
+    """
+
+    if height is None:
+        from heightmap_loader import get_max_height
+        height = get_max_height(heightmap) + 1
+
+    context = get_context('spawn')  # czysty interpreter, żeby pomiary trybów na siebie nie wpływały
+    results = context.Queue()
+    process = context.Process(target=_measure_storage, args=(heightmap, height, storage, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def measure_engines(heightmap, height=None, ss_xy=None, enhanced_realism=False):
+    """ Porównuje czas wyznaczania pola natężeń dźwięku silnikiem 'wavefront' z silnikiem 'curve'
+    (funkcja shortest_curve()) i wyznacza błąd pola silnika 'wavefront' względem silnika 'curve'.
+
+    Args:
+        heightmap (str): ścieżka mapy wysokości.
+        height (int|None): wysokość basenu; jeżeli None - o 1 wyższa od maksymalnej wysokości terenu.
+        ss_xy (tuple|None): współrzędne (x, y) źródła dźwięku; jeżeli None - środek basenu.
+        enhanced_realism (bool): tryb realizmu silnika 'curve'.
+
+    Returns:
+        dict: czasy obu silników oraz maksymalny i średni błąd względny natężenia dźwięku.
+
+    """
+
+    import numpy as np
+    from classes import Pool
+    from heightmap_loader import load_heightmap
+
+    heights = load_heightmap(heightmap)
+    if height is None:
+        height = int(heights.max()) + 1
+    if ss_xy is None:
+        ss_xy = (heights.shape[1] // 2, heights.shape[0] // 2)
+
+    result = {'heightmap': heightmap, 'enhanced_realism': enhanced_realism}
+    fields = {}
+    for engine in ('curve', 'wavefront'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            pool = Pool(height, heightmap, storage='arrays')
+            start = perf_counter()
+            pool.add_sound_source(x_position=ss_xy[0], y_position=ss_xy[1], enhanced_realism=enhanced_realism,
+                                  engine=engine)
+        result[engine + '_time_s'] = perf_counter() - start
+        fields[engine] = pool.sound_intensity[pool.water_mask()].astype(np.float64)
+
+    relative_error = np.abs(fields['wavefront'] - fields['curve']) / fields['curve']
+    result['max_relative_error'] = float(relative_error.max())
+    result['mean_relative_error'] = float(relative_error.mean())
+    result['speedup'] = result['curve_time_s'] / result['wavefront_time_s']
+    return result
+
+
+def measure_lod(heightmap, factors=(2, 4, 8), height=None, ss_xy=None, engine='wavefront', enhanced_realism=False):
+    """ Porównuje pola natężeń dźwięku wyznaczone na zgrubnej siatce (add_sound_source(downsample=...)) z polem
+    pełnej rozdzielczości: czas, przyspieszenie, odsetek sześcianów doliczonych w pełnej rozdzielczości i błąd względny.
+
+    Args:
+        heightmap (str): ścieżka mapy wysokości.
+        factors (tuple): mierzone współczynniki zmniejszenia rozdzielczości.
+        height (int|None): wysokość basenu; jeżeli None - o 1 wyższa od maksymalnej wysokości terenu.
+        ss_xy (tuple|None): współrzędne (x, y) źródła dźwięku; jeżeli None - środek basenu.
+        engine (str): silnik rozchodzenia się dźwięku.
+        enhanced_realism (bool): tryb realizmu silnika 'curve'.
+
+    Returns:
+        list: wyniki - pierwszy dla pełnej rozdzielczości (downsample = 1), kolejne dla podanych współczynników.
+
+    """
+
+    import numpy as np
+    from classes import Pool
+    from heightmap_loader import load_heightmap
+
+    heights = load_heightmap(heightmap)
+    if height is None:
+        height = int(heights.max()) + 1
+    if ss_xy is None:
+        ss_xy = (heights.shape[1] // 2, heights.shape[0] // 2)
+
+    results = []
+    reference = None
+    for factor in (1,) + tuple(factors):
+        pool = Pool(height, heightmap, storage='arrays')
+        start = perf_counter()
+        pool.add_sound_source(x_position=ss_xy[0], y_position=ss_xy[1], enhanced_realism=enhanced_realism,
+                              engine=engine, downsample=factor)
+        elapsed = perf_counter() - start
+        field = pool.sound_intensity[pool.water_mask()].astype(np.float64)
+        result = {'heightmap': heightmap, 'engine': engine, 'downsample': factor, 'time_s': elapsed}
+        if reference is None:
+            reference = result
+            reference_field = field
+        else:
+            relative_error = np.abs(field - reference_field) / reference_field
+            result.update({'speedup': reference['time_s'] / elapsed,
+                           'refined_fraction': pool.field_lod['refined_voxels'] / pool.field_lod['water_voxels'],
+                           'max_relative_error': float(relative_error.max()),
+                           'mean_relative_error': float(relative_error.mean()),
+                           'p95_relative_error': float(np.percentile(relative_error, 95))})
+        results.append(result)
+    return results
+
+
+def synthetic_heightmap(path, size, density, height, seed=0):
+    """ Zapisuje syntetyczną mapę wysokości: płaskie dno na wysokości 1 z losowymi słupami przeszkód.
+
+    Args:
+        path (str): ścieżka zapisywanego pliku (format bezstratny, np. .png).
+        size (int): długość i szerokość mapy.
+        density (float): odsetek kolumn zajętych przez przeszkody [0; 1].
+        height (int): wysokość basenu; przeszkody mają wysokość z przedziału [2; height - 1], więc nad każdą kolumną
+            zostaje woda.
+        seed (int): ziarno generatora liczb losowych.
+
+    Returns:
+        str: ścieżka zapisanego pliku.
+
+    """
+
+    import numpy as np
+    from PIL import Image
+
+    assert height >= 3, ValueError('Synthetic pool height must be at least 3.')
+
+    generator = np.random.default_rng(seed)
+    heights = np.ones((size, size), dtype=np.uint8)
+    obstacles = generator.random((size, size)) < density
+    heights[obstacles] = generator.integers(2, height, size=int(obstacles.sum()))
+    Image.fromarray(heights, mode='L').save(path)
+    return path
+
+
+def _measure_scenario(scenario):
+    """ Mierzy kolejne fazy symulacji dla jednego basenu: budowę, pola natężeń dźwięku w obu trybach realizmu
+    i przemieszczenie łodzi podwodnej do źródła dźwięku.
+
+    Note:
+        Funkcja uruchamia się w osobnym procesie (po jednym na scenariusz), dlatego szczytowe RSS ('peak_rss_mb'
+        wyniku) dotyczy tylko jednego basenu. Pamięć faz mierzy tracemalloc (także tablice NumPy): 'peak_mb' to
+        szczyt ponad stan z początku fazy, a 'memory_growth_mb' - pamięć, która została zajęta po fazie. Śledzenie
+        alokacji spowalnia fazy wykonywane w Pythonie (np. tryb 'objects'), dlatego można je wyłączyć
+        ('trace_memory': False). Fazy, które przekroczyłyby limit sześcianów, są pomijane (wpis 'skipped').
+
+    Args:
+        scenario (dict): opis scenariusza - 'heightmap', 'height', 'storage', 'engine', 'phases', 'max_voxels'
+            (limit sześcianów dla faz 'field' i 'field_realism'), opcjonalnie 'trace_memory' (domyślnie True)
+            oraz pola opisowe, przepisywane do wyniku.
+
+    Returns:
+        dict: scenariusz uzupełniony o 'voxels', 'water_voxels', 'peak_rss_mb' i 'phases' - słownik wyników faz.
+
+    """
+
+    from classes import Pool
+
+    result = dict(scenario)
+    phases = result['phases'] = {}
+    trace_memory = scenario.get('trace_memory', True)
+    if trace_memory:
+        tracemalloc.start()
+
+    def measure(name, function, count):
+        if trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            value = function()
+        elapsed = perf_counter() - start
+        phases[name] = {'time_s': elapsed,
+                        'voxels_per_s': count / elapsed if count and elapsed > 0 else None}
+        if trace_memory:
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            phases[name].update({'peak_mb': (memory_peak - memory_before) / 1024 ** 2,
+                                 'memory_growth_mb': (memory_after - memory_before) / 1024 ** 2})
+        return value
+
+    voxels = scenario['height'] * scenario['size'][0] * scenario['size'][1]
+    pool = measure('build', lambda: Pool(scenario['height'], scenario['heightmap'], storage=scenario['storage']), voxels)
+    water_voxels = int(pool.water_mask().sum())
+    result['voxels'] = voxels
+    result['water_voxels'] = water_voxels
+    ss_xy = (pool.length // 2, pool.width // 2)
+
+    field_engine = None
+    for name, enhanced_realism in (('field', False), ('field_realism', True)):
+        if name not in scenario['phases']:
+            continue
+        limit = scenario['max_voxels'].get(name) if scenario['engine'] == 'curve' else None
+        if limit is not None and voxels > limit:
+            phases[name] = {'skipped': 'more than {} voxels'.format(limit)}
+            continue
+        measure(name, lambda: pool.add_sound_source(x_position=ss_xy[0], y_position=ss_xy[1],
+                                                    enhanced_realism=enhanced_realism, engine=scenario['engine']),
+                water_voxels)
+        field_engine = scenario['engine']
+
+    if 'route' in scenario['phases']:
+        if field_engine is None:
+            # pola natężeń zostały pominięte - łódź płynie według pola silnika 'wavefront' (poza pomiarem)
+            with contextlib.redirect_stdout(io.StringIO()):
+                pool.add_sound_source(x_position=ss_xy[0], y_position=ss_xy[1], engine='wavefront')
+            field_engine = 'wavefront'
+        pool.add_submarine(0, 0, pool.height - 1)  # narożnik pod powierzchnią - najdalej od źródła na środku
+        positions = measure('route', lambda: pool.submarine.move(True), None)
+        phases['route'].update({'steps': len(positions), 'field_engine': field_engine,
+                                'steps_per_s': len(positions) / phases['route']['time_s']})
+    if trace_memory:
+        tracemalloc.stop()
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def _environment():
+    """ Zwraca opis środowiska pomiaru (wersje, platforma i bieżący commit), zapisywany razem z wynikami. """
+
+    import numpy as np
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'created': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count()}
+
+
+def scaling_exponents(results):
+    """ Wyznacza wykładniki skalowania czasu faz względem liczby sześcianów dla syntetycznych map wysokości.
+
+    Wykładnik to nachylenie prostej dopasowanej metodą najmniejszych kwadratów do punktów (log sześcianów, log czasu),
+    osobno dla każdej fazy i gęstości przeszkód: 1 oznacza skalowanie liniowe, 2 - kwadratowe.
+
+    Args:
+        results (list): wyniki scenariuszy (_measure_scenario()).
+
+    Returns:
+        list: słowniki z fazą ('phase'), gęstością ('density'), liczbą punktów ('points') i wykładnikiem ('exponent').
+
+    """
+
+    import numpy as np
+
+    series = {}
+    for result in results:
+        if result.get('density') is None:
+            continue
+        for phase, measurement in result.get('phases', {}).items():
+            if measurement.get('time_s'):
+                series.setdefault((phase, result['density']), []).append((result['voxels'], measurement['time_s']))
+
+    exponents = []
+    for (phase, density), points in sorted(series.items()):
+        if len(points) >= 2:
+            voxels, times = np.log(np.array(points, dtype=np.float64)).T
+            exponents.append({'phase': phase, 'density': density, 'points': len(points),
+                              'exponent': float(np.polyfit(voxels, times, 1)[0])})
+    return exponents
+
+
+def run_suite(output, sizes=SUITE_SIZES, densities=SUITE_DENSITIES, height=8, heightmaps=None, storage='arrays',
+              engine='curve', phases=SUITE_PHASES, max_voxels=None, seed=0, trace_memory=True):
+    """ Uruchamia zestaw pomiarów skalowania i zapisuje wyniki do pliku JSON.
+
+    Args:
+        output (str): ścieżka pliku JSON z wynikami.
+        sizes (tuple): rozmiary syntetycznych map wysokości (długość = szerokość).
+        densities (tuple): gęstości przeszkód syntetycznych map wysokości.
+        height (int): wysokość basenów z syntetycznych map.
+        heightmaps (list|None): dodatkowe mapy wysokości; jeżeli None - mapy z katalogu Heightmaps/.
+        storage (str): tryb przechowywania wypełnienia basenu.
+        engine (str): silnik rozchodzenia się dźwięku w fazach 'field' i 'field_realism'.
+        phases (tuple): mierzone fazy (podzbiór SUITE_PHASES); faza 'build' jest zawsze mierzona.
+        max_voxels (dict|None): limity sześcianów dla faz 'field' i 'field_realism' silnika 'curve'
+            (None w słowniku - bez limitu).
+        seed (int): ziarno generatora syntetycznych map.
+        trace_memory (bool): jeżeli True - pamięć każdej fazy mierzy tracemalloc (kosztem wolniejszych faz
+            wykonywanych w Pythonie).
+
+    Returns:
+        dict: zapisany dokument - opis środowiska ('environment') i wyniki scenariuszy ('results').
+
+    """
+
+    from heightmap_loader import load_heightmap
+
+    max_voxels = {'field': 50000, 'field_realism': 5000} if max_voxels is None else max_voxels
+    heightmaps = _heightmaps([]) if heightmaps is None else heightmaps
+    document = {'environment': _environment(), 'results': []}
+
+    with TemporaryDirectory() as directory:
+        scenarios = []
+        for size in sizes:
+            for density in densities:
+                path = os.path.join(directory, 'synthetic_{}_{}.png'.format(size, density))
+                scenarios.append({'name': 'synthetic {0}x{0} density {1}'.format(size, density), 'size': (size, size),
+                                  'density': density, 'height': height,
+                                  'heightmap': synthetic_heightmap(path, size, density, height, seed)})
+        for heightmap in heightmaps:
+            heights = load_heightmap(heightmap)
+            scenarios.append({'name': heightmap, 'size': (heights.shape[1], heights.shape[0]), 'density': None,
+                              'height': int(heights.max()) + 1, 'heightmap': heightmap})
+
+        for scenario in scenarios:
+            scenario.update({'storage': storage, 'engine': engine, 'phases': list(phases), 'max_voxels': max_voxels,
+                             'trace_memory': trace_memory})
+            # nowy proces dla każdego scenariusza - niezależne szczytowe zużycie pamięci
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                try:
+                    result = executor.submit(_measure_scenario, scenario).result()
+                except (BrokenProcessPool, MemoryError) as error:
+                    result = dict(scenario, error=repr(error))
+            if result['heightmap'].startswith(directory):
+                result['heightmap'] = None  # plik tymczasowy - scenariusz opisują rozmiar, gęstość i ziarno
+                result['seed'] = seed
+            document['results'].append(result)
+            _print_scenario(result)
+
+    document['scaling_exponents'] = scaling_exponents(document['results'])
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=2)
+    return document
+
+
+def _print_scenario(result):
+    """ Wypisuje wiersz podsumowania jednego scenariusza zestawu 'suite'. """
+
+    cells = []
+    for phase in SUITE_PHASES:
+        measurement = result.get('phases', {}).get(phase)
+        if measurement is None:
+            cells.append('{:>14}'.format('-'))
+        elif 'skipped' in measurement:
+            cells.append('{:>14}'.format('skipped'))
+        else:
+            cells.append('{:>9.3f} s   '.format(measurement['time_s']))
+    print('{:<40} {:>9}'.format(result['name'], result.get('voxels', 'error')), *cells, flush=True)
+
+
+def measure_import(module, repeats=5):
+    """ Mierzy czas importu modułu w nowym procesie interpretera (tak jak w krótko żyjącym procesie wsadowym).
+
+    Args:
+        module (str): nazwa modułu.
+        repeats (int): liczba pomiarów (każdy w osobnym procesie); wynikiem jest mediana.
+
+    Returns:
+        dict: 'module', 'time_s' (mediana czasu importu), 'slowest' - pięć bezpośrednio importowanych modułów
+            o najdłuższym łącznym czasie importu (według python -X importtime) i 'heavy' - wczytane moduły
+            z HEAVY_MODULES; jeżeli import się nie udał - 'module' i 'error' (ostatni wiersz komunikatu błędu).
+
+    """
+
+    code = ('import sys, time; start = time.perf_counter(); import {}; elapsed = time.perf_counter() - start; '
+            'import json; print(json.dumps([elapsed, [name for name in {!r} if name in sys.modules]]))'
+            ).format(module, HEAVY_MODULES)
+    times, slowest, heavy = [], [], []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        if completed.returncode != 0:
+            return {'module': module, 'error': completed.stderr.strip().splitlines()[-1]}
+        elapsed, heavy = json.loads(completed.stdout)
+        times.append(elapsed)
+        # wiersze "import time: własny | łączny | nazwa"; moduły importowane bezpośrednio mają wcięcie o 2 spacje
+        imports = []
+        for line in completed.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[0].startswith('import time:') and fields[1].strip().isdigit() and \
+                    fields[2].startswith('   ') and not fields[2].startswith('    '):
+                imports.append((int(fields[1]) / 1e6, fields[2].strip()))
+        slowest = sorted(imports, reverse=True)[:5]
+    times.sort()
+    return {'module': module, 'time_s': times[len(times) // 2], 'slowest': slowest, 'heavy': heavy}
+
+
+def _heightmaps(paths):
+    """ Zwraca podane ścieżki map wysokości albo wszystkie mapy (bez tekstur) z katalogu Heightmaps/. """
+
+    return paths or sorted(path for path in glob('Heightmaps/*.jpg') if not path.endswith('_texture.jpg'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pomiary wydajności symulacji wodnego środowiska.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    storage_parser = subparsers.add_parser('storage', help='czas budowy basenu i szczytowe zużycie pamięci')
+    storage_parser.add_argument('heightmaps', nargs='*')
+    engines_parser = subparsers.add_parser('engines', help="porównanie silników 'curve' i 'wavefront'")
+    engines_parser.add_argument('heightmaps', nargs='*')
+    engines_parser.add_argument('--enhanced-realism', action='store_true',
+                                help="silnik 'curve' w trybie enhanced_realism=True (bardzo wolne)")
+    lod_parser = subparsers.add_parser('lod', help='pole zgrubnej siatki względem pełnej rozdzielczości')
+    lod_parser.add_argument('heightmaps', nargs='*')
+    lod_parser.add_argument('--factors', type=int, nargs='+', default=(2, 4, 8))
+    lod_parser.add_argument('--engine', choices=('curve', 'wavefront'), default='wavefront')
+    lod_parser.add_argument('--enhanced-realism', action='store_true')
+    imports_parser = subparsers.add_parser('imports', help='czas importu modułów w nowym procesie')
+    imports_parser.add_argument('modules', nargs='*', default=IMPORT_MODULES)
+    imports_parser.add_argument('--repeats', type=int, default=5)
+    suite_parser = subparsers.add_parser('suite', help='krzywe skalowania zapisywane do pliku JSON')
+    suite_parser.add_argument('heightmaps', nargs='*', help='mapy wysokości (domyślnie Heightmaps/*.jpg)')
+    suite_parser.add_argument('--output', default='benchmark_results.json', help='plik JSON z wynikami')
+    suite_parser.add_argument('--sizes', type=int, nargs='+', default=SUITE_SIZES)
+    suite_parser.add_argument('--densities', type=float, nargs='+', default=SUITE_DENSITIES)
+    suite_parser.add_argument('--height', type=int, default=8, help='wysokość basenów z syntetycznych map')
+    suite_parser.add_argument('--storage', choices=('objects', 'arrays', 'chunked', 'columns'), default='arrays')
+    suite_parser.add_argument('--engine', choices=('curve', 'wavefront'), default='curve')
+    suite_parser.add_argument('--phases', nargs='+', choices=SUITE_PHASES, default=SUITE_PHASES)
+    suite_parser.add_argument('--max-voxels', type=int, default=50000,
+                              help="limit sześcianów fazy 'field' silnika 'curve' (0 - bez limitu)")
+    suite_parser.add_argument('--max-voxels-realism', type=int, default=5000,
+                              help="limit sześcianów fazy 'field_realism' silnika 'curve' (0 - bez limitu)")
+    suite_parser.add_argument('--seed', type=int, default=0)
+    suite_parser.add_argument('--no-trace-memory', action='store_true',
+                              help='bez pomiaru pamięci faz (tracemalloc spowalnia fazy wykonywane w Pythonie)')
+    args = parser.parse_args()
+
+    if args.command == 'suite':
+        print('{:<40} {:>9}'.format('scenario', 'voxels'), *('{:>14}'.format(phase) for phase in SUITE_PHASES))
+        document = run_suite(args.output, args.sizes, args.densities, args.height, args.heightmaps or None,
+                             args.storage, args.engine, args.phases,
+                             {'field': args.max_voxels or None, 'field_realism': args.max_voxels_realism or None},
+                             args.seed, not args.no_trace_memory)
+        for exponent in document['scaling_exponents']:
+            print('{:<14} density {:<5} time ~ voxels^{:.2f}'.format(exponent['phase'], exponent['density'],
+                                                                   exponent['exponent']))
+        print('results written to', args.output)
+    elif args.command == 'imports':
+        print('{:<20} {:>10}  {:<40} {}'.format('module', 'time [ms]', 'slowest direct imports [ms]', 'heavy modules'))
+        for module in args.modules:
+            result = measure_import(module, args.repeats)
+            if 'error' in result:
+                print('{:<20} {:>10}  {}'.format(module, '-', result['error']))
+                continue
+            print('{:<20} {:>10.1f}  {:<40} {}'.format(
+                module, result['time_s'] * 1000,
+                ', '.join('{} {:.1f}'.format(name, seconds * 1000) for seconds, name in result['slowest'][:3]),
+                ', '.join(result['heavy']) or '-'))
+    elif args.command == 'lod':
+        print('{:<45} {:>10} {:>9} {:>8} {:>9} {:>14} {:>14} {:>14}'.format(
+            'heightmap', 'downsample', 'time [s]', 'speedup', 'refined', 'max rel. err.', 'mean rel. err.',
+            'p95 rel. err.'))
+        for heightmap in _heightmaps(args.heightmaps):
+            for result in measure_lod(heightmap, args.factors, engine=args.engine,
+                                      enhanced_realism=args.enhanced_realism):
+                if result['downsample'] == 1:
+                    print('{:<45} {:>10} {:>9.3f}'.format(heightmap, 1, result['time_s']))
+                else:
+                    print('{:<45} {:>10} {:>9.3f} {:>8.1f} {:>8.1%} {:>14.4f} {:>14.4f} {:>14.4f}'.format(
+                        heightmap, result['downsample'], result['time_s'], result['speedup'],
+                        result['refined_fraction'], result['max_relative_error'], result['mean_relative_error'],
+                        result['p95_relative_error']))
+    elif args.command == 'storage':
+        print('{:<45} {:>8} {:>10} {:>10} {:>12}'.format('heightmap', 'storage', 'voxels', 'build [s]', 'pool RSS [MB]'))
+        for heightmap in _heightmaps(args.heightmaps):
+            for storage in ('objects', 'arrays', 'chunked', 'columns'):
+                result = measure_storage(heightmap, storage=storage)
+                print('{:<45} {:>8} {:>10} {:>10.3f} {:>12.1f}'.format(heightmap, storage, result['voxels'],
+                                                                       result['build_time_s'], result['pool_rss_mb']))
+    else:
+        print('{:<45} {:>10} {:>14} {:>8} {:>14} {:>14}'.format('heightmap', 'curve [s]', 'wavefront [s]', 'speedup',
+                                                               'max rel. err.', 'mean rel. err.'))
+        for heightmap in _heightmaps(args.heightmaps):
+            result = measure_engines(heightmap, enhanced_realism=args.enhanced_realism)
+            print('{:<45} {:>10.3f} {:>14.3f} {:>8.1f} {:>14.3f} {:>14.3f}'.format(
+                heightmap, result['curve_time_s'], result['wavefront_time_s'], result['speedup'],
+                result['max_relative_error'], result['mean_relative_error']))
@@ -0,0 +1,255 @@
+import os
+import weakref
+from itertools import product
+from collections import OrderedDict
+import numpy as np
+
+
+def _remove_file(path):
+    """ Usuwa plik tymczasowy siatki (wywoływane przy zwolnieniu egzemplarza ChunkedGrid()). """
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ChunkedGrid:
+    """ Trójwymiarowa tablica [z, y, x] przechowywana na dysku w blokach (chunkach) chunk_size³ elementów.
+
+    Bloki leżą w pliku zmapowanym do pamięci (numpy.memmap) jeden za drugim, więc każdy blok jest ciągłym fragmentem
+    pliku. W pamięci operacyjnej przebywa co najwyżej resident_chunks bloków (LRU): blok wczytuje się przy pierwszym
+    dostępie, a przy usunięciu z pamięci - jeżeli był zmieniany - zapisuje z powrotem do pliku. Dzięki temu rozmiar
+    siatki ogranicza dysk, a nie pamięć operacyjna.
+
+    Indeksowanie jest zgodne z tablicami NumPy dla liczb całkowitych, wycinków o kroku 1 i Ellipsis: siatka[z, y, x]
+    zwraca jeden element, a siatka[z0:z1, y, :] - tablicę NumPy złożoną z odpowiednich bloków. numpy.asarray(siatka)
+    wczytuje całą siatkę.
+
+    Attributes:
+        shape (tuple): wymiary siatki (z, y, x).
+        dtype (numpy.dtype): typ elementów.
+        chunk_size (int): długość krawędzi bloku.
+        resident_chunks (int): maksymalna liczba bloków w pamięci operacyjnej.
+        path (str): ścieżka pliku z blokami.
+        loads (int): liczba wczytań bloków z pliku.
+        evictions (int): liczba bloków usuniętych z pamięci operacyjnej.
+
+    """
+
+    def __init__(self, shape, dtype, chunk_size=64, resident_chunks=64, fill_value=0, directory=None):
+        """ Inicjalizacja siatki wypełnionej wartością fill_value.
+
+        Args:
+            shape (tuple): wymiary siatki (z, y, x).
+            dtype (numpy.dtype|type): typ elementów.
+            chunk_size (int): długość krawędzi bloku.
+            resident_chunks (int): maksymalna liczba bloków w pamięci operacyjnej (co najmniej 1).
+            fill_value (float|int): początkowa wartość wszystkich elementów.
+            directory (str|None): katalog pliku z blokami; jeżeli None - katalog plików tymczasowych systemu.
+                Plik jest usuwany razem z egzemplarzem siatki.
+
+        Raises:
+            ValueError: jeżeli rozmiar bloku lub limit bloków w pamięci są mniejsze od 1.
+
+        """
+
+        assert chunk_size >= 1 and resident_chunks >= 1, \
+            ValueError('The chunk_size and resident_chunks parameters must be at least 1.')
+
+        self.shape = tuple(int(size) for size in shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.resident_chunks = resident_chunks
+        self.chunks_shape = tuple(-(-size // chunk_size) for size in self.shape)  # liczba bloków wzdłuż osi
+        self.loads = 0
+        self.evictions = 0
+
+        from tempfile import mkstemp  # tempfile importuje się dopiero przy pierwszym basenie w trybie 'chunked'
+
+        descriptor, self.path = mkstemp(suffix='.chunks', dir=directory)
+        os.close(descriptor)
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+        self._file = np.memmap(self.path, dtype=self.dtype, mode='w+',
+                               shape=self.chunks_shape + (chunk_size,) * 3)
+        self._resident = OrderedDict()  # indeks bloku: tablica bloku (od najdawniej do najświeżej używanego)
+        self._dirty = set()
+        if fill_value != 0:
+            self.fill(fill_value)  # nowy plik jest już wypełniony zerami
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1] * self.shape[2]
+
+    @property
+    def nbytes(self):
+        """ Liczba bajtów pliku z blokami (razem z dopełnieniem niepełnych bloków na krańcach). """
+
+        return self._file.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def chunk(self, index):
+        """ Zwraca tablicę bloku o podanym indeksie (wczytując go z pliku, jeżeli nie ma go w pamięci).
+
+        Note:
+            Zmiany tablicy trzeba zgłosić metodą mark_dirty(), inaczej mogą nie trafić do pliku.
+
+        Args:
+            index (tuple): indeks bloku (z, y, x).
+
+        Returns:
+            numpy.ndarray: tablica chunk_size³ elementów.
+
+        """
+
+        block = self._resident.get(index)
+        if block is not None:
+            self._resident.move_to_end(index)
+            return block
+        while len(self._resident) >= self.resident_chunks:
+            evicted, evicted_block = self._resident.popitem(last=False)
+            if evicted in self._dirty:
+                self._file[evicted] = evicted_block
+                self._dirty.discard(evicted)
+            self.evictions += 1
+        block = np.array(self._file[index])
+        self.loads += 1
+        self._resident[index] = block
+        return block
+
+    def mark_dirty(self, index):
+        """ Zgłasza zmianę bloku o podanym indeksie (zostanie zapisany do pliku przy usunięciu z pamięci). """
+
+        self._dirty.add(index)
+
+    def flush(self):
+        """ Zapisuje wszystkie zmienione bloki do pliku. """
+
+        for index in self._dirty:
+            self._file[index] = self._resident[index]
+        self._dirty.clear()
+        self._file.flush()
+
+    def fill(self, value):
+        """ Wypełnia całą siatkę podaną wartością. """
+
+        self._resident.clear()
+        self._dirty.clear()
+        self._file[...] = value
+
+    def chunk_slices(self):
+        """ Generuje indeksy wszystkich bloków razem z odpowiadającymi im wycinkami siatki.
+
+        Yields:
+            tuple: (indeks bloku (z, y, x), krotka wycinków (z, y, x) siatki, którą pokrywa blok).
+
+        """
+
+        for index in np.ndindex(*self.chunks_shape):
+            yield index, tuple(slice(i * self.chunk_size, min((i + 1) * self.chunk_size, size))
+                               for i, size in zip(index, self.shape))
+
+    def _normalise(self, key):
+        """ Zamienia klucz indeksowania na krotkę trzech wycinków i listę osi indeksowanych liczbą całkowitą. """
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(item is Ellipsis for item in key):
+            position = key.index(Ellipsis)
+            key = key[:position] + (slice(None),) * (3 - len(key) + 1) + key[position + 1:]
+        key = key + (slice(None),) * (3 - len(key))
+        assert len(key) == 3, IndexError('ChunkedGrid supports exactly three indices.')
+
+        slices, integer_axes = [], []
+        for axis, (item, size) in enumerate(zip(key, self.shape)):
+            if isinstance(item, slice):
+                start, stop, step = item.indices(size)
+                assert step == 1, IndexError('ChunkedGrid supports only slices with step 1.')
+                slices.append(slice(start, max(start, stop)))
+            else:
+                item = int(item)
+                if item < 0:
+                    item += size
+                if not 0 <= item < size:
+                    raise IndexError('ChunkedGrid index out of range')
+                slices.append(slice(item, item + 1))
+                integer_axes.append(axis)
+        return slices, integer_axes
+
+    def _regions(self, slices):
+        """ Generuje bloki, które przecina obszar siatki, razem z odpowiadającymi sobie wycinkami bloku i obszaru. """
+
+        ranges = [range(region.start // self.chunk_size, -(-region.stop // self.chunk_size)) for region in slices]
+        for index in product(*ranges):
+            in_chunk, in_region = [], []
+            for i, region in zip(index, slices):
+                start = max(region.start, i * self.chunk_size)
+                stop = min(region.stop, (i + 1) * self.chunk_size)
+                in_chunk.append(slice(start - i * self.chunk_size, stop - i * self.chunk_size))
+                in_region.append(slice(start - region.start, stop - region.start))
+            yield index, tuple(in_chunk), tuple(in_region)
+
+    def _element(self, key):
+        """ Zwraca indeks (z, y, x) pojedynczego elementu albo None, jeżeli klucz wskazuje obszar. """
+
+        if isinstance(key, tuple) and len(key) == 3 and all(isinstance(item, (int, np.integer)) for item in key):
+            z, y, x = key
+            if 0 <= z < self.shape[0] and 0 <= y < self.shape[1] and 0 <= x < self.shape[2]:
+                return z, y, x
+        return None  # obszar, indeksy ujemne lub spoza siatki - obsługuje _normalise()
+
+    def __getitem__(self, key):
+        element = self._element(key)
+        if element is not None:
+            # pojedynczy element - najczęstszy przypadek, bez budowania obszaru
+            z, y, x = element
+            size = self.chunk_size
+            return self.chunk((z // size, y // size, x // size))[z % size, y % size, x % size]
+
+        slices, integer_axes = self._normalise(key)
+        result = np.empty([region.stop - region.start for region in slices], dtype=self.dtype)
+        for index, in_chunk, in_region in self._regions(slices):
+            result[in_region] = self.chunk(index)[in_chunk]
+        return result.squeeze(axis=tuple(integer_axes)) if integer_axes else result
+
+    def __setitem__(self, key, value):
+        if key is Ellipsis and np.ndim(value) == 0:
+            self.fill(value)
+            return
+        element = self._element(key)
+        if element is not None:
+            z, y, x = element
+            size = self.chunk_size
+            index = (z // size, y // size, x // size)
+            self.chunk(index)[z % size, y % size, x % size] = value
+            self._dirty.add(index)
+            return
+
+        slices, integer_axes = self._normalise(key)
+        shape = [region.stop - region.start for region in slices]
+        value = np.asarray(value, dtype=self.dtype)
+        if value.ndim:
+            # jak w NumPy: wartość rozszerza się do wymiarów wyniku indeksowania (bez osi indeksowanych liczbą)
+            value = np.broadcast_to(value, [size for axis, size in enumerate(shape) if axis not in integer_axes])
+            value = np.expand_dims(value, tuple(integer_axes))
+        for index, in_chunk, in_region in self._regions(slices):
+            self.chunk(index)[in_chunk] = value[in_region] if value.ndim else value
+            self._dirty.add(index)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[...]
+        return array if dtype is None else array.astype(dtype)
+
+    def close(self):
+        """ Zamyka siatkę i usuwa plik z blokami. """
+
+        self._resident.clear()
+        self._dirty.clear()
+        del self._file
+        self._finalizer()
@@ -3,10 +3,43 @@ Created by Ivan Danylenko
 Date 09.11.21
 """
 
-from copy import deepcopy
-from PIL import Image
+#  Moduł importuje tylko to, czego potrzebuje sama symulacja (bez ursina i PIL); moduły potrzebne jedynie w niektórych
+#  ścieżkach (procesy poboczne silnika 'curve', pliki tymczasowe) importują się dopiero w funkcjach, które z nich
+#  korzystają. Czas importu mierzy: python benchmark.py imports
+
+import os
 from random import randint
-from math import sqrt
+from functools import lru_cache
+from math import sqrt, inf
+from heapq import heappush, heappop, heapify
+import numpy as np
+from heightmap_loader import load_heightmap, terrain_mask
+from instrumentation import Profiler, phase, count
+from chunked_storage import ChunkedGrid
+from column_storage import ColumnGrid, column_floors
+from snapshot import write_snapshot, read_snapshot
+
+# rodzaje materiału w siatce tablicowej (Pool(storage='arrays'|'chunked'|'columns').material)
+WATER = 0
+TERRAIN = 1
+SOURCE = 2
+
+# dostępne tryby przechowywania wypełnienia basenu
+STORAGE_MODES = ('objects', 'arrays', 'chunked', 'columns')
+
+# dostępne silniki rozchodzenia się dźwięku: 'curve' - shortest_curve() dla każdego sześcianu osobno,
+# 'wavefront' - wavefront_distances() dla całego basenu jednym przejściem
+ENGINES = ('curve', 'wavefront')
+# wersje silników - część klucza pamięci podręcznej pól natężeń; trzeba je zwiększyć przy każdej zmianie wyniku silnika
+ENGINE_VERSIONS = {'curve': 2, 'wavefront': 1}
+
+# przesunięcia indeksów (dx, dy, dz) do 26 sąsiadów; kolejność odpowiada liście CubicMetre().neighbours
+NEIGHBOUR_OFFSETS = [(1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1), (0, 1, 0), (0, -1, 0),
+                     (1, 0, -1), (1, 0, 1), (1, 1, 0), (1, -1, 0),
+                     (-1, 0, -1), (-1, 0, 1), (-1, 1, 0), (-1, -1, 0),
+                     (0, 1, -1), (0, 1, 1), (0, -1, 1), (0, -1, -1),
+                     (1, 1, -1), (1, 1, 1), (1, -1, 1), (1, -1, -1),
+                     (-1, 1, -1), (-1, 1, 1), (-1, -1, 1), (-1, -1, -1)]
 
 
 class CubicMetre:
@@ -48,7 +81,230 @@ class CubicMetre:
         self.is_water = is_water
 
         self.sound_intensity = None
-        self.neighbours = deepcopy([None] * 26)
+        self.neighbours = [None] * 26
+
+
+class CubicMetreView(CubicMetre):
+    """ Lekki widok metru sześciennego w basenie z tablicowym trybem przechowywania (Pool(storage='arrays'|'chunked')).
+
+    Nie przechowuje własnego stanu: atrybuty is_water i sound_intensity są czytane z tablic basenu i do nich
+    zapisywane, a sąsiedzi wyznaczają się na bieżąco z przesunięć indeksów NEIGHBOUR_OFFSETS. Dzięki temu
+    istniejący kod, który odwołuje się do Pool().filling[z][y][x], działa bez zmian w obu trybach.
+
+    Attributes:
+        pool (Pool): basen, do którego należy sześcian.
+        x_position (int): współrzędna sześcianu względem osi X.
+        y_position (int): współrzędna sześcianu względem osi Y.
+        z_position (int): współrzędna sześcianu względem osi Z.
+
+    """
+
+    def __init__(self, pool, x_position, y_position, z_position):
+        """ Inicjalizacja widoku metru sześciennego.
+
+        Args:
+            pool (Pool): basen w trybie storage='arrays'.
+            x_position (int): współrzędna sześcianu względem osi X.
+            y_position (int): współrzędna sześcianu względem osi Y.
+            z_position (int): współrzędna sześcianu względem osi Z.
+
+        """
+
+        self.pool = pool
+        self.x_position = x_position
+        self.y_position = y_position
+        self.z_position = z_position
+
+    def __eq__(self, other):
+        return isinstance(other, CubicMetreView) and other.pool is self.pool and \
+            (other.x_position, other.y_position, other.z_position) == \
+            (self.x_position, self.y_position, self.z_position)
+
+    def __hash__(self):
+        return hash((id(self.pool), self.x_position, self.y_position, self.z_position))
+
+    @property
+    def is_water(self):
+        return self.pool.is_water(self.x_position, self.y_position, self.z_position)
+
+    @is_water.setter
+    def is_water(self, value):
+        self.pool.material[self.z_position, self.y_position, self.x_position] = WATER if value else TERRAIN
+        if self.pool.storage != 'columns':  # ColumnGrid sam aktualizuje wysokości dna
+            self.pool.floors[self.y_position, self.x_position] = \
+                column_floors(self.pool.material[:, self.y_position:self.y_position + 1,
+                              self.x_position:self.x_position + 1])[0, 0]
+        self.pool.invalidate_geometry()
+
+    @property
+    def sound_intensity(self):
+        return self.pool.get_sound_intensity(self.x_position, self.y_position, self.z_position)
+
+    @sound_intensity.setter
+    def sound_intensity(self, value):
+        self.pool.set_sound_intensity(self.x_position, self.y_position, self.z_position, value)
+
+    @property
+    def neighbours(self):
+        neighbours = [None] * 26
+        for i, (x, y, z) in self.pool.neighbour_positions(self.x_position, self.y_position, self.z_position):
+            neighbours[i] = CubicMetreView(self.pool, x, y, z)
+        return neighbours
+
+
+class FillingView:
+    """ Widok tablic basenu w trybie storage='arrays', indeksowany tak samo jak lista Pool().filling[z][y][x].
+
+    Każde częściowe indeksowanie zwraca kolejny widok, a pełne - egzemplarz klasy CubicMetreView().
+
+    """
+
+    def __init__(self, pool, index=()):
+        """ Inicjalizacja widoku.
+
+        Args:
+            pool (Pool): basen w trybie storage='arrays'.
+            index (tuple): już podane indeksy (z, y) w kolejności indeksowania.
+
+        """
+
+        self.pool = pool
+        self.index = index
+
+    def __len__(self):
+        return (self.pool.height, self.pool.width, self.pool.length)[len(self.index)]
+
+    def __getitem__(self, item):
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('Pool filling index out of range')
+        if len(self.index) < 2:
+            return FillingView(self.pool, self.index + (item,))
+        return CubicMetreView(self.pool, item, self.index[1], self.index[0])
+
+
+class SoundSource:
+    """ Źródło dźwięku zarejestrowane w basenie metodą Pool().register_sound_source().
+
+    Attributes:
+        x_position (int): współrzędna źródła dźwięku względem osi X.
+        y_position (int): współrzędna źródła dźwięku względem osi Y.
+        z_position (int): współrzędna źródła dźwięku względem osi Z.
+        sound_intensity (float|int): natężenie dźwięku produkowanego przez źródło.
+        distances (numpy.ndarray): tablica float32 [z, y, x] długości dróg fali od źródła do każdego sześcianu.
+        engine (str): silnik, którym wyznaczono długości dróg.
+        enhanced_realism (bool): tryb realizmu silnika 'curve'.
+
+    """
+
+    def __init__(self, x_position, y_position, z_position, sound_intensity, distances, engine, enhanced_realism):
+        self.x_position = x_position
+        self.y_position = y_position
+        self.z_position = z_position
+        self.sound_intensity = sound_intensity
+        self.distances = distances
+        self.engine = engine
+        self.enhanced_realism = enhanced_realism
+
+    @property
+    def nbytes(self):
+        """ Liczba bajtów zajmowanych przez pole długości dróg. """
+
+        return self.distances.nbytes
+
+
+class LazyField:
+    """ Pole natężeń dźwięku wyznaczane na żądanie: natężenie w wodnym sześcianie oblicza się funkcją shortest_curve()
+    dopiero przy pierwszym odczycie (Pool().get_sound_intensity()) i zapamiętuje w ograniczonej pamięci podręcznej LRU,
+    indeksowanej numerem sześcianu. Pojedynczy ruch łodzi podwodnej odczytuje tylko sąsiadów sześcianów na swojej
+    drodze, więc kosztuje tyle, ile długość drogi, a nie cały basen.
+
+    Note:
+        Natężenia nie są zapisywane w basenie - pamięć zajmuje tylko pamięć podręczna (cache_size wpisów). Odczyty
+        całego pola (Pool().sound_field(), build_flow_field(), Fleet) widzą tylko zapisane natężenia; przed nimi trzeba
+        wywołać fill().
+
+    Attributes:
+        pool (Pool): basen z dodanym źródłem dźwięku.
+        enhanced_realism (bool): tryb realizmu funkcji shortest_curve().
+        cache_size (int|None): maksymalna liczba zapamiętanych natężeń (None - bez ograniczenia).
+
+    """
+
+    def __init__(self, pool, enhanced_realism=True, cache_size=65536):
+        """ Inicjalizacja pola.
+
+        Args:
+            pool (Pool): basen z dodanym źródłem dźwięku (atrybut sound_source).
+            enhanced_realism (bool): tryb realizmu funkcji shortest_curve().
+            cache_size (int|None): maksymalna liczba zapamiętanych natężeń (None - bez ograniczenia).
+
+        """
+
+        self.pool = pool
+        self.enhanced_realism = enhanced_realism
+        self.cache_size = cache_size
+        self._memo = None
+
+    def invalidate(self):
+        """ Usuwa zapamiętane natężenia; wywołuje się przy zmianie terenu basenu (Pool().invalidate_geometry()). """
+
+        self._memo = None
+
+    def _prepare(self):
+        """ Przygotowuje obliczenia: wymiary prostopadłościanu wyboru i basen pomocniczy, po czym tworzy pustą pamięć
+        podręczną LRU. """
+
+        pool = self.pool
+        source = pool.sound_source
+        self._ss_xyz = (source.x_position, source.y_position, source.z_position)
+        self._source_intensity = source.sound_intensity
+        self._prl_lw = pool.parallelepiped_dimensions()
+        self._dtype = np.float64 if pool.storage == 'objects' else np.float32  # jak w polu wyznaczonym od razu
+        # basen pomocniczy z tym samym terenem i bez natężeń: shortest_curve() nie sięga do tego pola z powrotem
+        # (w trybie 'chunked' korzysta z siatki bloków basenu, bez wczytywania jej w całości)
+        material = pool.material if pool.storage == 'chunked' else pool.material_grid()
+        self._scratch = Pool.from_arrays(material, np.broadcast_to(np.float32(np.nan), material.shape),
+                                         pool.floors.copy())
+        self._scratch.sound_source = self._scratch.filling[self._ss_xyz[2]][self._ss_xyz[1]][self._ss_xyz[0]]
+        self._memo = lru_cache(maxsize=self.cache_size)(self._compute)
+
+    def _compute(self, index):
+        """ Wyznacza natężenie dźwięku w sześcianie o podanym numerze (indeks w spłaszczonym basenie [z, y, x]). """
+
+        z_position, rest = divmod(index, self.pool.width * self.pool.length)
+        y_position, x_position = divmod(rest, self.pool.length)
+        curve_length = shortest_curve(self._scratch, self._ss_xyz, (x_position, y_position, z_position), self._prl_lw,
+                                      self.enhanced_realism)
+        return float(self._dtype(self._source_intensity / (curve_length ** 2)))
+
+    def intensity(self, x_position, y_position, z_position):
+        """ Zwraca natężenie dźwięku w wodnym sześcianie o podanych współrzędnych (z pamięci podręcznej albo
+        wyznaczone teraz). """
+
+        if self._memo is None:
+            self._prepare()
+        return self._memo((z_position * self.pool.width + y_position) * self.pool.length + x_position)
+
+    def cache_info(self):
+        """ Zwraca statystyki pamięci podręcznej (trafienia, chybienia, rozmiar) - functools.lru_cache().cache_info().
+        """
+
+        if self._memo is None:
+            self._prepare()
+        return self._memo.cache_info()
+
+    def fill(self):
+        """ Wyznacza natężenie dźwięku we wszystkich wodnych sześcianach, zapisuje je w basenie i odłącza pole
+        od basenu (pool.lazy_field = None). """
+
+        pool = self.pool
+        water = pool.water_mask()
+        values = [self.intensity(x_position, y_position, z_position)
+                  for z_position, y_position, x_position in np.argwhere(water).tolist()]
+        pool.lazy_field = None
+        pool.set_sound_field(water, np.array(values))
 
 
 class Pool:
@@ -65,183 +321,1539 @@ class Pool:
         length (int): długość basenu (wymiar względem osi X).
         width (int): szerokość basenu (wymiar względem osi Y).
         height (int): wysokość basenu (wymiar względem osi Z).
-        filling (list): wypełnienie basenu - trójwymiarowa lista, składająca się z egzemplarzy klasy CubicMetre().
-        sound_source (CubicMetre): źródło dźwięku - egzemplarz klasy CubicMetre().
+        storage (str): tryb przechowywania wypełnienia basenu ('objects', 'arrays', 'chunked' albo 'columns').
+        heightmap (str|None): ścieżka mapy wysokości, z której zbudowano basen.
+        floors (numpy.ndarray): tablica int64 [y, x] wysokości dna kolumn - liczba ziemnych sześcianów leżących
+            w kolumnie jeden na drugim od z = 0 (patrz min_water_z()).
+        filling (list|FillingView): wypełnienie basenu - trójwymiarowa lista, składająca się z egzemplarzy klasy
+            CubicMetre(), albo (w trybach 'arrays' i 'chunked') jej widok, zwracający egzemplarze klasy
+            CubicMetreView().
+        material (numpy.ndarray|ChunkedGrid|ColumnGrid): tylko w trybach 'arrays', 'chunked' i 'columns' - tablica
+            uint8 [z, y, x] rodzajów materiału (WATER, TERRAIN, SOURCE); w trybie 'chunked' - siatka bloków na dysku
+            (ChunkedGrid), w trybie 'columns' - wysokości dna kolumn z wyjątkami (ColumnGrid).
+        sound_intensity (numpy.ndarray|ChunkedGrid): tylko w trybach 'arrays', 'chunked' i 'columns' - tablica float32
+            [z, y, x] natężeń dźwięku (NaN, jeżeli natężenie nie zostało zdefiniowane).
+        sound_source (CubicMetre|None): źródło dźwięku - egzemplarz klasy CubicMetre() (przy wielu zarejestrowanych
+            źródłach - ostatnio dodane).
+        sound_sources (dict): rejestr źródeł dźwięku dodanych metodą register_sound_source() - egzemplarze klasy
+            SoundSource() według identyfikatorów.
+        source_field_sum (numpy.ndarray|None): suma natężeń dźwięku pochodzących od zarejestrowanych źródeł.
         submarine (Submarine): łódź podwodna, aparat autonomiczny - egzemplarz klasy Submarine().
+        fleet (Fleet): flota łodzi podwodnych - egzemplarz klasy Fleet().
+        next_hop (numpy.ndarray|None): tablica int32 [z, y, x] indeksów kolejnego kroku łodzi podwodnej
+            (patrz build_flow_field()); None, jeżeli nie została zbudowana lub przestała być aktualna.
+        hops_to_source (numpy.ndarray|None): tablica int32 [z, y, x] liczby ruchów łodzi do punktu docelowego.
+        lazy_field (LazyField|None): pole natężeń dźwięku wyznaczane na żądanie (add_sound_source(lazy=True)).
+        field_lod (dict|None): opis pola wyznaczonego na zgrubnej siatce (patrz add_multigrid_field()); None dla pola
+            wyznaczonego w pełnej rozdzielczości lub wczytanego z pamięci podręcznej.
+        field_engine (dict|None): parametry, którymi wyznaczono pole natężeń metodą add_sound_source() ('engine',
+            'enhanced_realism', 'downsample', 'refine_radius', 'refine_tolerance'); korzysta z nich edit_terrain().
+        field_version (int): licznik zmian natężeń dźwięku, zwiększany przy każdym zapisie natężenia - pozwala
+            wykryć zmianę pola bez porównywania tablic (np. przy przebudowie siatki wizualizacji). Nie obejmuje
+            zapisów bezpośrednio do obiektów CubicMetre() w trybie 'objects'.
 
     Methods:
         add_sound_source: dodaje źródło dźwięku do basenu i definiuje sound_intensity dla każdego wodnego sześcianu.
         add_submarine: dodaje łódź podwodną do basenu.
+        add_fleet: dodaje do basenu flotę łodzi podwodnych.
+        build_flow_field: buduje tablicę kolejnych kroków łodzi podwodnej i liczby kroków do źródła dźwięku.
+        next_position: zwraca kolejny krok łodzi podwodnej z tablicy.
+        steps_to_source: zwraca liczbę ruchów łodzi podwodnej do źródła dźwięku.
+        trace: zwraca całą drogę łodzi podwodnej odczytaną z tablicy.
+        register_sound_source: dodaje kolejne źródło dźwięku, sumując natężenia wszystkich źródeł.
+        remove_sound_source: usuwa zarejestrowane źródło dźwięku.
+        move_sound_source: przesuwa zarejestrowane źródło dźwięku.
+        sound_source_memory: zwraca zużycie pamięci przez pola zarejestrowanych źródeł.
+        sound_source_positions: zwraca współrzędne wszystkich źródeł dźwięku.
+        parallelepiped_dimensions: wyznacza wymiary prostopadłościanu wyboru wierzchołków łamanej.
+        obstacle_runs: zwraca zapamiętane minimalne długości przeszkód terenu w wierszach basenu.
+        invalidate_geometry: usuwa zapamiętane wyniki zależne od terenu.
+        edit_terrain: zmienia wysokość terenu w prostokącie XY, doliczając tylko natężenia, które mogły się zmienić.
+        clear_sound_sources: usuwa wszystkie źródła dźwięku.
+        is_water: sprawdza, czy sześcian o podanych współrzędnych jest wodny.
+        min_water_z: zwraca najniższy wodny sześcian kolumny.
+        get_sound_intensity: zwraca natężenie dźwięku w sześcianie o podanych współrzędnych.
+        set_sound_intensity: definiuje natężenie dźwięku w sześcianie o podanych współrzędnych.
+        neighbour_positions: generuje współrzędne sąsiadów sześcianu.
+        water_mask: zwraca maskę wodnych sześcianów basenu.
+        set_sound_field: definiuje natężenie dźwięku naraz dla wielu sześcianów.
+        material_grid: zwraca tablicę rodzajów materiału basenu.
+        sound_field: zwraca tablicę natężeń dźwięku basenu.
+        from_arrays: tworzy basen w trybie 'arrays' z gotowych tablic.
+        save: zapisuje stan basenu do pliku migawki.
+        load: wczytuje basen z pliku migawki.
+        add_wavefront_field: definiuje natężenia dźwięku silnikiem 'wavefront'.
+        add_curve_field: definiuje natężenia dźwięku silnikiem 'curve'.
+        add_curve_field_parallel: definiuje natężenia dźwięku silnikiem 'curve' w wielu procesach.
+        add_multigrid_field: definiuje natężenia dźwięku na zgrubnej siatce z dokładnym doliczeniem przy źródle
+            i przeszkodach.
 
     """
 
-    def __init__(self, height, heightmap):
+    def __init__(self, height, heightmap, storage='objects', chunk_size=64, resident_chunks=64, directory=None):
         """ Inicjalizacja basenu: wypełnienie metrami sześciennymi, tworzenie referencji między sąsiednimi sześcianami,
         dodanie przeszkód (tworzenie terenu).
 
+        Note:
+            W trybie storage='arrays' basen nie tworzy obiektów CubicMetre(). Rodzaj materiału każdego sześcianu
+            przechowuje się w tablicy uint8 (WATER, TERRAIN, SOURCE), a natężenie dźwięku - w tablicy float32
+            (NaN oznacza niezdefiniowane natężenie). Sąsiedzi wyznaczają się z przesunięć indeksów, a atrybut
+            filling jest widokiem zwracającym lekkie egzemplarze klasy CubicMetreView().
+
+            W trybie storage='chunked' te same tablice są podzielone na bloki chunk_size³ sześcianów, zapisane w pliku
+            zmapowanym do pamięci (ChunkedGrid); w pamięci operacyjnej przebywa naraz co najwyżej resident_chunks
+            bloków każdej z nich. Basen wypełnia się blok po bloku, bez budowania pełnej maski terenu, a silniki
+            'wavefront' i 'curve' przechodzą basen blok po bloku (patrz chunked_wavefront_distances()). Metody
+            zwracające całe pole (water_mask(), material_grid(), sound_field(), build_flow_field()) wczytują jednak
+            cały basen do pamięci.
+
+            W trybie storage='columns' rodzaj materiału opisują tylko wysokości dna kolumn i wyjątki (źródła dźwięku)
+            - ColumnGrid, więc pamięć geometrii basenu rośnie z width × length, a nie z objętością basenu. Natężenia
+            dźwięku przechowuje się jak w trybie 'arrays'; silniki i metody zwracające całe pole budują pełną tablicę
+            materiału tylko na czas obliczeń.
+
+        Args:
+            height (int): wysokość basenu.
+            heightmap (str): ścieżka mapy wysokości (miejsce znajdowania się pliku), jako pliku .jpg.
+            storage (str): tryb przechowywania wypełnienia basenu: 'objects' - trójwymiarowa lista obiektów
+                CubicMetre(), 'arrays' - zwarte tablice NumPy, 'chunked' - tablice podzielone na bloki na dysku,
+                'columns' - wysokości dna kolumn zamiast tablicy materiału.
+            chunk_size (int): tylko w trybie 'chunked' - długość krawędzi bloku.
+            resident_chunks (int): tylko w trybie 'chunked' - maksymalna liczba bloków każdej tablicy w pamięci
+                operacyjnej.
+            directory (str|None): tylko w trybie 'chunked' - katalog plików z blokami; jeżeli None - katalog plików
+                tymczasowych systemu.
+
+        Raises:
+            ValueError: jeżeli podawana wysokość basenu jest niższa lub równa się maksymalnej wysokości terenu,
+             wynikającej z mapy wysokości, albo jeżeli podano nieznany tryb przechowywania.
+
+        """
+
+        assert storage in STORAGE_MODES, ValueError('The storage parameter must be one of ' + str(STORAGE_MODES))
+
+        with phase('terrain_carving', total=1) as progress:
+            heights = load_heightmap(heightmap)  # dwuwymiarowa tablica wysokości "dna" basenu h[y, x]
+            assert height > heights.max(), ValueError('The height parameter must be greater than ' + str(heights.max()))
+            # maska terenu: sześcian (x, y, z) jest ziemny, jeżeli leży poniżej dna h[y, x]
+            # (w trybie 'chunked' wyznacza się osobno dla każdego bloku, a w trybie 'columns' nie wyznacza się wcale)
+            terrain = None if storage in ('chunked', 'columns') else terrain_mask(heights, height)
+            progress.advance()
+
+        width, length = heights.shape  # wyciągam parametry mapy według których zbuduje się basen
+
+        # definiuję wymiary basenu
+        self.height = height  # z
+        self.width = width  # y
+        self.length = length  # x
+        self.storage = storage
+        self.heightmap = heightmap
+        self.floors = np.asarray(heights, dtype=np.int64)
+        self.sound_source = None
+        self.sound_sources = {}
+        self.source_field_sum = None
+        self.next_hop = None
+        self.hops_to_source = None
+        self.field_lod = None
+        self.field_engine = None
+        self.field_version = 0
+        self.lazy_field = None
+        self._obstacle_runs = None
+
+        if storage == 'columns':
+            # Blok, w którym opisuję teren samymi wysokościami dna (ColumnGrid współdzieli tablicę floors z basenem)
+            with phase('fill', total=1) as progress:
+                self.material = ColumnGrid(self.floors, height)
+                self.sound_intensity = np.full((height, width, length), np.nan, dtype=np.float32)
+                self.filling = FillingView(self)
+                progress.advance()
+            return
+
+        if storage == 'arrays':
+            # Blok, w którym alokuję tablice materiału i natężenia dźwięku, od razu zgodnie z mapą wysokości
+            with phase('fill', total=1) as progress:
+                self.material = np.where(terrain, TERRAIN, WATER).astype(np.uint8)
+                self.sound_intensity = np.full((height, width, length), np.nan, dtype=np.float32)
+                self.filling = FillingView(self)
+                progress.advance()
+            return
+
+        if storage == 'chunked':
+            # Blok, w którym wypełniam basen blok po bloku; bloki samej wody zostają z wartością początkową (WATER)
+            self.material = ChunkedGrid((height, width, length), np.uint8, chunk_size, resident_chunks, WATER,
+                                        directory)
+            self.sound_intensity = ChunkedGrid((height, width, length), np.float32, chunk_size, resident_chunks,
+                                               np.nan, directory)
+            self.filling = FillingView(self)
+            with phase('fill', total=int(np.prod(self.material.chunks_shape))) as progress:
+                for _, (z_slice, y_slice, x_slice) in self.material.chunk_slices():
+                    floor = heights[y_slice, x_slice]
+                    if z_slice.start < floor.max():
+                        terrain = np.arange(z_slice.start, z_slice.stop)[:, None, None] < floor[None, :, :]
+                        self.material[z_slice, y_slice, x_slice] = np.where(terrain, TERRAIN, WATER)
+                    progress.advance()  # blok gotowy
+            return
+
+        # Blok, w którym wypełniam basen metrami sześciennymi (wodnymi lub ziemnymi, zgodnie z mapą wysokości):
+        with phase('fill', total=height) as progress:
+            is_water = (~terrain).tolist()
+            self.filling = []
+            for z_position in range(height):
+                layer = []
+                for y_position in range(width):
+                    layer.append([None] * length)
+                self.filling.append(layer)
+
+            for z_position in range(height):
+                for y_position in range(width):
+                    for x_position in range(length):
+                        self.filling[z_position][y_position][x_position] = \
+                            CubicMetre(x_position, y_position, z_position, is_water[z_position][y_position][x_position])
+                progress.advance()  # warstwa gotowa
+
+        # Blok, w którym tworzę referencje pomiędzy sąsiednimi metrami sześciennymi
+        with phase('neighbour_linking', total=height) as progress:
+            change = NEIGHBOUR_OFFSETS
+            for z_position in range(self.height):
+                for y_position in range(self.width):
+                    for x_position in range(self.length):
+                        for i in range(26):
+                            if x_position + change[i][0] < 0 or x_position + change[i][0] > self.length - 1:
+                                continue
+                            if y_position + change[i][1] < 0 or y_position + change[i][1] > self.width - 1:
+                                continue
+                            if z_position + change[i][2] < 0 or z_position + change[i][2] > self.height - 1:
+                                continue
+                            self.filling[z_position][y_position][x_position].neighbours[i] = \
+                            self.filling[z_position + change[i][2]][y_position + change[i][1]][x_position + change[i][0]]
+                progress.advance()  # warstwa gotowa
+
+    def is_water(self, x_position, y_position, z_position):
+        """ Sprawdza, czy metr sześcienny o podanych współrzędnych jest wodny.
+
+        Args:
+            x_position (int): współrzędna sześcianu względem osi X.
+            y_position (int): współrzędna sześcianu względem osi Y.
+            z_position (int): współrzędna sześcianu względem osi Z.
+
+        Returns:
+            bool: True jeżeli sześcian jest wodny, False w przeciwnym przypadku.
+
+        """
+
+        if self.storage == 'columns':
+            return self.material.is_water(x_position, y_position, z_position)
+        if self.storage != 'objects':
+            return bool(self.material[z_position, y_position, x_position] == WATER)
+        return self.filling[z_position][y_position][x_position].is_water
+
+    def min_water_z(self, x_position, y_position, start=1):
+        """ Zwraca najniższy wodny sześcian kolumny (x, y), nie niższy niż start.
+
+        Wysokość dna kolumny (floors) wskazuje pierwszy sześcian ponad terenem; powyżej dna sześcian może nie być
+        wodny tylko jako źródło dźwięku, więc wynik wyznacza się w czasie O(1) zamiast przeglądania kolumny od dołu.
+
+        Args:
+            x_position (int): współrzędna kolumny względem osi X.
+            y_position (int): współrzędna kolumny względem osi Y.
+            start (int): najniższa brana pod uwagę współrzędna Z (domyślnie 1, tak jak w Submarine()).
+
+        Returns:
+            int|None: współrzędna Z sześcianu albo None, jeżeli w kolumnie nie ma wodnego sześcianu.
+
+        """
+
+        if self.storage == 'columns':
+            return self.material.min_water_z(x_position, y_position, start)
+        z_position = max(start, int(self.floors[y_position, x_position]))
+        while z_position < self.height and not self.is_water(x_position, y_position, z_position):
+            z_position += 1
+        return z_position if z_position < self.height else None
+
+    def get_sound_intensity(self, x_position, y_position, z_position):
+        """ Zwraca natężenie dźwięku w metrze sześciennym o podanych współrzędnych.
+
+        Args:
+            x_position (int): współrzędna sześcianu względem osi X.
+            y_position (int): współrzędna sześcianu względem osi Y.
+            z_position (int): współrzędna sześcianu względem osi Z.
+
+        Returns:
+            None|float|int: natężenie dźwięku lub None, jeżeli nie zostało zdefiniowane. Przy polu wyznaczanym
+                na żądanie (lazy_field) natężenie wodnego sześcianu wyznacza się przy pierwszym odczycie.
+
+        """
+
+        if self.storage != 'objects':
+            sound_intensity = self.sound_intensity[z_position, y_position, x_position]
+            sound_intensity = None if np.isnan(sound_intensity) else float(sound_intensity)
+        else:
+            sound_intensity = self.filling[z_position][y_position][x_position].sound_intensity
+        if sound_intensity is None and self.lazy_field is not None and self.is_water(x_position, y_position, z_position):
+            return self.lazy_field.intensity(x_position, y_position, z_position)
+        return sound_intensity
+
+    def set_sound_intensity(self, x_position, y_position, z_position, sound_intensity):
+        """ Definiuje natężenie dźwięku w metrze sześciennym o podanych współrzędnych.
+
+        Args:
+            x_position (int): współrzędna sześcianu względem osi X.
+            y_position (int): współrzędna sześcianu względem osi Y.
+            z_position (int): współrzędna sześcianu względem osi Z.
+            sound_intensity (None|float|int): natężenie dźwięku; None usuwa zdefiniowaną wartość.
+
+        """
+
+        # tablice kolejnych kroków i liczby ruchów (build_flow_field()) przestają być aktualne
+        self.next_hop = None
+        self.hops_to_source = None
+        self.field_version += 1
+        if self.storage != 'objects':
+            self.sound_intensity[z_position, y_position, x_position] = np.nan if sound_intensity is None else sound_intensity
+        else:
+            self.filling[z_position][y_position][x_position].sound_intensity = sound_intensity
+
+    def water_mask(self):
+        """ Zwraca maskę wodnych sześcianów basenu.
+
+        Returns:
+            numpy.ndarray: tablica logiczna [z, y, x]; True dla wodnych sześcianów.
+
+        """
+
+        if self.storage == 'arrays':
+            return self.material == WATER
+        if self.storage in ('chunked', 'columns'):
+            return np.asarray(self.material) == WATER
+        return np.array([[[cube.is_water for cube in row] for row in layer] for layer in self.filling], dtype=bool)
+
+    def material_grid(self):
+        """ Zwraca tablicę rodzajów materiału basenu.
+
+        Returns:
+            numpy.ndarray: tablica uint8 [z, y, x] z wartościami WATER, TERRAIN, SOURCE; w trybie 'arrays' jest to
+                sam atrybut material (bez kopiowania).
+
+        """
+
+        if self.storage == 'arrays':
+            return self.material
+        if self.storage in ('chunked', 'columns'):
+            return np.asarray(self.material)
+        material = np.where(self.water_mask(), WATER, TERRAIN).astype(np.uint8)
+        if hasattr(self, 'sound_sources'):
+            # wszystkie źródła dźwięku (a nie tylko ostatnie), żeby po wczytaniu nie stały się przeszkodami
+            for x_position, y_position, z_position in self.sound_source_positions():
+                material[z_position, y_position, x_position] = SOURCE
+        return material
+
+    def sound_field(self):
+        """ Zwraca tablicę natężeń dźwięku basenu.
+
+        Returns:
+            numpy.ndarray: tablica [z, y, x] natężeń dźwięku (NaN dla niezdefiniowanych); w trybach 'arrays' i 'columns'
+                jest to sam atrybut sound_intensity (bez kopiowania), w trybie 'objects' - nowa tablica float64.
+
+        """
+
+        if self.storage in ('arrays', 'columns'):
+            return self.sound_intensity
+        if self.storage == 'chunked':
+            return np.asarray(self.sound_intensity)
+        return np.array([[[np.nan if cube.sound_intensity is None else cube.sound_intensity for cube in row]
+                          for row in layer] for layer in self.filling], dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, material, sound_intensity=None, floors=None):
+        """ Tworzy basen w trybie storage='arrays' bezpośrednio z gotowych tablic, bez mapy wysokości.
+
+        Args:
+            material (numpy.ndarray): tablica uint8 [z, y, x] rodzajów materiału (WATER, TERRAIN, SOURCE).
+            sound_intensity (numpy.ndarray|None): tablica [z, y, x] natężeń dźwięku; jeżeli None - wszystkie natężenia
+                są niezdefiniowane.
+            floors (numpy.ndarray|None): tablica int64 [y, x] wysokości dna kolumn; jeżeli None - wyznacza się
+                z tablicy material (co wymaga przejrzenia jej w całości).
+
+        Returns:
+            Pool: basen korzystający z podanych tablic (bez kopiowania).
+
+        """
+
+        pool = cls.__new__(cls)
+        pool.height, pool.width, pool.length = material.shape
+        pool.storage = 'arrays'
+        pool.heightmap = None  # basen nie wynika z mapy wysokości
+        pool.material = material
+        pool.floors = column_floors(material) if floors is None else floors
+        pool.sound_intensity = np.full(material.shape, np.nan, dtype=np.float32) if sound_intensity is None else sound_intensity
+        pool.filling = FillingView(pool)
+        pool.sound_source = None
+        pool.sound_sources = {}
+        pool.source_field_sum = None
+        pool.next_hop = None
+        pool.hops_to_source = None
+        pool.field_lod = None
+        pool.field_engine = None
+        pool.field_version = 0
+        pool.lazy_field = None
+        pool._obstacle_runs = None
+        return pool
+
+    def save(self, path):
+        """ Zapisuje stan basenu do pliku migawki (format opisany w snapshot.py): tablice materiału i natężeń dźwięku,
+        źródła dźwięku (razem z polami długości dróg zarejestrowanych źródeł), tablice kolejnych kroków łodzi oraz
+        współrzędne łodzi podwodnej i floty.
+
+        Note:
+            Pole wyznaczane na żądanie (lazy_field) zapisuje się tylko jako parametry - natężenia, których jeszcze
+            nie wyznaczono, po wczytaniu wyznaczą się od nowa.
+
+        Args:
+            path (str): ścieżka pliku migawki.
+
+        """
+
+        arrays = {'material': self.material_grid(), 'sound_intensity': self.sound_field()}
+        sources = []
+        for source_id, source in self.sound_sources.items():
+            arrays['distances_' + str(source_id)] = source.distances
+            sources.append({'id': source_id,
+                            'position': [source.x_position, source.y_position, source.z_position],
+                            'sound_intensity': source.sound_intensity,
+                            'engine': source.engine,
+                            'enhanced_realism': source.enhanced_realism})
+        for name in ('source_field_sum', 'next_hop', 'hops_to_source'):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        submarine = getattr(self, 'submarine', None)
+        fleet = getattr(self, 'fleet', None)
+        if fleet is not None:
+            arrays['fleet_positions'] = fleet.positions
+
+        metadata = {'storage': self.storage,
+                    'heightmap': self.heightmap,
+                    'sound_source': None if self.sound_source is None else
+                    [self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position],
+                    'sound_sources': sources,
+                    'field_lod': self.field_lod,
+                    'field_engine': self.field_engine,
+                    'lazy_field': None if self.lazy_field is None else
+                    {'enhanced_realism': self.lazy_field.enhanced_realism, 'cache_size': self.lazy_field.cache_size},
+                    'submarine': None if submarine is None else
+                    [submarine.x_position, submarine.y_position, submarine.z_position]}
+        write_snapshot(path, arrays, metadata)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Wczytuje basen z pliku migawki zapisanego metodą save().
+
+        Note:
+            Wczytany basen jest zawsze w trybie storage='arrays' (tryb, w którym go zapisano, jest w atrybucie
+            saved_storage). Przy mmap=True tablice mapują się do pamięci bez kopiowania, w trybie kopiowania przy
+            zapisie: wiele procesów współdzieli te same strony pliku, a zmiany basenu nie trafiają do pliku.
+
+        Args:
+            path (str): ścieżka pliku migawki.
+            mmap (bool): jeżeli True - tablice mapują się do pamięci; w przeciwnym przypadku wczytują się do pamięci
+                operacyjnej.
+
+        Returns:
+            Pool: wczytany basen.
+
+        Raises:
+            ValueError: jeżeli plik nie jest migawką basenu albo ma nieobsługiwaną wersję formatu.
+
+        """
+
+        arrays, metadata = read_snapshot(path, mmap)
+        pool = cls.from_arrays(arrays['material'], arrays['sound_intensity'])
+        pool.heightmap = metadata['heightmap']
+        pool.saved_storage = metadata['storage']
+        pool.field_lod = metadata['field_lod']
+        pool.field_engine = metadata.get('field_engine')
+        for source in metadata['sound_sources']:
+            pool.sound_sources[source['id']] = SoundSource(*source['position'], source['sound_intensity'],
+                                                           arrays['distances_' + str(source['id'])],
+                                                           source['engine'], source['enhanced_realism'])
+        for name in ('source_field_sum', 'next_hop', 'hops_to_source'):
+            setattr(pool, name, arrays.get(name))
+        if metadata['sound_source'] is not None:
+            x_position, y_position, z_position = metadata['sound_source']
+            pool.sound_source = pool.filling[z_position][y_position][x_position]
+        if metadata['lazy_field'] is not None:
+            pool.lazy_field = LazyField(pool, **metadata['lazy_field'])
+        if metadata['submarine'] is not None:
+            # współrzędne odtwarzają się bez losowania z konstruktora Submarine()
+            pool.submarine = Submarine.__new__(Submarine)
+            pool.submarine.x_position, pool.submarine.y_position, pool.submarine.z_position = metadata['submarine']
+            pool.submarine.pool = pool
+        if 'fleet_positions' in arrays:
+            pool.fleet = Fleet(pool, np.array(arrays['fleet_positions']))
+        return pool
+
+    def set_sound_field(self, mask, sound_intensities):
+        """ Definiuje natężenie dźwięku naraz dla wszystkich sześcianów wskazanych przez maskę.
+
+        Args:
+            mask (numpy.ndarray): tablica logiczna [z, y, x] wskazująca sześciany do zmiany.
+            sound_intensities (numpy.ndarray): natężenia dźwięku dla kolejnych sześcianów maski
+                (w kolejności numpy.argwhere(mask)).
+
+        """
+
+        # tablice kolejnych kroków i liczby ruchów (build_flow_field()) przestają być aktualne
+        self.next_hop = None
+        self.hops_to_source = None
+        self.field_version += 1
+        if self.storage in ('arrays', 'columns'):
+            self.sound_intensity[mask] = sound_intensities
+        elif self.storage == 'chunked':
+            field = np.asarray(self.sound_intensity)
+            field[mask] = sound_intensities
+            self.sound_intensity[...] = field
+        else:
+            for (z_position, y_position, x_position), value in zip(np.argwhere(mask).tolist(), np.asarray(sound_intensities).tolist()):
+                # NaN oznacza niezdefiniowane natężenie dźwięku
+                self.filling[z_position][y_position][x_position].sound_intensity = None if value != value else value
+
+    def neighbour_positions(self, x_position, y_position, z_position):
+        """ Generator współrzędnych sąsiadów metru sześciennego, wyznaczanych z przesunięć indeksów.
+
+        Args:
+            x_position (int): współrzędna sześcianu względem osi X.
+            y_position (int): współrzędna sześcianu względem osi Y.
+            z_position (int): współrzędna sześcianu względem osi Z.
+
+        Yields:
+            tuple: (i, (x, y, z)) - numer sąsiada w kolejności NEIGHBOUR_OFFSETS i jego współrzędne;
+                pomijane są sąsiedzi spoza basenu.
+
+        """
+
+        for i, (dx, dy, dz) in enumerate(NEIGHBOUR_OFFSETS):
+            x, y, z = x_position + dx, y_position + dy, z_position + dz
+            if 0 <= x < self.length and 0 <= y < self.width and 0 <= z < self.height:
+                yield i, (x, y, z)
+
+    def sound_source_position(self, x_position=None, y_position=None, z_position=None):
+        """ Wyznacza współrzędne nowego źródła dźwięku; jeżeli parametry nie zostały podane (lub wychodzą poza basen),
+        współrzędne X i Y definiują się losowo, a źródło "kładzie się" na samo dno.
+
+        Args:
+            x_position (int|None): współrzędna źródła dźwięku względem osi X.
+            y_position (int|None): współrzędna źródła dźwięku względem osi Y.
+            z_position (int|None): współrzędna źródła dźwięku względem osi Z.
+
+        Returns:
+            tuple: współrzędne (x, y, z) źródła dźwięku.
+
+        """
+
+        # Blok definiowania współrzędnych źródła dźwięku
+        # (jeżeli parametry nie zostały podane, współrzędne definiują się losowo):
+        if x_position is not None and 0 <= x_position < self.length:  # względem osi X
+            x_position = x_position
+        else:
+            x_position = randint(0, self.length - 1)
+
+        if y_position is not None and 0 <= y_position < self.width:  # względem osi Y
+            y_position = y_position
+        else:
+            y_position = randint(0, self.width - 1)
+
+        # wyznaczam minimalnie możliwe położenie względem pionowej osi (Z)
+        z_min = self.min_water_z(x_position, y_position)
+        # "kładę" źródło dźwięku na samo dno, lub na podaną wysokość
+        if z_position is not None and z_min <= z_position < self.height:
+            z_position = z_position
+        else:
+            z_position = z_min
+
+        return x_position, y_position, z_position
+
+    def add_sound_source(self, sound_intensity=1000, x_position=None, y_position=None, z_position=None, enhanced_realism=True,
+                         engine='curve', workers=1, cache=None, downsample=1, refine_radius=None, lazy=False,
+                         lazy_cache_size=65536, line_of_sight=False, refine_tolerance=0.03):
+        """ Metoda dodaje źródło dźwięku do basenu i definiuje parametr sound_intensity dla każdego wodnego sześcianu
+        (natężenie dźwięku w nim).
+
+        Note:
+            Silnik 'wavefront' nie korzysta z parametru enhanced_realism: fala zawsze ugina się najkrótszą drogą
+            po wodnych sześcianach, zarówno nad przeszkodą, jak i z jej boku.
+
+        Args:
+            sound_intensity (float|int): natężenie dźwięku produkowanego przez źródło dźwięku.
+            x_position (int|None): współrzędna źródła dźwięku względem osi X.
+            y_position (int|None): współrzędna źródła dźwięku względem osi Y.
+            z_position (int|None): współrzędna źródła dźwięku względem osi Z.
+            enhanced_realism (bool): jeżeli True - bardziej realistyczne ugięcie fal dźwiękowych wokół przeszkód,
+                ale gigantyczna złożoność obliczeniowa. W innym przypadku - względnie niska złożoność obliczeniowa, ale
+                mało realistyczne rozchodzenie się fal.
+            engine (str): silnik wyznaczania długości drogi fali: 'curve' - funkcja shortest_curve() dla każdego
+                wodnego sześcianu osobno, 'wavefront' - funkcja wavefront_distances() dla całego basenu naraz.
+            workers (int): liczba procesów, między które silnik 'curve' rozdziela warstwy basenu (1 - bez procesów
+                pobocznych). Wynik jest identyczny z obliczeniami szeregowymi.
+            cache (FieldCache|None): trwała pamięć podręczna pól natężeń dźwięku (patrz field_cache.py). Jeżeli
+                podana, a pole dla tej samej mapy wysokości, wysokości basenu, źródła dźwięku i silnika zostało już
+                wyznaczone, to zamiast obliczeń wczytuje się je z dysku; w przeciwnym przypadku wyznaczone pole
+                zapisuje się do pamięci podręcznej.
+            downsample (int): współczynnik zmniejszenia rozdzielczości (1 - pełna rozdzielczość). Dla downsample > 1
+                pole wyznacza się na zgrubnej siatce i doliczą się dokładnie tylko sześciany przy źródle dźwięku
+                i tam, gdzie interpolacja zgrubnej siatki jest niedokładna (patrz add_multigrid_field()).
+            refine_radius (int|None): promień otoczenia źródła dźwięku, wyznaczanego w pełnej rozdzielczości
+                (tylko dla downsample > 1); jeżeli None - 2 * downsample.
+            lazy (bool): jeżeli True - natężenia nie wyznaczają się od razu, tylko przy pierwszym odczycie każdego
+                sześcianu (patrz LazyField); tylko dla silnika 'curve' w pełnej rozdzielczości, bez pamięci podręcznej.
+            lazy_cache_size (int|None): liczba natężeń zapamiętywanych przez pole wyznaczane na żądanie.
+            line_of_sight (bool): tylko dla silnika 'curve' w pełnej rozdzielczości, bez pola na żądanie - jeżeli True,
+                sześciany widoczne ze źródła dźwięku (line_of_sight_mask()) otrzymują długość drogi fali równą
+                odległości w linii prostej, a shortest_curve() wyznacza się tylko dla zasłoniętych sześcianów. Wynik
+                różni się od domyślnego: łamana shortest_curve() nie jest prosta nawet bez przeszkód.
+            refine_tolerance (float): dopuszczalny szacowany błąd interpolacji zgrubnej siatki (tylko dla
+                downsample > 1, patrz add_multigrid_field()).
+
+        Raises:
+            ValueError: jeżeli podano nieznany silnik lub współczynnik zmniejszenia rozdzielczości albo pole
+                na żądanie z innym silnikiem niż 'curve' lub z downsample > 1.
+
+        """
+
+        assert engine in ENGINES, ValueError('The engine parameter must be one of ' + str(ENGINES))
+        assert int(downsample) == downsample >= 1, ValueError('The downsample parameter must be a positive integer.')
+        assert not lazy or (engine == 'curve' and downsample == 1), \
+            ValueError("A lazy field requires engine='curve' and downsample=1.")
+
+        if self.sound_source is not None or self.sound_sources:
+            # usuwam poprzednie źródła dźwięku razem z ich natężeniami, żeby nie zostały nieaktualne wartości
+            self.clear_sound_sources()
+        x_position, y_position, z_position = self.sound_source_position(x_position, y_position, z_position)
+
+        # dodaję do basenu źródło dźwięku, zastępując nim wodny metr sześcienny o tych samych współrzędnych
+        self.set_sound_intensity(x_position, y_position, z_position, sound_intensity)
+        if self.storage != 'objects':
+            self.material[z_position, y_position, x_position] = SOURCE
+        else:
+            self.filling[z_position][y_position][x_position].is_water = False
+        self.sound_source = self.filling[z_position][y_position][x_position]
+        line_of_sight = bool(line_of_sight) and engine == 'curve' and downsample == 1 and not lazy
+        self.field_engine = {'engine': engine, 'enhanced_realism': enhanced_realism, 'downsample': downsample,
+                             'refine_radius': refine_radius, 'refine_tolerance': refine_tolerance,
+                             'line_of_sight': line_of_sight}
+
+        if lazy:
+            self.lazy_field = LazyField(self, enhanced_realism, lazy_cache_size)
+            return
+
+        cache_key = None
+        if cache is not None and self.heightmap is not None:
+            # pole natężeń zależy tylko od mapy wysokości, wysokości basenu, źródła dźwięku i silnika
+            cache_key = cache.key(self.heightmap, self.height, (x_position, y_position, z_position), sound_intensity,
+                                  None if engine == 'wavefront' else enhanced_realism, engine, ENGINE_VERSIONS[engine],
+                                  np.float64 if self.storage == 'objects' else np.float32,
+                                  lod=(downsample, refine_radius, refine_tolerance) if downsample > 1 else None,
+                                  line_of_sight=line_of_sight)
+            field = cache.load(cache_key)
+            count('field_cache_misses' if field is None else 'field_cache_hits')
+            if field is not None:
+                with phase('field_computation', total=1) as progress:
+                    defined = ~np.isnan(field)
+                    self.set_sound_field(defined, field[defined])
+                    progress.advance()
+                return
+
+        if downsample > 1:
+            self.add_multigrid_field(downsample, engine, enhanced_realism, refine_radius, refine_tolerance)
+        elif engine == 'wavefront':
+            self.add_wavefront_field()
+        else:
+            self.add_curve_field(enhanced_realism, workers, line_of_sight)
+
+        if cache_key is not None:
+            cache.store(cache_key, self.sound_field())
+
+    def add_wavefront_field(self):
+        """ Definiuje natężenie dźwięku dla każdego wodnego sześcianu silnikiem 'wavefront': długości dróg fali
+        wyznaczają się jednym przejściem czoła fali od źródła dźwięku (patrz wavefront_distances()).
+
+        Note:
+            Wymaga wcześniej dodanego źródła dźwięku (atrybut sound_source).
+
+        """
+
+        ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+        if self.storage == 'chunked':
+            distances = chunked_wavefront_distances(self.material, ss_xyz)
+            self.next_hop = None
+            self.hops_to_source = None
+            with phase('field_computation', total=int(np.prod(self.material.chunks_shape))) as progress:
+                for index, slices in self.material.chunk_slices():
+                    water = self.material[slices] == WATER
+                    if water.any():
+                        field = self.sound_intensity[slices]
+                        field[water] = self.sound_source.sound_intensity / distances[slices][water] ** 2
+                        self.sound_intensity[slices] = field
+                    progress.advance()  # blok gotowy
+            distances.close()
+            return
+
+        with phase('field_computation', total=1) as progress:
+            water = self.water_mask()
+            distances = wavefront_distances(water, ss_xyz)
+            self.set_sound_field(water, self.sound_source.sound_intensity / distances[water] ** 2)
+            progress.advance()
+
+    def add_multigrid_field(self, downsample, engine='wavefront', enhanced_realism=True, refine_radius=None,
+                            refine_tolerance=0.03):
+        """ Definiuje natężenie dźwięku dla każdego wodnego sześcianu na zgrubnej siatce (level of detail).
+
+        Teren basenu zmniejsza się downsample razy wzdłuż każdej osi (blok downsample³ sześcianów jest przeszkodą,
+        jeżeli ponad połowa jego sześcianów jest ziemna), na zgrubnej siatce podanym silnikiem wyznaczają się długości
+        dróg fali, a następnie interpoluje się je (trójliniowo, po osiągalnych blokach) do pełnej rozdzielczości.
+        W pełnej rozdzielczości doliczają się tylko:
+            - sześciany w promieniu refine_radius od źródła dźwięku (tam błąd względny zgrubnej siatki jest największy),
+            - bloki, w których szacowany błąd interpolacji (interpolation_errors()) przekracza refine_tolerance -
+              na granicach cienia przeszkód i przy zakrętach drogi fali,
+            - wodne sześciany w blokach, które na zgrubnej siatce są przeszkodą, oraz w blokach z nimi sąsiadujących
+              (pas jednego bloku wzdłuż powierzchni terenu - tam zgrubna siatka nie odwzorowuje wąskich przejść),
+            - sześciany, dla których interpolacja nie daje wyniku.
+        Silnik 'wavefront' dolicza je jednym przejściem czoła fali ograniczonym do tych sześcianów, startując ze źródła
+        i z długości interpolowanych na granicy obszaru; silnik 'curve' - funkcją shortest_curve() dla każdego z nich.
+
+        Blok będący przeszkodą już przy jednym ziemnym sześcianie (max-pooling) zawyża przeszkody i długości dróg
+        w całym basenie, a przy płaskim dnie lub gęstych przeszkodach zamyka niemal całą zgrubną siatkę - stąd próg
+        połowy bloku. Pomiar silnikiem 'wavefront' (benchmark.py lod; przyspieszenie względem pełnej rozdzielczości,
+        błąd względny natężeń p95 / maks.), mapy syntetyczne wysokości 16 z 10% przeszkód:
+            - 128x128: downsample=2 - 3.1x, 1.9% / 23%; downsample=4 - 7.3x, 3.7% / 17%; downsample=8 - 3.0x,
+              6.4% / 16%,
+            - 256x256: downsample=2 - 2.8x, 1.4% / 26%; downsample=4 - 12x, 2.6% / 21%.
+        Na małych mapach z Heightmaps/ (do 50x50) zgrubna siatka ma za mało bloków, żeby się opłacić: heightmap40.jpg,
+        downsample=2 - 1.6x, 4.3% / 17%; downsample=4 - 1.1x, 4.8% / 32%; na heightmap_robocik.jpg niemal cały
+        basen liczy się w pełnej rozdzielczości (wolniej niż bez zgrubnej siatki).
+
+        Note:
+            Wymaga wcześniej dodanego źródła dźwięku (atrybut sound_source). Opis wyniku (współczynnik, wymiary zgrubnej
+            siatki, liczba doliczonych sześcianów) zapisuje się w atrybucie field_lod. Błąd względem pełnej
+            rozdzielczości mierzy benchmark.py lod.
+
+        Args:
+            downsample (int): współczynnik zmniejszenia rozdzielczości (> 1).
+            engine (str): silnik wyznaczania długości drogi fali ('curve' albo 'wavefront').
+            enhanced_realism (bool): tryb realizmu silnika 'curve'.
+            refine_radius (int|None): promień (w sześcianach, w metryce Czebyszewa) otoczenia źródła dźwięku,
+                wyznaczanego w pełnej rozdzielczości; jeżeli None - 2 * downsample.
+            refine_tolerance (float): dopuszczalny szacowany błąd względny interpolacji stosunku długości drogi fali
+                do odległości w linii prostej; mniejszy - dokładniej, ale więcej sześcianów w pełnej rozdzielczości.
+
+        """
+
+        if refine_radius is None:
+            refine_radius = 2 * downsample
+        ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+        material = self.material_grid()
+        water = material == WATER
+
+        # zgrubna siatka: blok jest przeszkodą, jeżeli ponad połowa jego sześcianów jest ziemna
+        blocked = block_fraction(material == TERRAIN, downsample) > 0.5
+        coarse = Pool.from_arrays(np.where(blocked, TERRAIN, WATER).astype(np.uint8))
+        # źródłem na zgrubnej siatce jest blok zawierający źródło (fala wychodzi z niego, nawet jeżeli jest przeszkodą)
+        coarse_distances = coarse.source_distances(tuple(coordinate // downsample for coordinate in ss_xyz), engine,
+                                                   enhanced_realism)
+        coarse_distances[blocked] = inf
+
+        with phase('field_computation', total=2) as progress:
+            # interpoluje się stosunek długości drogi do odległości w linii prostej: zmienia się on wolniej niż sama
+            # długość drogi i nie zależy od przesunięcia źródła względem środka jego bloku
+            block_centres = [np.arange(size) * downsample + (downsample - 1) / 2 for size in blocked.shape]
+            source_centre = [centres[coordinate // downsample] for centres, coordinate in zip(block_centres, ss_xyz[::-1])]
+            coarse_straight = straight_distances(block_centres, source_centre)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where(coarse_straight > 0, coarse_distances * downsample / coarse_straight, inf)
+            straight = straight_distances([np.arange(size) for size in water.shape], ss_xyz[::-1])
+            with np.errstate(invalid='ignore'):
+                # odległość nie może być mniejsza od 1 (najbliższy sąsiad źródła)
+                estimate = np.maximum(straight * upsample_distances(ratio, water.shape, downsample), 1)
+            progress.advance()
+
+            # obszar doliczany w pełnej rozdzielczości - bloki przy przeszkodach i bloki z niedokładną interpolacją
+            inaccurate = dilate(blocked) | (interpolation_errors(ratio) > refine_tolerance)
+            z_blocks, y_blocks, x_blocks = (np.arange(size) // downsample for size in water.shape)
+            refine = inaccurate[np.ix_(z_blocks, y_blocks, x_blocks)] | ~np.isfinite(estimate)
+            refine[max(ss_xyz[2] - refine_radius, 0):ss_xyz[2] + refine_radius + 1,
+                   max(ss_xyz[1] - refine_radius, 0):ss_xyz[1] + refine_radius + 1,
+                   max(ss_xyz[0] - refine_radius, 0):ss_xyz[0] + refine_radius + 1] = True
+            refine &= water
+
+            distances = estimate
+            if engine == 'wavefront':
+                # czoło fali startuje ze źródła i z interpolowanych długości sześcianów otaczających obszar
+                boundary = dilate(refine) & ~refine & water & np.isfinite(estimate)
+                seeds = np.where(boundary, estimate, inf)
+                refined = wavefront_distances(refine, ss_xyz, seeds)[refine]
+                distances[refine] = np.where(np.isfinite(refined), refined, estimate[refine])
+            else:
+                prl_lw = self.parallelepiped_dimensions()
+                for z_position, y_position, x_position in np.argwhere(refine).tolist():
+                    distances[z_position, y_position, x_position] = shortest_curve(
+                        self, ss_xyz, (x_position, y_position, z_position), prl_lw, enhanced_realism)
+            progress.advance()
+
+        self.set_sound_field(water, self.sound_source.sound_intensity / distances[water] ** 2)
+        self.field_lod = {'downsample': downsample,
+                          'refine_radius': refine_radius,
+                          'refine_tolerance': refine_tolerance,
+                          'coarse_shape': blocked.shape,
+                          'coarse_voxels': int((~blocked).sum()),
+                          'refined_voxels': int(refine.sum()),
+                          'water_voxels': int(water.sum())}
+
+    def add_curve_field(self, enhanced_realism=True, workers=1, line_of_sight=False):
+        """ Definiuje natężenie dźwięku dla każdego wodnego sześcianu silnikiem 'curve': długość drogi fali do każdego
+        sześcianu wyznacza się osobno funkcją shortest_curve().
+
+        Note:
+            Wymaga wcześniej dodanego źródła dźwięku (atrybut sound_source).
+
+        Args:
+            enhanced_realism (bool): tryb realizmu funkcji shortest_curve().
+            workers (int): liczba procesów, między które rozdzielane są warstwy basenu (1 - bez procesów pobocznych).
+            line_of_sight (bool): jeżeli True - sześciany widoczne ze źródła dźwięku otrzymują natężenie z odległości
+                w linii prostej, a shortest_curve() wyznacza się tylko dla pozostałych (patrz line_of_sight_mask()).
+
+        """
+
+        prl_lw = self.parallelepiped_dimensions()
+        ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+        visible = self.line_of_sight_mask(ss_xyz) if line_of_sight else None
+        if visible is not None:
+            # widoczne sześciany - odległość w linii prostej, bez wyszukiwania łamanej
+            distances = straight_distances([np.arange(self.height), np.arange(self.width), np.arange(self.length)],
+                                           ss_xyz[::-1])
+            self.set_sound_field(visible, self.sound_source.sound_intensity / distances[visible] ** 2)
+
+        # definiuję natężenie dźwięku dla każdego wodnego metru sześciennego w basenie
+        if workers > 1:
+            self.add_curve_field_parallel(prl_lw, enhanced_realism, workers, visible)
+            return
+        if self.storage == 'chunked':
+            # blok po bloku: kolejne sześciany korzystają z tych samych bloków w pamięci operacyjnej
+            with phase('field_computation', total=int(np.prod(self.material.chunks_shape))) as progress:
+                for index, (z_slice, y_slice, x_slice) in self.material.chunk_slices():
+                    water = self.material[z_slice, y_slice, x_slice] == WATER
+                    if visible is not None:
+                        water &= ~visible[z_slice, y_slice, x_slice]
+                    for z, y, x in np.argwhere(water).tolist():
+                        cube_xyz = (x + x_slice.start, y + y_slice.start, z + z_slice.start)
+                        curve_length = shortest_curve(self, ss_xyz, cube_xyz, prl_lw, enhanced_realism)
+                        self.set_sound_intensity(*cube_xyz, self.sound_source.sound_intensity / (curve_length ** 2))
+                    progress.advance()  # blok gotowy
+            return
+        with phase('field_computation', total=self.height) as progress:
+            for z_position in range(self.height):
+                skip = None if visible is None else visible[z_position]
+                for x_position, y_position, curve_length in curve_layer_lengths(self, z_position, prl_lw, enhanced_realism,
+                                                                                 skip):
+                    self.set_sound_intensity(x_position, y_position, z_position,
+                                             self.sound_source.sound_intensity / (curve_length ** 2))
+                progress.advance()  # warstwa gotowa
+
+    def line_of_sight_mask(self, ss_xyz=None):
+        """ Zwraca maskę wodnych sześcianów widocznych ze źródła dźwięku: odcinek między środkiem źródła a środkiem
+        sześcianu nie przecina terenu (patrz line_of_sight_heights()).
+
+        Args:
+            ss_xyz (tuple|None): współrzędne źródła dźwięku; jeżeli None - współrzędne sound_source.
+
+        Returns:
+            numpy.ndarray|None: tablica logiczna [z, y, x]; None, jeżeli teren nie jest opisany samymi wysokościami
+                dna kolumn (nad dnem leżą ziemne sześciany, np. basen z nawisami z from_arrays()) - wtedy widoczność
+                się nie wyznacza.
+
+        """
+
+        if ss_xyz is None:
+            ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+        layers = np.arange(self.height)[:, None, None]
+        if self.storage == 'columns':
+            if any(value == TERRAIN for value in self.material.overrides.values()):
+                return None
+        elif (self.material_grid()[layers >= self.floors[None, :, :]] == TERRAIN).any():
+            return None
+        return self.water_mask() & (layers > line_of_sight_heights(self.floors, ss_xyz)[None, :, :])
+
+    def parallelepiped_dimensions(self):
+        """ Wyznacza wymiary prostopadłościanu, w ramach którego funkcja shortest_curve() dokonuje wyboru kolejnego
+        wierzchołka łamanej linii - minimalne długości ciągłych przeszkód (niewodnych sześcianów) wzdłuż osi X i Y.
+
+        Note:
+            Minimalne długości przeszkód w każdym wierszu terenu wyznaczają się raz (obstacle_runs()) i są
+            zapamiętywane do zmiany geometrii basenu. Źródła dźwięku, które też są przeszkodami, uwzględnia się
+            przeliczając tylko wiersze, w których leżą, dlatego kolejne położenia źródła nie wymagają
+            ponownego skanowania całego basenu.
+
+        Returns:
+            tuple: (parallelepiped_length, parallelepiped_width) - wymiary prostopadłościanu względem osi X i Y.
+
+        """
+
+        with phase('obstacle_sizing', total=1) as progress:
+            x_runs, y_runs = self.obstacle_runs()
+            x_runs, y_runs = x_runs.copy(), y_runs.copy()
+
+            for x_position, y_position, z_position in self.sound_source_positions():
+                # przeliczam wiersz wzdłuż X i kolumnę wzdłuż Y, w których leży źródło dźwięku
+                x_line = np.array([not self.is_water(x, y_position, z_position) for x in range(self.length)])
+                y_line = np.array([not self.is_water(x_position, y, z_position) for y in range(self.width)])
+                x_runs[z_position, y_position] = min_obstacle_runs(x_line)
+                y_runs[z_position, x_position] = min_obstacle_runs(y_line)
+            progress.advance()
+
+        return int(x_runs.min()), int(y_runs.min())
+
+    def obstacle_runs(self):
+        """ Zwraca minimalne długości ciągłych przeszkód terenu w każdym wierszu basenu wzdłuż osi X i Y.
+
+        Note:
+            Wynik jest zapamiętywany w basenie; po zmianie terenu trzeba wywołać invalidate_geometry().
+
+        Returns:
+            tuple: (x_runs, y_runs) - tablice [z, y] i [z, x] minimalnych długości przeszkód (długość basenu wzdłuż
+                danej osi, jeżeli w wierszu nie ma przeszkód).
+
+        """
+
+        if self._obstacle_runs is None and self.storage == 'chunked':
+            # warstwa po warstwie, bez wczytywania całego basenu
+            x_runs = np.empty((self.height, self.width), dtype=np.int64)
+            y_runs = np.empty((self.height, self.length), dtype=np.int64)
+            for z_position in range(self.height):
+                terrain = self.material[z_position] == TERRAIN  # źródła uwzględnia parallelepiped_dimensions()
+                x_runs[z_position] = min_obstacle_runs(terrain)
+                y_runs[z_position] = min_obstacle_runs(terrain.T)
+            self._obstacle_runs = (x_runs, y_runs)
+        elif self._obstacle_runs is None:
+            terrain = ~self.water_mask()
+            for x_position, y_position, z_position in self.sound_source_positions():
+                terrain[z_position, y_position, x_position] = False  # źródła uwzględnia parallelepiped_dimensions()
+            self._obstacle_runs = (min_obstacle_runs(terrain), min_obstacle_runs(terrain.transpose(0, 2, 1)))
+        return self._obstacle_runs
+
+    def invalidate_geometry(self):
+        """ Usuwa zapamiętane wyniki zależne od terenu basenu; trzeba wywołać po każdej zmianie terenu. """
+
+        self._obstacle_runs = None
+        if self.lazy_field is not None:
+            self.lazy_field.invalidate()
+
+    def edit_terrain(self, x_position, y_position, heights):
+        """ Zmienia wysokość terenu (dna) w prostokącie płaszczyzny XY istniejącego basenu, np. dodaje wrak albo pogłębia
+        kanał, bez budowania basenu od nowa.
+
+        Rodzaj materiału zmienia się tylko w edytowanych kolumnach, a zapamiętane długości przeszkód (obstacle_runs())
+        - tylko w wierszach basenu, które przecinają prostokąt. Natężenia dźwięku doliczają się tylko dla sześcianów,
+        których droga fali mogła się zmienić:
+            - silnik 'wavefront' (oraz źródła zarejestrowane tym silnikiem): długości dróg aktualizują się dynamicznie
+              - unieważnia się sześciany, których wszystkie najkrótsze drogi przechodziły przez nowy teren, po czym czoło
+              fali startuje z granicy unieważnionego obszaru i z nowych wodnych sześcianów, rozchodząc się tylko tam,
+              gdzie drogi się skracają (patrz update_wavefront_distances()),
+            - silnik 'curve': kolejne wierzchołki łamanej nie oddalają się od celu w płaszczyźnie XY, więc
+              shortest_curve() liczy się ponownie tylko dla kolumn, z których łamana może sięgnąć edytowanego prostokąta
+              (patrz curve_dirty_columns()); jeżeli zmienią się wymiary prostopadłościanu wyboru - dla całego basenu.
+        Pole zgrubnej siatki (downsample > 1) wyznacza się od nowa w całości, a pole na żądanie (lazy_field) traci
+        zapamiętane natężenia.
+
+        Note:
+            Edytowany basen przestaje odpowiadać pliku mapy wysokości, dlatego atrybut heightmap przyjmuje wartość None
+            (pole nie trafia już do trwałej pamięci podręcznej). Tablica kolejnych kroków łodzi (next_hop) przestaje
+            być aktualna.
+
+        Args:
+            x_position (int): współrzędna X lewego górnego narożnika prostokąta.
+            y_position (int): współrzędna Y lewego górnego narożnika prostokąta.
+            heights (numpy.ndarray|list|int): nowe wysokości dna h[y, x] w prostokącie (tablica dwuwymiarowa)
+                albo jedna wysokość dla kolumny (x_position, y_position).
+
+        Returns:
+            dict: 'changed_voxels' - liczba sześcianów, które zmieniły rodzaj materiału, 'recomputed_voxels' - liczba
+                sześcianów, dla których doliczono natężenie dźwięku.
+
+        Raises:
+            ValueError: jeżeli prostokąt wychodzi poza basen, nowa wysokość nie jest niższa od wysokości basenu albo
+                nowy teren przykryłby źródło dźwięku.
+
+        """
+
+        heights = np.atleast_2d(np.asarray(heights, dtype=np.int64))
+        y_slice = slice(y_position, y_position + heights.shape[0])
+        x_slice = slice(x_position, x_position + heights.shape[1])
+        assert 0 <= x_position and x_slice.stop <= self.length and 0 <= y_position and y_slice.stop <= self.width, \
+            ValueError('The edited region must lie within the pool.')
+        assert 0 <= heights.min() and heights.max() < self.height, \
+            ValueError('The new heights must be in the range [0, ' + str(self.height) + ').')
+        for x, y, z in self.sound_source_positions():
+            assert not (y_slice.start <= y < y_slice.stop and x_slice.start <= x < x_slice.stop) or \
+                z >= heights[y - y_slice.start, x - x_slice.start], \
+                ValueError('The new terrain must not cover a sound source.')
+
+        old_terrain = self._terrain_region(y_slice, x_slice)
+        new_terrain = terrain_mask(heights, self.height)
+        changed_region = old_terrain != new_terrain
+        changed_count = int(changed_region.sum())
+        if not changed_count:
+            return {'changed_voxels': 0, 'recomputed_voxels': 0}
+
+        single_field = self.sound_source is not None and not self.sound_sources and self.field_engine is not None
+        curve_field = single_field and self.field_engine['engine'] == 'curve' and self.lazy_field is None and \
+            self.field_engine['downsample'] == 1
+        if curve_field:
+            prl_before = self.parallelepiped_dimensions()
+            visible_before = self.line_of_sight_mask() if self.field_engine.get('line_of_sight') else None
+        registered_before = {source_id: self._registered_scratch(source).parallelepiped_dimensions()
+                             for source_id, source in self.sound_sources.items() if source.engine == 'curve'}
+        if single_field and self.field_engine['engine'] == 'wavefront' and self.field_engine['downsample'] == 1:
+            # długości dróg odtwarzam z natężeń przed edycją (I = S / d²); źródło ma długość 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distances = np.sqrt(self.sound_source.sound_intensity / self.sound_field().astype(np.float64))
+            distances[~np.isfinite(distances)] = inf
+            distances[self.sound_source.z_position, self.sound_source.y_position, self.sound_source.x_position] = 0.0
+
+        # teren: zmieniam rodzaj materiału tylko w zmienionych sześcianach prostokąta (w trybie 'columns' wystarczy
+        # zmiana wysokości dna - ColumnGrid współdzieli tablicę floors z basenem)
+        if self.storage != 'columns':
+            for z, y, x in np.argwhere(changed_region).tolist():
+                x, y = x + x_slice.start, y + y_slice.start
+                if self.storage != 'objects':
+                    self.material[z, y, x] = TERRAIN if new_terrain[z, y - y_slice.start, x - x_slice.start] else WATER
+                else:
+                    self.filling[z][y][x].is_water = not new_terrain[z, y - y_slice.start, x - x_slice.start]
+        self.floors[y_slice, x_slice] = heights
+        self._update_obstacle_runs(y_slice, x_slice)
+        self.heightmap = None
+        self.next_hop = None
+        self.hops_to_source = None
+        if self.lazy_field is not None:
+            self.lazy_field.invalidate()
+
+        changed = np.zeros((self.height, self.width, self.length), dtype=bool)
+        changed[:, y_slice, x_slice] = changed_region
+        water = self.water_mask()
+        recomputed = np.zeros_like(changed)
+
+        if self.sound_sources:
+            # źródła zarejestrowane: aktualizuję długości dróg każdego źródła i sumę natężeń tylko tam, gdzie się zmieniły
+            for source_id, source in self.sound_sources.items():
+                distances = source.distances.astype(np.float64)
+                if source.engine == 'wavefront':
+                    passable = self.material_grid() != TERRAIN  # inne źródła nie są przeszkodą (source_distances())
+                    touched = update_wavefront_distances(distances, passable, changed)
+                else:
+                    touched = self._update_curve_distances(source, distances, registered_before[source_id],
+                                                           y_slice, x_slice)
+                touched |= changed
+                source.distances = distances.astype(np.float32)
+                recomputed |= touched
+            self.source_field_sum[recomputed] = 0
+            for source in self.sound_sources.values():
+                distances = source.distances[recomputed].astype(np.float64)
+                with np.errstate(divide='ignore'):
+                    contribution = np.where(np.isfinite(distances) & (distances > 0),
+                                            source.sound_intensity / distances ** 2, 0)
+                self.source_field_sum[recomputed] += contribution
+            self.set_sound_field(recomputed & water, self.source_field_sum[recomputed & water])
+            self.set_sound_field(changed & ~water, np.full(int((changed & ~water).sum()), np.nan))
+        elif single_field and self.lazy_field is None:
+            ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+            intensity = self.sound_source.sound_intensity
+            self.set_sound_field(changed & ~water, np.full(int((changed & ~water).sum()), np.nan))
+            if self.field_engine['downsample'] > 1:
+                self.add_multigrid_field(self.field_engine['downsample'], self.field_engine['engine'],
+                                         self.field_engine['enhanced_realism'], self.field_engine['refine_radius'],
+                                         self.field_engine.get('refine_tolerance', 0.03))
+                recomputed = water
+            elif curve_field:
+                prl_lw = self.parallelepiped_dimensions()
+                if prl_lw != prl_before:
+                    dirty = np.ones((self.width, self.length), dtype=bool)  # zmienił się prostopadłościan wyboru
+                else:
+                    dirty = curve_dirty_columns((self.width, self.length), ss_xyz[:2], y_slice, x_slice, prl_lw)
+                recomputed = water & dirty[None, :, :]
+                visible = self.line_of_sight_mask() if self.field_engine.get('line_of_sight') else None
+                if visible is not None and visible_before is not None:
+                    # odległości w linii prostej nie zależą od terenu - zmieniają się tylko sześciany, których widoczność
+                    # się zmieniła, a łamane - tylko w zasłoniętych sześcianach
+                    recomputed = (recomputed & ~visible) | (water & (visible != visible_before))
+                    straight = recomputed & visible
+                    distances = straight_distances([np.arange(self.height), np.arange(self.width),
+                                                    np.arange(self.length)], ss_xyz[::-1])
+                    self.set_sound_field(straight, intensity / distances[straight] ** 2)
+                elif visible is not None:
+                    recomputed = water  # poprzednio teren z nawisami - wyznaczam całe pole od nowa
+                    self.set_sound_field(water, np.full(int(water.sum()), np.nan))
+                    self.add_curve_field(self.field_engine['enhanced_realism'], line_of_sight=True)
+                    return {'changed_voxels': changed_count, 'recomputed_voxels': int(recomputed.sum())}
+                curved = recomputed if visible is None else recomputed & ~visible
+                self.set_sound_field(curved, np.full(int(curved.sum()), np.nan))
+                with phase('field_computation', total=int(curved.sum())) as progress:
+                    for z, y, x in np.argwhere(curved).tolist():
+                        curve_length = shortest_curve(self, ss_xyz, (x, y, z), prl_lw,
+                                                      self.field_engine['enhanced_realism'])
+                        self.set_sound_intensity(x, y, z, intensity / curve_length ** 2)
+                        progress.advance()
+            else:
+                with phase('field_computation', total=1) as progress:
+                    recomputed = update_wavefront_distances(distances, water, changed) & water
+                    self.set_sound_field(recomputed, intensity / distances[recomputed] ** 2)
+                    progress.advance()
+
+        return {'changed_voxels': changed_count, 'recomputed_voxels': int(recomputed.sum())}
+
+    def _terrain_region(self, y_slice, x_slice):
+        """ Zwraca maskę terenu (bez źródeł dźwięku) w kolumnach prostokąta XY - tablicę logiczną [z, y, x]. """
+
+        if self.storage != 'objects':
+            return self.material[:, y_slice, x_slice] == TERRAIN
+        terrain = np.array([[[not cube.is_water for cube in row[x_slice]] for row in layer[y_slice]]
+                            for layer in self.filling], dtype=bool)
+        for x, y, z in self.sound_source_positions():
+            if y_slice.start <= y < y_slice.stop and x_slice.start <= x < x_slice.stop:
+                terrain[z, y - y_slice.start, x - x_slice.start] = False
+        return terrain
+
+    def _update_obstacle_runs(self, y_slice, x_slice):
+        """ Przelicza zapamiętane długości przeszkód (obstacle_runs()) tylko w wierszach basenu, które przecinają
+        prostokąt XY. """
+
+        if self._obstacle_runs is None:
+            return
+        x_runs, y_runs = self._obstacle_runs
+        x_runs[:, y_slice] = min_obstacle_runs(self._terrain_region(y_slice, slice(0, self.length)))
+        y_runs[:, x_slice] = min_obstacle_runs(self._terrain_region(slice(0, self.width), x_slice).transpose(0, 2, 1))
+
+    def _registered_scratch(self, source):
+        """ Zwraca basen pomocniczy zarejestrowanego źródła dźwięku (tak jak w source_distances()): inne źródła są
+        w nim wodą, a natężenia dźwięku są niezdefiniowane. """
+
+        material = self.material_grid().copy()
+        material[material == SOURCE] = WATER
+        material[source.z_position, source.y_position, source.x_position] = SOURCE
+        scratch = Pool.from_arrays(material)
+        scratch.set_sound_intensity(source.x_position, source.y_position, source.z_position, 1)
+        scratch.sound_source = scratch.filling[source.z_position][source.y_position][source.x_position]
+        return scratch
+
+    def _update_curve_distances(self, source, distances, prl_before, y_slice, x_slice):
+        """ Doliczą długości dróg źródła zarejestrowanego silnikiem 'curve' w kolumnach, z których łamana może sięgnąć
+        edytowanego prostokąta; zwraca maskę doliczonych sześcianów. """
+
+        scratch = self._registered_scratch(source)
+        material = scratch.material
+        ss_xyz = (source.x_position, source.y_position, source.z_position)
+        prl_lw = scratch.parallelepiped_dimensions()
+        if prl_lw != prl_before:
+            dirty = np.ones((self.width, self.length), dtype=bool)
+        else:
+            dirty = curve_dirty_columns((self.width, self.length), ss_xyz[:2], y_slice, x_slice, prl_lw)
+        touched = (material == WATER) & dirty[None, :, :]
+        distances[dirty[None, :, :] & (material == TERRAIN)] = inf
+        with phase('field_computation', total=int(touched.sum())) as progress:
+            for z, y, x in np.argwhere(touched).tolist():
+                distances[z, y, x] = shortest_curve(scratch, ss_xyz, (x, y, z), prl_lw, source.enhanced_realism)
+                progress.advance()
+        return touched
+
+    def sound_source_positions(self):
+        """ Zwraca współrzędne wszystkich źródeł dźwięku w basenie (sound_source oraz zarejestrowanych).
+
+        Returns:
+            list: lista współrzędnych (x, y, z) bez powtórzeń.
+
+        """
+
+        positions = [(source.x_position, source.y_position, source.z_position) for source in self.sound_sources.values()]
+        if self.sound_source is not None:
+            positions.append((self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position))
+        return list(dict.fromkeys(positions))
+
+    def add_curve_field_parallel(self, prl_lw, enhanced_realism, workers, visible=None):
+        """ Definiuje natężenie dźwięku dla każdego wodnego sześcianu silnikiem 'curve', rozdzielając warstwy basenu
+        między procesy poboczne (ProcessPoolExecutor).
+
+        Note:
+            Procesy nie otrzymują kopii obiektów basenu: tablice materiału i natężeń dźwięku zapisują się raz do plików
+            .npy w katalogu tymczasowym, a każdy proces mapuje je do pamięci tylko do odczytu. Wyniki kolejnych warstw
+            są scalane z powrotem do basenu, więc wynik jest identyczny z obliczeniami szeregowymi.
+
+        Args:
+            prl_lw (tuple|list): wymiary prostopadłościanu wyboru wierzchołków łamanej (patrz shortest_curve()).
+            enhanced_realism (bool): tryb realizmu funkcji shortest_curve().
+            workers (int): liczba procesów pobocznych.
+            visible (numpy.ndarray|None): tablica logiczna [z, y, x] sześcianów pomijanych przez shortest_curve()
+                (widocznych ze źródła dźwięku, patrz add_curve_field()).
+
+        """
+
+        from tempfile import TemporaryDirectory
+        from concurrent.futures import ProcessPoolExecutor
+
+        ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+        with TemporaryDirectory() as directory:
+            np.save(os.path.join(directory, 'material.npy'), self.material_grid())
+            np.save(os.path.join(directory, 'sound_intensity.npy'), self.sound_field())
+            if visible is not None:
+                np.save(os.path.join(directory, 'visible.npy'), visible)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_curve_worker,
+                                     initargs=(directory, ss_xyz, prl_lw, enhanced_realism)) as executor, \
+                    phase('field_computation', total=self.height) as progress:
+                for z_position, layer, counters in executor.map(_curve_layer_worker, range(self.height)):
+                    for x_position, y_position, curve_length in layer:
+                        self.set_sound_intensity(x_position, y_position, z_position,
+                                                 self.sound_source.sound_intensity / (curve_length ** 2))
+                    for name, value in counters.items():
+                        count(name, value)  # liczniki procesu pobocznego trafiają do profilerów tego procesu
+                    progress.advance()  # warstwa gotowa
+
+    def clear_sound_sources(self):
+        """ Usuwa z basenu wszystkie źródła dźwięku (również zarejestrowane metodą register_sound_source()):
+        sześciany źródeł znowu stają się wodne, a natężenie dźwięku we wszystkich sześcianach - niezdefiniowane.
+        """
+
+        for x_position, y_position, z_position in self.sound_source_positions():
+            if self.storage != 'objects':
+                self.material[z_position, y_position, x_position] = WATER
+            else:
+                self.filling[z_position][y_position][x_position].is_water = True
+
+        self.next_hop = None
+        self.hops_to_source = None
+        self.field_version += 1
+        if self.storage != 'objects':
+            self.sound_intensity[...] = np.nan
+        else:
+            for layer in self.filling:
+                for row in layer:
+                    for cube in row:
+                        cube.sound_intensity = None
+
+        self.sound_source = None
+        self.sound_sources = {}
+        self.source_field_sum = None
+        self.field_lod = None
+        self.field_engine = None
+        self.lazy_field = None
+
+    def source_distances(self, ss_xyz, engine='wavefront', enhanced_realism=True):
+        """ Wyznacza długości dróg fali dźwiękowej od podanego punktu do wszystkich wodnych sześcianów basenu.
+
+        Note:
+            Sześciany innych źródeł dźwięku nie są przeszkodą - fala przechodzi przez nie jak przez wodę.
+
+        Args:
+            ss_xyz (tuple|list): współrzędne źródła dźwięku.
+            engine (str): silnik wyznaczania długości drogi fali ('curve' albo 'wavefront').
+            enhanced_realism (bool): tryb realizmu silnika 'curve'.
+
+        Returns:
+            numpy.ndarray: tablica float64 [z, y, x] długości dróg; 0 dla samego źródła, inf dla sześcianów ziemnych
+                i nieosiągalnych.
+
+        """
+
+        material = self.material_grid().copy()
+        material[material == SOURCE] = WATER
+        material[ss_xyz[2], ss_xyz[1], ss_xyz[0]] = SOURCE
+        if engine == 'wavefront':
+            with phase('field_computation', total=1) as progress:
+                distances = wavefront_distances(material == WATER, ss_xyz)
+                progress.advance()
+            return distances
+
+        # silnik 'curve' liczy na osobnym basenie, żeby natężenia istniejących źródeł nie wpływały na wynik
+        scratch = Pool.from_arrays(material)
+        scratch.set_sound_intensity(ss_xyz[0], ss_xyz[1], ss_xyz[2], 1)
+        scratch.sound_source = scratch.filling[ss_xyz[2]][ss_xyz[1]][ss_xyz[0]]
+        prl_lw = scratch.parallelepiped_dimensions()
+        distances = np.full(material.shape, inf)
+        distances[ss_xyz[2], ss_xyz[1], ss_xyz[0]] = 0
+        with phase('field_computation', total=self.height) as progress:
+            for z_position in range(self.height):
+                for x_position, y_position, curve_length in curve_layer_lengths(scratch, z_position, prl_lw,
+                                                                                 enhanced_realism):
+                    distances[z_position, y_position, x_position] = curve_length
+                progress.advance()  # warstwa gotowa
+        return distances
+
+    def register_sound_source(self, sound_intensity=1000, x_position=None, y_position=None, z_position=None,
+                              engine='wavefront', enhanced_realism=True, source_id=None):
+        """ Dodaje do basenu kolejne źródło dźwięku, nie usuwając poprzednich. Natężenie dźwięku w każdym wodnym
+        sześcianie jest sumą natężeń pochodzących od wszystkich zarejestrowanych źródeł (superpozycja).
+
+        Note:
+            Dla każdego źródła przechowuje się osobne pole długości dróg fali, dlatego dodanie źródła wymaga
+            wyznaczenia tylko jego pola, a usunięcie (remove_sound_source()) - tylko odjęcia jego udziału.
+            Źródło dodane wcześniej przez add_sound_source() staje się pierwszym zarejestrowanym źródłem.
+
+        Args:
+            sound_intensity (float|int): natężenie dźwięku produkowanego przez źródło dźwięku.
+            x_position (int|None): współrzędna źródła dźwięku względem osi X.
+            y_position (int|None): współrzędna źródła dźwięku względem osi Y.
+            z_position (int|None): współrzędna źródła dźwięku względem osi Z.
+            engine (str): silnik wyznaczania długości drogi fali ('curve' albo 'wavefront').
+            enhanced_realism (bool): tryb realizmu silnika 'curve'.
+            source_id (int|None): identyfikator źródła; jeżeli None - pierwszy wolny.
+
+        Returns:
+            int: identyfikator źródła w rejestrze sound_sources.
+
+        Raises:
+            ValueError: jeżeli podano nieznany silnik albo sześciana źródła nie jest wodny.
+
+        """
+
+        assert engine in ENGINES, ValueError('The engine parameter must be one of ' + str(ENGINES))
+        x_position, y_position, z_position = self.sound_source_position(x_position, y_position, z_position)
+        assert self.is_water(x_position, y_position, z_position), \
+            ValueError('A sound source can only replace a cube composed of water')
+        if self.lazy_field is not None:
+            self.lazy_field.fill()  # superpozycja wymaga natężeń istniejącego pola we wszystkich sześcianach
+        if self.sound_source is not None and not self.sound_sources:
+            self._adopt_sound_source()  # źródło z add_sound_source() staje się pierwszym zarejestrowanym źródłem
+
+        distances = self.source_distances((x_position, y_position, z_position), engine, enhanced_realism)
+        source = SoundSource(x_position, y_position, z_position, sound_intensity, distances.astype(np.float32),
+                             engine, enhanced_realism)
+        if source_id is None:
+            source_id = max(self.sound_sources, default=-1) + 1
+        self.sound_sources[source_id] = source
+
+        # sześcian źródła przestaje być wodny i otrzymuje natężenie dźwięku samego źródła
+        if self.storage != 'objects':
+            self.material[z_position, y_position, x_position] = SOURCE
+        else:
+            self.filling[z_position][y_position][x_position].is_water = False
+        self._superpose(source, 1)
+        self.set_sound_intensity(x_position, y_position, z_position, sound_intensity)
+        self.sound_source = self.filling[z_position][y_position][x_position]
+        return source_id
+
+    def _adopt_sound_source(self):
+        """ Rejestruje źródło dźwięku dodane przez add_sound_source() w sound_sources, tak żeby jego pole nie zginęło
+        przy superpozycji z kolejnymi źródłami. Długości dróg fali odtwarza się z wyznaczonego już pola
+        (natężenie = natężenie źródła / długość drogi ** 2), więc zachowują się niezależnie od użytego silnika.
+
+        Returns:
+            int: identyfikator źródła w rejestrze sound_sources.
+
+        """
+
+        ss_xyz = (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position)
+        sound_intensity = self.get_sound_intensity(*ss_xyz)
+        field = np.asarray(self.sound_field(), dtype=np.float64)
+        reachable = self.water_mask() & np.isfinite(field) & (field > 0)
+        distances = np.full(field.shape, np.inf, dtype=np.float32)
+        distances[reachable] = np.sqrt(sound_intensity / field[reachable])
+
+        engine = self.field_engine or {}
+        source = SoundSource(*ss_xyz, sound_intensity, distances, engine.get('engine', 'curve'),
+                             engine.get('enhanced_realism', True))
+        source_id = max(self.sound_sources, default=-1) + 1
+        self.sound_sources[source_id] = source
+        self.source_field_sum = np.zeros((self.height, self.width, self.length))
+        self.source_field_sum[reachable] = field[reachable]
+        return source_id
+
+    def remove_sound_source(self, source_id):
+        """ Usuwa zarejestrowane źródło dźwięku, odejmując jego udział od natężeń dźwięku.
+
+        Args:
+            source_id (int): identyfikator źródła w rejestrze sound_sources.
+
+        Returns:
+            SoundSource: usunięte źródło.
+
+        """
+
+        source = self.sound_sources.pop(source_id)
+        if self.storage != 'objects':
+            self.material[source.z_position, source.y_position, source.x_position] = WATER
+        else:
+            self.filling[source.z_position][source.y_position][source.x_position].is_water = True
+        self._superpose(source, -1)
+
+        if self.sound_source is not None and (self.sound_source.x_position, self.sound_source.y_position,
+                                              self.sound_source.z_position) == \
+                (source.x_position, source.y_position, source.z_position):
+            self.sound_source = None
+            for other in self.sound_sources.values():
+                self.sound_source = self.filling[other.z_position][other.y_position][other.x_position]
+        return source
+
+    def move_sound_source(self, source_id, x_position=None, y_position=None, z_position=None):
+        """ Przesuwa zarejestrowane źródło dźwięku: odejmuje jego udział i wyznacza pole tylko dla nowego położenia.
+
+        Args:
+            source_id (int): identyfikator źródła w rejestrze sound_sources.
+            x_position (int|None): nowa współrzędna źródła dźwięku względem osi X.
+            y_position (int|None): nowa współrzędna źródła dźwięku względem osi Y.
+            z_position (int|None): nowa współrzędna źródła dźwięku względem osi Z.
+
+        Returns:
+            int: identyfikator źródła (bez zmian).
+
+        """
+
+        source = self.remove_sound_source(source_id)
+        return self.register_sound_source(source.sound_intensity, x_position, y_position, z_position,
+                                          source.engine, source.enhanced_realism, source_id)
+
+    def sound_source_memory(self):
+        """ Zwraca zużycie pamięci przez pola zarejestrowanych źródeł dźwięku.
+
+        Returns:
+            dict: liczba bajtów pola dla każdego identyfikatora źródła oraz, pod kluczem 'sum', rozmiar tablicy
+                sumy natężeń.
+
+        """
+
+        memory = {source_id: source.nbytes for source_id, source in self.sound_sources.items()}
+        memory['sum'] = 0 if self.source_field_sum is None else self.source_field_sum.nbytes
+        return memory
+
+    def _superpose(self, source, sign):
+        """ Dodaje (sign=1) albo odejmuje (sign=-1) udział źródła dźwięku od sumy natężeń i aktualizuje natężenia
+        dźwięku wszystkich wodnych sześcianów.
+        """
+
+        if self.source_field_sum is None:
+            self.source_field_sum = np.zeros((self.height, self.width, self.length))
+        distances = source.distances.astype(np.float64)
+        reachable = np.isfinite(distances) & (distances > 0)
+        self.source_field_sum[reachable] += sign * source.sound_intensity / distances[reachable] ** 2
+
+        water = self.water_mask()
+        if not self.sound_sources:
+            # bez źródeł natężenie dźwięku jest niezdefiniowane
+            self.source_field_sum = None
+            self.set_sound_field(water, np.full(np.count_nonzero(water), np.nan))
+        else:
+            self.set_sound_field(water, self.source_field_sum[water])
+
+    def build_flow_field(self):
+        """ Buduje tablicę kolejnych kroków łodzi podwodnej ("next hop") i liczbę kroków do źródła dźwięku dla każdego
+        sześcianu basenu. Przy niezmiennym polu natężeń najlepszy sąsiad każdego sześcianu się nie zmienia, więc po
+        zbudowaniu tablicy ruch łodzi (Submarine().move()) i pytanie o liczbę kroków to odczyt z tablicy.
+
+        Note:
+            Kolejny krok wybiera się według tych samych reguł co w Submarine().move(): sąsiad z największym natężeniem
+            dźwięku, przy równych natężeniach - ostatni w kolejności NEIGHBOUR_OFFSETS; jeżeli jego natężenie jest
+            równe natężeniu w samym sześcianie, to sześcian jest punktem docelowym (krok prowadzi do niego samego).
+            Każda zmiana natężeń dźwięku unieważnia tablicę (next_hop = None). Pole wyznaczane na żądanie
+            (lazy_field) wyznacza się przed budową tablicy w całości.
+
+        """
+
+        if self.lazy_field is not None:
+            self.lazy_field.fill()
+
+        with phase('routing', total=1) as progress:
+            field = self.sound_field()
+            defined = ~np.isnan(field)
+            padded = np.full((self.height + 2, self.width + 2, self.length + 2), -np.inf, dtype=field.dtype)
+            padded[1:-1, 1:-1, 1:-1] = np.where(defined, field, -np.inf)
+
+            # najlepszy sąsiad każdego sześcianu; ">=" wybiera przy równych natężeniach ostatniego sąsiada
+            best_value = np.full(field.shape, -np.inf, dtype=field.dtype)
+            best_neighbour = np.zeros(field.shape, dtype=np.int8)
+            for i, (dx, dy, dz) in enumerate(NEIGHBOUR_OFFSETS):
+                value = padded[1 + dz:self.height + 1 + dz, 1 + dy:self.width + 1 + dy, 1 + dx:self.length + 1 + dx]
+                better = value >= best_value
+                best_value[better] = value[better]
+                best_neighbour[better] = i
+
+            # indeks kolejnego sześcianu w spłaszczonym basenie (-1 dla sześcianów bez natężenia dźwięku)
+            offsets = np.array(NEIGHBOUR_OFFSETS) @ np.array([1, self.length, self.width * self.length])
+            index = np.arange(field.size, dtype=np.int64).reshape(field.shape)
+            arrived = best_value == field
+            next_hop = np.where(arrived, index, index + offsets[best_neighbour])
+            next_hop = np.where(defined & np.isfinite(best_value), next_hop, -1).ravel()
+
+            # liczba kroków do punktu docelowego metodą podwajania wskaźników: O(N log L) zamiast przechodzenia każdej drogi
+            valid = next_hop >= 0
+            jump = np.where(valid, next_hop, np.arange(next_hop.size))
+            hops = (valid & (jump != np.arange(next_hop.size))).astype(np.int64)
+            for _ in range(max(1, int(np.ceil(np.log2(next_hop.size))) + 1)):
+                hops = hops + hops[jump]
+                jump = jump[jump]
+            # sześciany, które nie trafiają do punktu docelowego (np. krążą w polu bez maksimum), nie mają liczby kroków
+            reaches = valid & (next_hop[jump] == jump)
+
+            self.next_hop = next_hop.astype(np.int32).reshape(field.shape)
+            self.hops_to_source = np.where(reaches, hops, -1).astype(np.int32).reshape(field.shape)
+            progress.advance()
+
+    def _check_flow_field(self):
+        """ Sprawdza, czy tablice kolejnych kroków i liczby ruchów są wyznaczone (każda zmiana natężeń dźwięku
+        je unieważnia). """
+
+        if self.next_hop is None or self.hops_to_source is None:
+            raise ValueError('The flow field is not built or is out of date - call Pool().build_flow_field() first')
+
+    def next_position(self, x_position, y_position, z_position):
+        """ Zwraca współrzędne kolejnego kroku łodzi podwodnej z tablicy next_hop (patrz build_flow_field()).
+
         Args:
-            height (int): wysokość basenu.
-            heightmap (str): ścieżka mapy wysokości (miejsce znajdowania się pliku), jako pliku .jpg.
+            x_position (int): współrzędna sześcianu względem osi X.
+            y_position (int): współrzędna sześcianu względem osi Y.
+            z_position (int): współrzędna sześcianu względem osi Z.
+
+        Returns:
+            tuple|None: współrzędne (x, y, z) kolejnego sześcianu (te same, jeżeli sześcian jest punktem docelowym)
+                albo None, jeżeli sześcian nie ma natężenia dźwięku.
 
         Raises:
-            ValueError: jeżeli podawana wysokość basenu jest niższa lub równa się maksymalnej wysokości terenu,
-             wynikającej z mapy wysokości.
+            ValueError: jeżeli tablica kolejnych kroków nie jest wyznaczona.
 
         """
 
-        im = Image.open(heightmap, 'r')  # otwieram mapę wysokości jako obrazek
-        assert height > max(round(pixel[0]) for pixel in list(im.getdata())), \
-            ValueError('The height parameter must be greater than ' + str(max(round(pixel[0]) for pixel in list(im.getdata()))))
-
-        length, width = im.size  # wyciągam parametry mapy według których zbuduje się basen
-
-        # definiuję wymiary basenu
-        self.height = height  # z
-        self.width = width  # y
-        self.length = length  # x
+        self._check_flow_field()
+        index = int(self.next_hop[z_position, y_position, x_position])
+        if index < 0:
+            return None
+        z_position, rest = divmod(index, self.width * self.length)
+        return rest % self.length, rest // self.length, z_position
 
-        # Blok, w którym wypełniam basen wodnymi metrami sześciennymi:
-        print('Wypełniam basen wodnymi metrami sześciennymi:')
-        self.filling = []
-        for z_position in range(height):
-            layer = []
-            for y_position in range(width):
-                layer.append(deepcopy([None] * length))
-            self.filling.append(deepcopy(layer))
-
-        for z_position in range(height):
-            for y_position in range(width):
-                for x_position in range(length):
-                    self.filling[z_position][y_position][x_position] = CubicMetre(x_position, y_position, z_position, True)
-            print('\tLayer', z_position, 'completed.')
+    def steps_to_source(self, x_position, y_position, z_position):
+        """ Zwraca liczbę ruchów łodzi podwodnej z podanego sześcianu do punktu docelowego (patrz build_flow_field()).
 
-        # Blok, w którym tworzę referencje pomiędzy sąsiednimi metrami sześciennymi
-        print('Tworzę referencje pomiędzy sąsiednimi metrami sześciennymi:')
-        change = [(1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1), (0, 1, 0), (0, -1, 0),
-                  (1, 0, -1), (1, 0, 1), (1, 1, 0), (1, -1, 0),
-                  (-1, 0, -1), (-1, 0, 1), (-1, 1, 0), (-1, -1, 0),
-                  (0, 1, -1), (0, 1, 1), (0, -1, 1), (0, -1, -1),
-                  (1, 1, -1), (1, 1, 1), (1, -1, 1), (1, -1, -1),
-                  (-1, 1, -1), (-1, 1, 1), (-1, -1, 1), (-1, -1, -1)]
-        for z_position in range(self.height):
-            for y_position in range(self.width):
-                for x_position in range(self.length):
-                    for i in range(26):
-                        if x_position + change[i][0] < 0 or x_position + change[i][0] > self.length - 1:
-                            continue
-                        if y_position + change[i][1] < 0 or y_position + change[i][1] > self.width - 1:
-                            continue
-                        if z_position + change[i][2] < 0 or z_position + change[i][2] > self.height - 1:
-                            continue
-                        self.filling[z_position][y_position][x_position].neighbours[i] = \
-                        self.filling[z_position + change[i][2]][y_position + change[i][1]][x_position + change[i][0]]
-            print('\tLayer', z_position, 'completed.')
-
-        # Blok, w którym zamieniam niektóre sześciany wodne na ziemne, zgodnie z mapą wysokości:
-        print('Zamieniam niektóre sześciany wodne na ziemne, zgodnie z mapą wysokości...')
-        pixel_values = list(im.getdata())
-        pixel_alpha = []
-        z = []
-
-        for pixel in pixel_values:
-            pixel_alpha.append(round(pixel[0]))
-
-        # tworzę dwuwymiarową liste wartości wysokości "dna" basenu h od położenia względem płaszczyzny XY
-        for i in range(0, len(pixel_alpha), width):
-            z.append(pixel_alpha[i:i + width])
-
-        for x_position in range(length):
-            for y_position in range(width):
-                # przez całą wysokość h dna w punkcie (x; y) wodne sześciany zamieniają się na ziemne
-                h = z[y_position][x_position]
-                for z_position in range(h):
-                    self.filling[z_position][y_position][x_position].is_water = False
-
-    def add_sound_source(self, sound_intensity=1000, x_position=None, y_position=None, z_position=None, enhanced_realism=True):
-        """ Metoda dodaje źródło dźwięku do basenu i definiuje parametr sound_intensity dla każdego wodnego sześcianu
-        (natężenie dźwięku w nim).
+        Returns:
+            int: liczba ruchów; -1, jeżeli łódź z tego sześcianu nigdy nie "dopłynie".
 
-        Args:
-            sound_intensity (float|int): natężenie dźwięku produkowanego przez źródło dźwięku.
-            x_position (int|None): współrzędna źródła dźwięku względem osi X.
-            y_position (int|None): współrzędna źródła dźwięku względem osi Y.
-            z_position (int|None): współrzędna źródła dźwięku względem osi Z.
-            enhanced_realism (bool): jeżeli True - bardziej realistyczne ugięcie fal dźwiękowych wokół przeszkód,
-                ale gigantyczna złożoność obliczeniowa. W innym przypadku - względnie niska złożoność obliczeniowa, ale
-                mało realistyczne rozchodzenie się fal.
+        Raises:
+            ValueError: jeżeli tablica kolejnych kroków nie jest wyznaczona.
 
         """
 
-        print('Dodaję źródło dźwięku...')
-        # Blok definiowania współrzędnych źródła dźwięku
-        # (jeżeli parametry nie zostały podane, współrzędne definiują się losowo):
-        if x_position is not None and 0 <= x_position < self.length:  # względem osi X
-            x_position = x_position
-        else:
-            x_position = randint(0, self.length - 1)
+        self._check_flow_field()
+        return int(self.hops_to_source[z_position, y_position, x_position])
 
-        if y_position is not None and 0 <= y_position < self.width:  # względem osi Y
-            y_position = y_position
-        else:
-            y_position = randint(0, self.width - 1)
+    def trace(self, x_position, y_position, z_position):
+        """ Zwraca całą drogę łodzi podwodnej z podanego sześcianu do punktu docelowego, odczytaną z tablicy next_hop.
 
-        # wyznaczam minimalnie możliwe położenie względem pionowej osi (Z)
-        z_min = 1
-        while self.filling[z_min][y_position][x_position].is_water is False:
-            z_min += 1
-        # "kładę" źródło dźwięku na samo dno, lub na podaną wysokość
-        if z_position is not None and z_min <= z_position < self.height:
-            z_position = z_position
-        else:
-            z_position = z_min
+        Returns:
+            list: zbiór punktów (współrzędne sześcianów), identyczny z wynikiem Submarine().move(True).
 
-        # dodaję do basenu źródło dźwięku, zastępując nim wodny metr sześcienny o tych samych współrzędnych
-        self.filling[z_position][y_position][x_position].sound_intensity = sound_intensity
-        self.filling[z_position][y_position][x_position].is_water = False
-        self.sound_source = self.filling[z_position][y_position][x_position]
+        Raises:
+            ValueError: jeżeli z podanego sześcianu łódź nigdy nie "dopłynie" albo tablica kolejnych kroków
+                nie jest wyznaczona.
 
-        # Blok, w którym skanuję cały basem i wyznaczam wymiary prostopadłościanu w ramach którego będziemy dokonywać
-        # wyboru kolejnego wierzchołku łamanej linii - odległości od źródła dźwięku do pewnego sześcianu wodnego:
-        parallelepiped_length = self.length  # x
-        parallelepiped_width = self.width  # y
-
-        for z_position in range(self.height):
-            # wzdłuż X
-            for y_position in range(self.width):
-                x_count = 0
-                for x_position in range(self.length):
-                    if self.filling[z_position][y_position][x_position].is_water is False:
-                        x_count += 1
-                    elif x_count < parallelepiped_length and x_count != 0:
-                        parallelepiped_length = x_count
-                        x_count = 0
-                if x_count < parallelepiped_length and x_count != 0:
-                    parallelepiped_length = x_count
-
-            # wzdłuż Y
-            for x_position in range(self.width):
-                y_count = 0
-                for y_position in range(self.length):
-                    if self.filling[z_position][y_position][x_position].is_water is False:
-                        y_count += 1
-                    elif y_count < parallelepiped_width and y_count != 0:
-                        parallelepiped_width = y_count
-                        y_count = 0
-                if y_count < parallelepiped_width and y_count != 0:
-                    parallelepiped_width = y_count
+        """
 
-        # definiuję natężenie dźwięku dla każdego wodnego metru sześciennego w basenie
-        print('Definiuję natężenie dźwięku dla każdego wodnego metru sześciennego w basenie...')
-        for z_position in range(self.height):
-            for y_position in range(self.width):
-                for x_position in range(self.length):
-                    if self.filling[z_position][y_position][x_position].is_water is True:
-                        curve_length = shortest_curve(self, (self.sound_source.x_position, self.sound_source.y_position, self.sound_source.z_position),
-                                                      (x_position, y_position, z_position),
-                                                      (parallelepiped_length, parallelepiped_width),
-                                                      enhanced_realism)
-                        self.filling[z_position][y_position][x_position].sound_intensity = self.sound_source.sound_intensity / (curve_length ** 2)
-            print('\tLayer', z_position, 'completed.')
+        steps = self.steps_to_source(x_position, y_position, z_position)
+        assert steps >= 0, ValueError('The submarine never reaches the sound source from this cube')
+        flat_hop = self.next_hop.ravel()
+        indices = [(z_position * self.width + y_position) * self.length + x_position]
+        for _ in range(steps):
+            indices.append(int(flat_hop[indices[-1]]))
+        z_positions, y_positions, x_positions = np.unravel_index(indices, self.next_hop.shape)
+        return list(zip(x_positions.tolist(), y_positions.tolist(), z_positions.tolist()))
 
     def add_submarine(self, x_position=None, y_position=None, z_position=None):
         """ Metoda, dodająca łódź podwodną (aparat autonomicznny) do basenu.
@@ -255,6 +1867,19 @@ class Pool:
 
         self.submarine = Submarine(self, x_position, y_position, z_position)
 
+    def add_fleet(self, positions=None, count=1, seed=None):
+        """ Metoda, dodająca do basenu flotę łodzi podwodnych, przemieszczanych wszystkie naraz.
+
+        Args:
+            positions (numpy.ndarray|list|None): współrzędne (x, y, z) łodzi podwodnych - tablica o wymiarach (N, 3);
+                jeżeli None - count łodzi na losowych współrzędnych (tak jak w Submarine()).
+            count (int): liczba łodzi losowanych, jeżeli nie podano positions.
+            seed (int|None): ziarno generatora liczb losowych.
+
+        """
+
+        self.fleet = Fleet(self, positions) if positions is not None else Fleet.random(self, count, seed)
+
 
 class Submarine:
     """ Łódź podwodna albo inaczej aparat autonomiczny. Egzemplarz tej klasy ma na celu przemieszczać się w kierunku
@@ -299,9 +1924,7 @@ class Submarine:
             y_position = randint(0, pool.width - 1)
 
         # wyznaczam minimalnie możliwe położenie względem pionowej osi (Z)
-        z_min = 1
-        while pool.filling[z_min][y_position][x_position].is_water is False:
-            z_min += 1
+        z_min = pool.min_water_z(x_position, y_position)
         # zmieszczam łódź podwodną na wysokości w zakresie [z_min; pool.height), lub na podanej wysokości
         if z_position is not None and z_min <= z_position < pool.height:
             z_position = z_position
@@ -335,31 +1958,68 @@ class Submarine:
 
         """
 
+        steps = self.steps(moves)
+        with phase('routing') as progress:
+            positions = list(steps)
+            progress.advance(len(positions))
+            return positions
+
+    def steps(self, moves=True):
+        """ Strumieniowy wariant move(): zwraca generator, który przesuwa łódź o jeden ruch przy każdym pobraniu
+        i oddaje kolejne odwiedzone punkty (te same co move(), w tej samej kolejności), nie gromadząc całej drogi
+        w pamięci. Przykład: TrajectoryWriter().add(submarine.steps(True)) (trajectory_storage.py).
+
+        Args:
+            moves (int|bool): ilość ruchów do wykonania [1; ∞). Jeżeli True, to przemieszczać się do momentu
+                "dopłynięcia" do źródła dźwięku.
+
+        Returns:
+            generator: kolejne punkty (x, y, z) odwiedzone przez łódź, łącznie z początkowym.
+
+        Raises:
+            ValueError: jeżeli parametr moves został podany niewłaściwie.
+
+        """
+
         assert (moves >= 1) or (moves is True), ValueError('Parameter "metres" must be greater integer than 0 or boolean True.')
+        return self._steps(moves)
+
+    def _steps(self, moves):
+        """ Generator ruchów łodzi podwodnej (patrz steps()). """
 
         # punkt początkowy (współrzędne wodnego sześcianu w którym "znajduje się" łódź podwodna
         xyz_to_move = (self.x_position, self.y_position, self.z_position)
 
-        positions = []  # lista przeznaczona do zapisu wszystkich odwiedzonych punktów, łącznie z początkowym
         while moves:
 
-            positions.append(xyz_to_move)  # dodaję do listy współrzędne odwiedzonego punktu (sześcianu)
-            # lista zawierająca listy danych w postaci [natężenie dźwięku które ma sąsiad, (współrzędne sąsiada)]
-            comparison = []
-
-            for neighbour in self.pool.filling[self.z_position][self.y_position][self.x_position].neighbours:  # iteruje się po wszystkich sąsiadach
-                if (neighbour is not None) and (neighbour.sound_intensity is not None):
-                    # jeżeli sąsiad istnieje i ma liczbowo zdefiniowane natężenie dźwięku
-                    sound_intensity = neighbour.sound_intensity
-                    xyz_to_move = (neighbour.x_position, neighbour.y_position, neighbour.z_position)
-                    comparison.append([sound_intensity, xyz_to_move])
-            comparison.sort(key=lambda x: x[0])  # sortuje w porządku rosnącym natężeń dźwięku
-
-            xyz_to_move = comparison[-1][1]  # wybieram sąsiada z największym natężeniem dźwięku
-            # jeżeli wybrany sąsiad ma takie same natężenie dźwięku co i sześcian wodny w którym w danym momencie
-            # znajduje się łódź podwodna, to oznacza, że łódź znajduje się obok źródła dźwięku ("dopłynęła")
-            if comparison[-1][0] == self.pool.filling[self.z_position][self.y_position][self.x_position].sound_intensity:
-                return positions
+            yield xyz_to_move  # oddaję współrzędne odwiedzonego punktu (sześcianu)
+
+            if self.pool.next_hop is not None:
+                # basen ma gotową tablicę kolejnych kroków (Pool().build_flow_field()) - wybór sąsiada to jeden odczyt
+                xyz_to_move = self.pool.next_position(self.x_position, self.y_position, self.z_position)
+                if xyz_to_move is None:
+                    raise ValueError('The submarine is in a cube without sound intensity ({}, {}, {})'.format(
+                        self.x_position, self.y_position, self.z_position))
+                if xyz_to_move == (self.x_position, self.y_position, self.z_position):
+                    return  # łódź "dopłynęła"
+            else:
+                # lista zawierająca listy danych w postaci [natężenie dźwięku które ma sąsiad, (współrzędne sąsiada)]
+                comparison = []
+
+                # iteruje się po wszystkich istniejących sąsiadach
+                for _, neighbour_xyz in self.pool.neighbour_positions(self.x_position, self.y_position, self.z_position):
+                    sound_intensity = self.pool.get_sound_intensity(*neighbour_xyz)
+                    if sound_intensity is not None:
+                        # jeżeli sąsiad ma liczbowo zdefiniowane natężenie dźwięku
+                        xyz_to_move = neighbour_xyz
+                        comparison.append([sound_intensity, xyz_to_move])
+                comparison.sort(key=lambda x: x[0])  # sortuje w porządku rosnącym natężeń dźwięku
+
+                xyz_to_move = comparison[-1][1]  # wybieram sąsiada z największym natężeniem dźwięku
+                # jeżeli wybrany sąsiad ma takie same natężenie dźwięku co i sześcian wodny w którym w danym momencie
+                # znajduje się łódź podwodna, to oznacza, że łódź znajduje się obok źródła dźwięku ("dopłynęła")
+                if comparison[-1][0] == self.pool.get_sound_intensity(self.x_position, self.y_position, self.z_position):
+                    return
             if moves is not True:
                 moves -= 1
 
@@ -368,7 +2028,201 @@ class Submarine:
             self.y_position = xyz_to_move[1]
             self.z_position = xyz_to_move[2]
 
-        return positions
+
+class Fleet:
+    """ Flota łodzi podwodnych. Wszystkie łodzie przemieszczają się naraz w kierunku źródła dźwięku według tych samych
+    reguł co Submarine().move(True), ale wybór najlepszego sąsiada odbywa się jedną operacją na tablicach dla całej
+    floty zamiast sortowania listy sąsiadów każdej łodzi osobno.
+
+    Note:
+        Tak jak dla Submarine(), w basenie musi być zdefiniowane natężenie dźwięku.
+
+    Attributes:
+        pool (Pool): basen, do którego jest przypisana flota.
+        positions (numpy.ndarray): tablica int64 o wymiarach (N, 3) - bieżące współrzędne (x, y, z) łodzi.
+
+    Methods:
+        move: przesuwa wszystkie łodzie do źródła dźwięku i zwraca ich trajektorie.
+
+    """
+
+    def __init__(self, pool: Pool, positions):
+        """ Inicjalizacja floty.
+
+        Args:
+            pool (Pool): basen, do którego zostanie przypisana flota.
+            positions (numpy.ndarray|list): współrzędne (x, y, z) łodzi - tablica o wymiarach (N, 3).
+
+        Raises:
+            ValueError: jeżeli któraś z łodzi nie znajduje się w wodnym sześcianie.
+
+        """
+
+        self.pool = pool
+        self.positions = np.array(positions, dtype=np.int64).reshape(-1, 3)
+        water = pool.water_mask()
+        assert water[self.positions[:, 2], self.positions[:, 1], self.positions[:, 0]].all(), \
+            ValueError('Every submarine must be placed in a cube composed of water')
+
+    @classmethod
+    def random(cls, pool: Pool, count, seed=None):
+        """ Tworzy flotę łodzi na losowych współrzędnych: X i Y w ramach basenu, Z w zakresie [z_min; pool.height),
+        gdzie z_min to najniższy wodny sześcian kolumny (tak jak w Submarine()).
+
+        Args:
+            pool (Pool): basen, do którego zostanie przypisana flota.
+            count (int): liczba łodzi.
+            seed (int|None): ziarno generatora liczb losowych.
+
+        Returns:
+            Fleet: nowa flota.
+
+        """
+
+        generator = np.random.default_rng(seed)
+        water = pool.water_mask()
+        z_min = np.argmax(water[1:], axis=0) + 1  # najniższy wodny sześcian kolumny, licząc od z = 1
+        x_positions = generator.integers(0, pool.length, count)
+        y_positions = generator.integers(0, pool.width, count)
+        z_positions = generator.integers(z_min[y_positions, x_positions], pool.height)
+        return cls(pool, np.stack([x_positions, y_positions, z_positions], axis=1))
+
+    def move(self, max_steps=None):
+        """ Przesuwa wszystkie łodzie w kierunku źródła dźwięku, aż każda "dopłynie" (lub do wykonania max_steps
+        ruchów), i zwraca ich trajektorie.
+
+        Note:
+            Trajektoria pojedynczej łodzi jest identyczna z wynikiem Submarine().move(True): łódź przechodzi do sąsiada
+            z największym natężeniem dźwięku (przy równych natężeniach - ostatniego w kolejności NEIGHBOUR_OFFSETS)
+            i zatrzymuje się, gdy to natężenie jest równe natężeniu w jej bieżącym sześcianie.
+
+        Args:
+            max_steps (int|None): maksymalna liczba ruchów; jeżeli None - liczba sześcianów basenu (ochrona przed
+                nieskończonym ruchem w polu bez maksimum lokalnego przy źródle).
+
+        Returns:
+            tuple: (trajectories, arrival_steps):
+                trajectories (numpy.ndarray) - tablica o wymiarach (T, N, 3) współrzędnych odwiedzonych przez łodzie
+                w kolejnych krokach, o najmniejszym wystarczającym typie całkowitym; po dopłynięciu współrzędne łodzi
+                się nie zmieniają.
+                arrival_steps (numpy.ndarray) - liczba ruchów wykonanych przez każdą łódź do dopłynięcia
+                (trajectories[:arrival_steps[i] + 1, i] odpowiada wynikowi Submarine().move(True));
+                -1, jeżeli łódź nie dopłynęła w max_steps ruchach.
+
+        """
+
+        if self.pool.lazy_field is not None:
+            self.pool.lazy_field.fill()  # ruch całej floty odczytuje całe pole natężeń
+        with phase('routing', total=len(self.positions)) as progress:
+            pool = self.pool
+            if max_steps is None:
+                max_steps = pool.height * pool.width * pool.length
+
+            # otaczam pole natężeń warstwą -inf, żeby sąsiedzi spoza basenu i sześciany bez natężenia nigdy nie wygrywali
+            field = pool.sound_field()
+            padded = np.full((pool.height + 2, pool.width + 2, pool.length + 2), -np.inf, dtype=field.dtype)
+            padded[1:-1, 1:-1, 1:-1] = np.where(np.isnan(field), -np.inf, field)
+            padded = padded.ravel()
+
+            # przesunięcia indeksów 26 sąsiadów w spłaszczonej tablicy, w odwróconej kolejności NEIGHBOUR_OFFSETS:
+            # argmax zwraca pierwsze maksimum, a sortowanie w Submarine().move() wybiera ostatnie
+            strides = np.array([1, pool.length + 2, (pool.width + 2) * (pool.length + 2)])
+            offsets = np.array(NEIGHBOUR_OFFSETS[::-1]) @ strides
+            neighbour_offsets = np.array(NEIGHBOUR_OFFSETS[::-1])
+
+            positions = self.positions.copy()
+            indices = (positions + 1) @ strides
+            arrival_steps = np.full(len(positions), -1)
+            active = np.arange(len(positions))  # numery łodzi, które jeszcze nie dopłynęły
+            trajectories = [positions.copy()]
+
+            for step in range(max_steps + 1):
+                values = padded[indices[active, None] + offsets]
+                best = np.argmax(values, axis=1)
+                arrived = values[np.arange(len(active)), best] == padded[indices[active]]
+                arrival_steps[active[arrived]] = step
+
+                moving = active[~arrived]
+                best = best[~arrived]
+                active = moving
+                if not len(active) or step == max_steps:
+                    break
+                positions[moving] += neighbour_offsets[best]
+                indices[moving] += offsets[best]
+                trajectories.append(positions.copy())
+
+            self.positions = positions
+            coordinate_type = np.min_scalar_type(max(pool.height, pool.width, pool.length) - 1)
+            progress.advance(len(self.positions))
+        return np.stack(trajectories).astype(coordinate_type), arrival_steps
+
+
+# stan procesu pobocznego silnika 'curve': (basen, współrzędne źródła, prostopadłościan wyboru, tryb realizmu)
+_curve_worker_state = None
+
+
+def _init_curve_worker(directory, ss_xyz, prl_lw, enhanced_realism):
+    """ Inicjalizacja procesu pobocznego: mapuje tablice basenu z plików .npy i odtwarza z nich basen.
+
+    Args:
+        directory (str): katalog z plikami material.npy i sound_intensity.npy (oraz ewentualnie visible.npy - sześcianami
+            pomijanymi przez shortest_curve()).
+        ss_xyz (tuple): współrzędne źródła dźwięku.
+        prl_lw (tuple): wymiary prostopadłościanu wyboru wierzchołków łamanej.
+        enhanced_realism (bool): tryb realizmu funkcji shortest_curve().
+
+    """
+
+    global _curve_worker_state
+    pool = Pool.from_arrays(np.load(os.path.join(directory, 'material.npy'), mmap_mode='r'),
+                            np.load(os.path.join(directory, 'sound_intensity.npy'), mmap_mode='r'))
+    pool.sound_source = pool.filling[ss_xyz[2]][ss_xyz[1]][ss_xyz[0]]
+    visible_path = os.path.join(directory, 'visible.npy')
+    visible = np.load(visible_path, mmap_mode='r') if os.path.exists(visible_path) else None
+    _curve_worker_state = (pool, prl_lw, enhanced_realism, visible)
+
+
+def _curve_layer_worker(z_position):
+    """ Wyznacza w procesie pobocznym długości łamanych dla jednej warstwy basenu (patrz curve_layer_lengths()).
+
+    Returns:
+        tuple: (z_position, lista krotek (x, y, długość łamanej), liczniki profilera (patrz instrumentation.py)).
+
+    """
+
+    pool, prl_lw, enhanced_realism, visible = _curve_worker_state
+    with Profiler() as profiler:
+        layer = curve_layer_lengths(pool, z_position, prl_lw, enhanced_realism,
+                                    None if visible is None else visible[z_position])
+    return z_position, layer, profiler.counters
+
+
+def curve_layer_lengths(pool: Pool, z_position, prl_lw, enhanced_realism=True, skip=None):
+    """ Funkcja wyznacza funkcją shortest_curve() długość łamanej od źródła dźwięku do każdego wodnego sześcianu
+    jednej warstwy basenu.
+
+    Args:
+        pool (Pool): basen z dodanym źródłem dźwięku.
+        z_position (int): współrzędna warstwy względem osi Z.
+        prl_lw (tuple|list): wymiary prostopadłościanu wyboru wierzchołków łamanej (patrz shortest_curve()).
+        enhanced_realism (bool): tryb realizmu funkcji shortest_curve().
+        skip (numpy.ndarray|None): tablica logiczna [y, x] sześcianów warstwy do pominięcia.
+
+    Returns:
+        list: lista krotek (x, y, długość łamanej) dla wodnych sześcianów warstwy.
+
+    """
+
+    ss_xyz = (pool.sound_source.x_position, pool.sound_source.y_position, pool.sound_source.z_position)
+    layer = []
+    for y_position in range(pool.width):
+        for x_position in range(pool.length):
+            if skip is not None and skip[y_position, x_position]:
+                continue
+            if pool.is_water(x_position, y_position, z_position) is True:
+                curve_length = shortest_curve(pool, ss_xyz, (x_position, y_position, z_position), prl_lw, enhanced_realism)
+                layer.append((x_position, y_position, curve_length))
+    return layer
 
 
 def shortest_curve(pool: Pool, ss_xyz, cube_xyz, prl_lw, enhanced_realism=True):
@@ -405,91 +2259,76 @@ def shortest_curve(pool: Pool, ss_xyz, cube_xyz, prl_lw, enhanced_realism=True):
 
     """
 
+    count('shortest_curve_calls')
     # sprawdzam, czy wybrany metr sześcienny jest wodny
-    assert pool.filling[cube_xyz[2]][cube_xyz[1]][cube_xyz[0]].is_water is True, \
+    assert pool.is_water(*cube_xyz) is True, \
         ValueError('To determine the intensity of the sound, the cube must be composed of water')
     # jeżeli sześcian już ma zdefiniowane natężenie dźwięku
-    if pool.filling[cube_xyz[2]][cube_xyz[1]][cube_xyz[0]].sound_intensity is not None:
-        return sqrt(pool.filling[cube_xyz[2]][cube_xyz[1]][cube_xyz[0]].sound_intensity / pool.sound_source.sound_intensity)
+    if pool.get_sound_intensity(*cube_xyz) is not None:
+        return sqrt(pool.get_sound_intensity(*cube_xyz) / pool.sound_source.sound_intensity)
 
     # definiuję odległości od wierzchołku do sześcianu-targetu
     x_dto = abs(cube_xyz[0] - ss_xyz[0])  # dto - distance to overcome
     y_dto = abs(cube_xyz[1] - ss_xyz[1])
     z_dto = abs(cube_xyz[2] - ss_xyz[2])
 
-    # wyznaczam najlepsze pozycje na osi Z, sortując od najbliższej do współrzędnej Z sześcianu-targetu do najdalszej
-    z_poss = []
-    for z_pos in range(pool.height):
-        z_poss.append([abs(cube_xyz[2] - z_pos), z_pos])
-    z_poss.sort(key=lambda x: x[0])
+    # pierścienie przesunięć w płaszczyźnie XY, uporządkowane raz dla danego prostopadłościanu wyboru
+    rings = curve_offset_rings(prl_lw[0], prl_lw[1])
+    floors = pool.floors
+    scanned = 0
 
     curve_len = 0
 
     while x_dto + y_dto + z_dto != 0:
         np_xyz = ss_xyz  # new point XYZ - współrzędne nowego wierzchołku łamanej
 
+        # punkt prostopadłościanu wyboru najbliższy sześcianowi-targetowi w płaszczyźnie XY; odległość (w metryce
+        # miejskiej) od sześcianu-targetu do dowolnego punktu prostopadłościanu to base + odległość od tego punktu,
+        # więc kolejne pierścienie wokół niego to kandydaci w kolejności rosnącej odległości XY od celu
+        x_near = min(max(cube_xyz[0], ss_xyz[0] - prl_lw[0]), ss_xyz[0] + prl_lw[0])
+        y_near = min(max(cube_xyz[1], ss_xyz[1] - prl_lw[1]), ss_xyz[1] + prl_lw[1])
+        base = abs(cube_xyz[0] - x_near) + abs(cube_xyz[1] - y_near)
+
         if enhanced_realism is True:
-            xyz_poss = []
-            for z_pos in range(pool.height):  # w zakresie wysokości basenu
-
-                for y_pos in range(ss_xyz[1] - prl_lw[1], ss_xyz[1] + prl_lw[1] + 1):  # Y w ramach prostopadłościanu wyboru
-                    if 0 <= y_pos < pool.width:  # jeżeli wybrany punkt znajduje się w ramach basenu
-
-                        for x_pos in range(ss_xyz[0] - prl_lw[0], ss_xyz[0] + prl_lw[0] + 1):  # X w ramach prostopadłościanu wyboru
-                            if 0 <= x_pos < pool.length:  # jeżeli wybrany punkt znajduje się w ramach basenu
-
-                                # wyznaczam odległości od ewentualnie nowego wierzchołku do sześcianu-targetu
-                                x_dto = abs(cube_xyz[0] - x_pos)
-                                y_dto = abs(cube_xyz[1] - y_pos)
-                                z_dto = abs(cube_xyz[2] - z_pos)
-
-                                # dodaję do listy sumę pozostałych odległości oraz nowe współrzędne, żeby później wybrać jak najlepsze
-                                xyz_poss.append([x_dto + y_dto + z_dto, x_dto + y_dto, (x_pos, y_pos, z_pos)])
-
-            xyz_poss.sort(key=lambda x: x[0])  # sortuję od najlepszej pozycji do najgorszej (rośnie suma odległości)
-
-            for i in range(len(xyz_poss)):
-                if xyz_poss[i][0] < abs(cube_xyz[0] - ss_xyz[0]) + abs(cube_xyz[1] - ss_xyz[1]) + abs(cube_xyz[2] - ss_xyz[2]):
-                    # jeżeli zbliżamy się do celu względem trzech osi (czyli nie oddalamy się ani nie stoimy na miejscu)
-                    if xyz_poss[i][1] <= abs(cube_xyz[0] - ss_xyz[0]) + abs(cube_xyz[1] - ss_xyz[1]):
-                        # jeżeli nie oddalamy się od punktu końcowego w płaszczyźnie XY (ten warunek nie pozwala zrabić ruch do tyłu)
-                        x_pos = xyz_poss[i][2][0]
-                        y_pos = xyz_poss[i][2][1]
-                        z_pos = xyz_poss[i][2][2]
-                        if pool.filling[z_pos][y_pos][x_pos].is_water is True:
-                            # jeżeli metr sześcienny o tych współrzędnych jest wodny, wybieram jego współrzędne jako nowy wierzchołek
-                            np_xyz = (x_pos, y_pos, z_pos)
-                            break
+            # Kandydatem jest każdy wodny sześcian prostopadłościanu, który zbliża nas do celu względem trzech osi
+            # i nie oddala w płaszczyźnie XY; wybiera się kandydat o najmniejszej sumie odległości, a przy równych
+            # sumach - pierwszy w kolejności (z, y, x). Dla jednej kolumny najlepszy jest wodny sześcian najbliższy
+            # celowi względem osi Z, więc wystarczy porównać kolumny, przeglądając pierścienie, dopóki odległość XY
+            # nie przekroczy najlepszej znalezionej sumy.
+            xy_limit = x_dto + y_dto
+            best = None
+            for ring, offsets in enumerate(rings):
+                xy_distance = base + ring
+                if xy_distance > xy_limit or (best is not None and xy_distance > best[0]):
+                    break
+                for x_offset, y_offset in offsets:
+                    x_pos, y_pos = x_near + x_offset, y_near + y_offset
+                    if abs(x_pos - ss_xyz[0]) <= prl_lw[0] and abs(y_pos - ss_xyz[1]) <= prl_lw[1] and \
+                            0 <= x_pos < pool.length and 0 <= y_pos < pool.width:
+                        scanned += 1
+                        z_pos = nearest_water_z(pool, x_pos, y_pos, cube_xyz[2], floors)
+                        if z_pos is not None:
+                            candidate = (xy_distance + abs(cube_xyz[2] - z_pos), z_pos, y_pos, x_pos)
+                            if best is None or candidate < best:
+                                best = candidate
+            if best is not None and best[0] < x_dto + y_dto + z_dto:
+                # wybrany sześcian zbliża nas do celu, więc wybieram go jako nowy wierzchołek
+                np_xyz = (best[3], best[2], best[1])
 
         # jeżeli nie udało się wybrać najlepszego sześcianu z poprzednich warunków, lub nie został wybrany tryb enhanced_realist
         if np_xyz == ss_xyz:
-            xy_poss = []
-            for y_pos in range(ss_xyz[1] - prl_lw[1], ss_xyz[1] + prl_lw[1] + 1):  # Y w ramach prostopadłościanu wyboru
-                if 0 <= y_pos < pool.width:  # jeżeli wybrany punkt znajduje się w ramach basenu
-
-                    for x_pos in range(ss_xyz[0] - prl_lw[0], ss_xyz[0] + prl_lw[0] + 1):  # X w ramach prostopadłościanu wyboru
-                        if 0 <= x_pos < pool.length:  # jeżeli wybrany punkt znajduje się w ramach basenu
-
-                            # wyznaczam odległości od ewentualnie nowego wierzchołku do sześcianu-targetu
-                            x_dto = abs(cube_xyz[0] - x_pos)
-                            y_dto = abs(cube_xyz[1] - y_pos)
-
-                            # dodaję do listy sumę pozostałych odległości oraz nowe współrzędne, żeby później wybrać jak najlepsze
-                            xy_poss.append([x_dto + y_dto, (x_pos, y_pos)])
-
-            xy_poss.sort(key=lambda x: x[0])  # sortuję od najlepszej pozycji do najgorszej (rośnie suma odległości)
-
-            for i in range(len(xy_poss)):
-                # wybieram najlepsze możliwe współrzędne w płaszczyźnie XY
-                x_pos = xy_poss[i][1][0]
-                y_pos = xy_poss[i][1][1]
-                for j in range(len(z_poss)):
-                    # wybieram najlepszą współrzędną na osi Z
-                    z_pos = z_poss[j][1]
-                    if pool.filling[z_pos][y_pos][x_pos].is_water is True:
-                        # jeżeli metr sześcienny o tych współrzędnych jest wodny, wybieram jego współrzędne jako nowy wierzchołek łamanej
-                        np_xyz = (x_pos, y_pos, z_pos)
-                        break
+            # pierwsza kolumna w kolejności (odległość XY od celu, y, x), w której jest wodny sześcian; na osi Z
+            # - wodny sześcian najbliższy celowi
+            for offsets in rings:
+                for x_offset, y_offset in offsets:
+                    x_pos, y_pos = x_near + x_offset, y_near + y_offset
+                    if abs(x_pos - ss_xyz[0]) <= prl_lw[0] and abs(y_pos - ss_xyz[1]) <= prl_lw[1] and \
+                            0 <= x_pos < pool.length and 0 <= y_pos < pool.width:
+                        scanned += 1
+                        z_pos = nearest_water_z(pool, x_pos, y_pos, cube_xyz[2], floors)
+                        if z_pos is not None:
+                            np_xyz = (x_pos, y_pos, z_pos)
+                            break
                 if np_xyz != ss_xyz:
                     break
 
@@ -504,4 +2343,544 @@ def shortest_curve(pool: Pool, ss_xyz, cube_xyz, prl_lw, enhanced_realism=True):
         y_dto = abs(cube_xyz[1] - ss_xyz[1])
         z_dto = abs(cube_xyz[2] - ss_xyz[2])
 
+    count('candidates_scanned', scanned)
     return curve_len
+
+
+@lru_cache(maxsize=None)
+def curve_offset_rings(length, width):
+    """ Funkcja porządkuje przesunięcia w płaszczyźnie XY, które mogą wskazać kolumnę prostopadłościanu wyboru
+    (prl_lw = (length, width)) względem dowolnego jego punktu, w pierścienie rosnącej odległości w metryce miejskiej.
+
+    Note:
+        Tablica wyznacza się raz dla danego prostopadłościanu i służy wszystkim wywołaniom shortest_curve(), zamiast
+        budowania i sortowania listy kandydatów w każdym kroku łamanej.
+
+    Args:
+        length (int): wymiar prostopadłościanu względem osi X (przesunięcia w zakresie [-2 * length; 2 * length]).
+        width (int): wymiar prostopadłościanu względem osi Y (przesunięcia w zakresie [-2 * width; 2 * width]).
+
+    Returns:
+        tuple: pierścienie - krotki przesunięć (dx, dy) o sumie |dx| + |dy| równej numerowi pierścienia,
+            uporządkowane według (dy, dx) - tak jak kandydaci dodawani wierszami.
+
+    """
+
+    rings = [[] for _ in range(2 * length + 2 * width + 1)]
+    for y_offset in range(-2 * width, 2 * width + 1):
+        for x_offset in range(-2 * length, 2 * length + 1):
+            rings[abs(x_offset) + abs(y_offset)].append((x_offset, y_offset))
+    return tuple(tuple(ring) for ring in rings)
+
+
+def nearest_water_z(pool: Pool, x_position, y_position, z_position, floors=None):
+    """ Funkcja zwraca wodny sześcian kolumny (x, y) najbliższy podanej współrzędnej Z (przy równych odległościach
+    - niższy).
+
+    Poniżej dna kolumny (Pool().floors) nie ma wodnych sześcianów, a powyżej - niewodne są tylko źródła dźwięku, więc
+    zwykle wystarczy jedno sprawdzenie.
+
+    Args:
+        pool (Pool): basen.
+        x_position (int): współrzędna kolumny względem osi X.
+        y_position (int): współrzędna kolumny względem osi Y.
+        z_position (int): współrzędna Z, do której szukamy najbliższego wodnego sześcianu.
+        floors (numpy.ndarray|None): wysokości dna kolumn; jeżeli None - pool.floors.
+
+    Returns:
+        int|None: współrzędna Z wodnego sześcianu albo None, jeżeli w kolumnie nie ma wodnego sześcianu.
+
+    """
+
+    floor = int((pool.floors if floors is None else floors)[y_position, x_position])
+    if z_position < floor:
+        # cel leży w terenie - najbliższe są kolejne sześciany nad dnem
+        return pool.min_water_z(x_position, y_position, floor)
+    for distance in range(pool.height):
+        below, above = z_position - distance, z_position + distance
+        if below < floor and above >= pool.height:
+            return None
+        if below >= floor and pool.is_water(x_position, y_position, below):
+            return below
+        if distance and above < pool.height and pool.is_water(x_position, y_position, above):
+            return above
+    return None
+
+
+def min_obstacle_runs(solid):
+    """ Funkcja wyznacza minimalną długość ciągłej przeszkody w każdym wierszu tablicy wzdłuż ostatniej osi.
+
+    Długości wszystkich ciągów przeszkód wyznaczają się naraz z przejść 0->1 i 1->0 w spłaszczonej tablicy,
+    otoczonej w każdym wierszu zerami, bez pętli po sześcianach.
+
+    Args:
+        solid (numpy.ndarray): tablica logiczna [..., n]; True dla przeszkód.
+
+    Returns:
+        numpy.ndarray|int: tablica [...] minimalnych długości przeszkód w wierszach (n dla wierszy bez przeszkód);
+            dla tablicy jednowymiarowej - liczba.
+
+    """
+
+    length = solid.shape[-1]
+    padded = np.zeros(solid.shape[:-1] + (length + 2,), dtype=np.int8)
+    padded[..., 1:-1] = solid
+    transitions = np.diff(padded, axis=-1).ravel()  # każdy wiersz ma teraz length + 1 przejść
+    starts = np.flatnonzero(transitions == 1)
+    ends = np.flatnonzero(transitions == -1)
+
+    runs = np.full(int(np.prod(solid.shape[:-1], dtype=np.int64)), length, dtype=np.int64)
+    np.minimum.at(runs, starts // (length + 1), ends - starts)
+    return runs.reshape(solid.shape[:-1]) if solid.ndim > 1 else int(runs[0])
+
+
+def block_fraction(mask, factor):
+    """ Funkcja zmniejsza rozdzielczość trójwymiarowej maski: dla każdego bloku factor³ elementów wyznacza odsetek
+    prawdziwych elementów. Niepełne bloki na krańcach liczy się tylko po elementach należących do maski.
+
+    Args:
+        mask (numpy.ndarray): tablica logiczna [z, y, x].
+        factor (int): rozmiar bloku.
+
+    Returns:
+        numpy.ndarray: tablica float64 o wymiarach zaokrąglonych w górę do wielokrotności factor i podzielonych
+            przez factor.
+
+    """
+
+    padding = [(0, -size % factor) for size in mask.shape]
+    height, width, length = ((size + pad) // factor for size, (_, pad) in zip(mask.shape, padding))
+    shape = (height, factor, width, factor, length, factor)
+    hits = np.pad(mask, padding).reshape(shape).sum(axis=(1, 3, 5))
+    sizes = np.pad(np.ones(mask.shape, dtype=bool), padding).reshape(shape).sum(axis=(1, 3, 5))
+    return hits / sizes
+
+
+def interpolation_errors(coarse):
+    """ Funkcja szacuje względny błąd interpolacji liniowej tablicy wartości zgrubnej siatki: dla każdego węzła -
+    największe (po osiach) odchylenie jego wartości od średniej wartości dwóch sąsiadów wzdłuż osi, podzielone przez
+    wartość węzła. Węzły na krańcach osi i węzły z nieskończonym sąsiadem wzdłuż danej osi tej osi nie uwzględniają.
+
+    Args:
+        coarse (numpy.ndarray): tablica [z, y, x] wartości zgrubnej siatki (inf - brak wartości).
+
+    Returns:
+        numpy.ndarray: tablica float64 [z, y, x] oszacowań błędu; 0 dla węzłów bez żadnej pełnej trójki wzdłuż osi.
+
+    """
+
+    errors = np.zeros(coarse.shape)
+    for axis in range(coarse.ndim):
+        if coarse.shape[axis] < 3:
+            continue
+        values = np.moveaxis(coarse, axis, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deviation = np.abs(values[1:-1] - (values[:-2] + values[2:]) / 2) / values[1:-1]
+        inner = np.moveaxis(errors, axis, 0)[1:-1]  # widok - zapis trafia do errors
+        np.maximum(inner, np.where(np.isfinite(deviation), deviation, 0), out=inner)
+    return errors
+
+
+def upsample_distances(coarse, shape, factor):
+    """ Funkcja interpoluje trójliniowo tablicę wartości zgrubnej siatki (środki bloków factor³) do pełnej
+    rozdzielczości. Nieskończone wartości (bloki nieosiągalne lub ziemne) są pomijane - wagi pozostałych narożników
+    normalizuje się do jedności.
+
+    Args:
+        coarse (numpy.ndarray): tablica [z, y, x] wartości zgrubnej siatki.
+        shape (tuple): wymiary tablicy pełnej rozdzielczości.
+        factor (int): rozmiar bloku.
+
+    Returns:
+        numpy.ndarray: tablica float64 o wymiarach shape; inf, jeżeli wszystkie narożniki o niezerowej wadze są
+            nieskończone.
+
+    """
+
+    corners = []  # dla każdej osi: (indeksy dolnego narożnika, waga), (indeksy górnego narożnika, waga)
+    for fine_size, coarse_size in zip(shape, coarse.shape):
+        position = (np.arange(fine_size) - (factor - 1) / 2) / factor  # współrzędna względem środków bloków
+        lower = np.clip(np.floor(position).astype(np.int64), 0, coarse_size - 1)
+        upper = np.minimum(lower + 1, coarse_size - 1)
+        weight = np.clip(position - lower, 0, 1)
+        corners.append(((lower, 1 - weight), (upper, weight)))
+
+    values = np.zeros(shape)
+    weights = np.zeros(shape)
+    for z_blocks, z_weights in corners[0]:
+        for y_blocks, y_weights in corners[1]:
+            for x_blocks, x_weights in corners[2]:
+                corner = coarse[np.ix_(z_blocks, y_blocks, x_blocks)]
+                weight = z_weights[:, None, None] * y_weights[None, :, None] * x_weights[None, None, :]
+                weight = np.where(np.isfinite(corner), weight, 0)
+                values += weight * np.where(np.isfinite(corner), corner, 0)
+                weights += weight
+
+    result = np.full(shape, inf)
+    np.divide(values, weights, out=result, where=weights > 0)
+    return result
+
+
+def straight_distances(coordinates, point):
+    """ Funkcja zwraca odległości w linii prostej od punktu do wszystkich węzłów siatki prostokątnej.
+
+    Args:
+        coordinates (list): współrzędne węzłów wzdłuż osi Z, Y i X (trzy tablice jednowymiarowe).
+        point (tuple|list): współrzędne (z, y, x) punktu.
+
+    Returns:
+        numpy.ndarray: tablica float64 [z, y, x] odległości.
+
+    """
+
+    z_coordinates, y_coordinates, x_coordinates = (axis - coordinate for axis, coordinate in zip(coordinates, point))
+    return np.sqrt(z_coordinates[:, None, None] ** 2 + y_coordinates[None, :, None] ** 2 +
+                   x_coordinates[None, None, :] ** 2)
+
+
+def line_of_sight_heights(floors, ss_xyz):
+    """ Funkcja wyznacza dla każdej kolumny basenu wysokość, powyżej której sześciany tej kolumny widzą źródło dźwięku
+    nad terenem opisanym wysokościami dna kolumn - jednym przebiegiem cienia od źródła na zewnątrz.
+
+    Sześciany są sześcianami jednostkowymi o środkach w punktach całkowitych, a teren kolumny (x, y) zajmuje
+    z < floors[y, x] - 0.5. Odcinek od środka źródła do środka sześcianu (x, y, z) o poziomej długości D wchodzi nad
+    kolumnę k w poziomej odległości d od źródła, a jego wysokość rośnie liniowo, więc nie dotyka terenu kolumny k,
+    jeżeli (z - z_źródła) / D > (teren_k - z_źródła) / d. Przebieg ogranicza ten iloraz od góry wartością niezależną
+    od celu (nachylenie cienia kolumny k): d zastępuje najmniejszą odległością kwadratu kolumny od źródła, gdy teren
+    leży nad źródłem, a największą - gdy pod nim. Kolumny przetwarza się pierścieniami (odległość Czebyszewa od
+    źródła) od środka; odcinek do kolumny z pierścienia R dotyka wyłącznie kolumn z pierścieni wewnętrznych, których
+    kwadrat widać ze źródła pod kątem kierunku celu, samej kolumny celu i - dla kolumn na przekątnych - dwóch sąsiadów
+    stykających się z nią narożnikiem. Nachylenia cienia gromadzi tablica przedziałów kąta: kolumnę wpisuje się do
+    przedziałów pokrywanych przez jej kwadrat, a cel odczytuje przedział swojego kierunku przed wpisaniem własnego
+    pierścienia. Kwadrat w odległości d pokrywa około 1 / d z liczby przedziałów proporcjonalnej do promienia basenu,
+    więc łączny koszt jest liniowy względem liczby kolumn.
+
+    Wynik jest zachowawczy: sześcian powyżej zwróconej wysokości na pewno widzi źródło (odcinek nie dotyka nawet
+    terenu, również narożnikiem kolumny), a niektóre sześciany tuż nad nią mogą zostać uznane za zasłonięte - dla
+    nich shortest_curve() wyznacza się tak jak bez tego przebiegu.
+
+    Args:
+        floors (numpy.ndarray): tablica [y, x] wysokości dna kolumn (Pool().floors).
+        ss_xyz (tuple|list): współrzędne lokalizacji źródła dźwięku (sound source XYZ).
+
+    Returns:
+        numpy.ndarray: tablica float64 [y, x]; sześcian (x, y, z) widzi źródło, jeżeli z > wartość dla kolumny.
+
+    """
+
+    width, length = floors.shape
+    x_source, y_source, z_source = ss_xyz
+    rise = np.asarray(floors, dtype=np.float64) - 0.5 - z_source  # wysokość terenu kolumn względem źródła
+    dy, dx = np.meshgrid(np.arange(width) - y_source, np.arange(length) - x_source, indexing='ij')
+    ring = np.maximum(abs(dx), abs(dy))
+    reach = np.hypot(dx, dy)  # pozioma odległość środka kolumny od źródła (D)
+
+    # nachylenie cienia kolumny - najmniejsza albo największa odległość punktów jej kwadratu od źródła
+    nearest = np.hypot(np.maximum(abs(dx) - 0.5, 0), np.maximum(abs(dy) - 0.5, 0))
+    farthest = np.hypot(abs(dx) + 0.5, abs(dy) + 0.5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(rise > 0, rise / nearest, rise / farthest)
+
+    # przedziały kąta (kierunku ze źródła) pokrywane przez kwadraty kolumn
+    sectors = 16 * max(int(ring.max()), 1)
+    corners = np.arctan2(dy[None] + np.array([-0.5, -0.5, 0.5, 0.5])[:, None, None],
+                         dx[None] + np.array([-0.5, 0.5, -0.5, 0.5])[:, None, None])
+    behind = (dy == 0) & (dx < 0)  # kwadrat na przedłużeniu osi -X przecina nieciągłość kąta (+-pi)
+    corners = np.where(behind[None] & (corners < 0), corners + 2 * np.pi, corners)
+    scale = sectors / (2 * np.pi)
+    first = np.floor((corners.min(axis=0) + np.pi) * scale - 1e-6).astype(np.int64)
+    last = np.floor((corners.max(axis=0) + np.pi) * scale + 1e-6).astype(np.int64)
+    first[ring == 0], last[ring == 0] = 0, sectors - 1  # kolumna źródła - wszystkie kierunki
+    own_sector = np.floor((np.arctan2(dy, dx) + np.pi) * scale).astype(np.int64) % sectors
+
+    # kolumny uporządkowane pierścieniami oraz rozwinięte wpisy (przedział kąta, nachylenie cienia)
+    order = np.argsort(ring, axis=None, kind='stable')
+    counts = (last - first + 1).ravel()[order]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    entries = np.repeat(first.ravel()[order], counts) + np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+    entries %= sectors
+    entry_slopes = np.repeat(slope.ravel()[order], counts)
+    bounds = np.searchsorted(ring.ravel()[order], np.arange(ring.max() + 2))
+
+    shadow = np.full(sectors, -np.inf)
+    cast = np.full(width * length, -np.inf)  # największe nachylenie cienia nad drogą do kolumny
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        cells = order[start:stop]
+        cast[cells] = shadow[own_sector.ravel()[cells]]
+        np.maximum.at(shadow, entries[offsets[start]:offsets[stop]], entry_slopes[offsets[start]:offsets[stop]])
+    cast = cast.reshape(width, length)
+
+    # kolumna celu: odcinek wchodzi nad nią w części (|d| - 0.5) / |d| swojej długości wzdłuż dłuższej osi
+    entry = np.maximum(ring - 0.5, 0) / np.maximum(ring, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        heights = np.where(rise > 0, z_source + rise / entry, z_source + rise)
+        heights = np.maximum(heights, np.where(np.isfinite(cast), z_source + reach * cast, -np.inf))
+
+    # kolumny na przekątnych - odcinek przechodzi przez narożnik stykający je z dwoma sąsiadami z tego samego pierścienia
+    diagonal = (abs(dx) == abs(dy)) & (ring > 0)
+    y_cells, x_cells = np.nonzero(diagonal)
+    step_y, step_x = np.sign(dy[diagonal]), np.sign(dx[diagonal])
+    touching = np.maximum(rise[y_cells - step_y, x_cells], rise[y_cells, x_cells - step_x])
+    radius = ring[diagonal]
+    heights[diagonal] = np.maximum(heights[diagonal], z_source + touching * radius / (radius - 0.5))
+    return heights + 1e-9  # błędy zaokrągleń nie mogą odsłonić sześcianu leżącego dokładnie na granicy cienia
+
+
+def dilate(mask):
+    """ Funkcja rozszerza trójwymiarową maskę o jeden sześcian w kierunku każdego z 26 sąsiadów.
+
+    Args:
+        mask (numpy.ndarray): tablica logiczna [z, y, x].
+
+    Returns:
+        numpy.ndarray: tablica logiczna - maska razem z sąsiadami jej elementów.
+
+    """
+
+    height, width, length = mask.shape
+    padded = np.pad(mask, 1)
+    result = mask.copy()
+    for dx, dy, dz in NEIGHBOUR_OFFSETS:
+        result |= padded[1 + dz:height + 1 + dz, 1 + dy:width + 1 + dy, 1 + dx:length + 1 + dx]
+    return result
+
+
+def wavefront_distances(water, ss_xyz, seeds=None):
+    """ Funkcja zwraca długości najkrótszych dróg fali dźwiękowej od źródła dźwięku do wszystkich wodnych metrów
+    sześciennych basenu, wyznaczone jednym przejściem czoła fali (algorytm Dijkstry).
+
+    Fala rozchodzi się wyłącznie po wodnych sześcianach, przechodząc do każdego z 26 sąsiadów (NEIGHBOUR_OFFSETS);
+    krok do sąsiada ma długość 1, sqrt(2) lub sqrt(3), w zależności od liczby zmienionych współrzędnych. Dzięki temu
+    fala ugina się wokół przeszkód najkrótszą możliwą drogą po siatce, a złożoność obliczeniowa wynosi O(N log N)
+    dla całego basenu zamiast osobnego wyszukiwania łamanej dla każdego sześcianu.
+
+    Args:
+        water (numpy.ndarray): tablica logiczna [z, y, x] wodnych sześcianów, np. wynik Pool().water_mask().
+        ss_xyz (tuple|list|None): współrzędne lokalizacji źródła dźwięku (sound source XYZ); sam sześcian źródła nie
+            musi być wodny. None - czoło fali startuje tylko z punktów seeds.
+        seeds (numpy.ndarray|None): tablica [z, y, x] początkowych długości dróg - skończone wartości są dodatkowymi
+            punktami startowymi czoła fali (nie muszą być wodne), np. długości wyznaczone na zgrubnej siatce na granicy
+            doliczanego obszaru.
+
+    Returns:
+        numpy.ndarray: tablica float64 [z, y, x] długości dróg; inf dla sześcianów nieosiągalnych lub niewodnych
+            (poza samym źródłem, dla którego długość wynosi 0).
+
+    """
+
+    height, width, length = water.shape
+    # otaczam basen warstwą niewodnych sześcianów, żeby nie sprawdzać granic basenu przy każdym kroku
+    padded = np.zeros((height + 2, width + 2, length + 2), dtype=bool)
+    padded[1:-1, 1:-1, 1:-1] = water
+    passable = padded.ravel().tolist()
+
+    # przesunięcia indeksów w spłaszczonej tablicy i długości kroków do sąsiadów
+    z_stride = (width + 2) * (length + 2)
+    y_stride = length + 2
+    steps = [(dz * z_stride + dy * y_stride + dx, sqrt(dx ** 2 + dy ** 2 + dz ** 2)) for dx, dy, dz in NEIGHBOUR_OFFSETS]
+
+    distances = [inf] * len(passable)
+    front = []  # czoło fali - kolejka priorytetowa (długość drogi, indeks sześcianu)
+    if seeds is not None:
+        padded_seeds = np.full(padded.shape, inf)
+        padded_seeds[1:-1, 1:-1, 1:-1] = seeds
+        distances = padded_seeds.ravel().tolist()
+        front = [(distances[index], index) for index in np.flatnonzero(np.isfinite(padded_seeds.ravel())).tolist()]
+    if ss_xyz is not None:
+        start = (ss_xyz[2] + 1) * z_stride + (ss_xyz[1] + 1) * y_stride + ss_xyz[0] + 1
+        distances[start] = 0.0
+        front.append((0.0, start))
+    heapify(front)
+    while front:
+        distance, index = heappop(front)
+        if distance > distances[index]:
+            continue  # sześcian został już osiągnięty krótszą drogą
+        for step, step_length in steps:
+            neighbour = index + step
+            if passable[neighbour] and distance + step_length < distances[neighbour]:
+                distances[neighbour] = distance + step_length
+                heappush(front, (distance + step_length, neighbour))
+
+    return np.array(distances).reshape(padded.shape)[1:-1, 1:-1, 1:-1]
+
+
+def update_wavefront_distances(distances, passable, changed, tolerance=1e-6):
+    """ Funkcja aktualizuje długości dróg fali (wynik wavefront_distances()) po zmianie terenu, przeliczając tylko
+    sześciany, których długość drogi mogła się zmienić - koszt zależy od wielkości zmienionego obszaru, a nie basenu.
+
+    Aktualizacja przebiega w dwóch krokach:
+        1. Unieważnienie: sześciany, które przestały być wodne, oraz - w kolejności rosnących długości - każdy sześcian,
+           którego wszyscy poprzednicy na najkrótszych drogach (sąsiedzi u z d(u) + krok = d(v)) zostali unieważnieni.
+        2. Czoło fali startuje z unieważnionych i nowych wodnych sześcianów (z długościami wynikającymi z ich
+           nieunieważnionych sąsiadów) i rozchodzi się dalej tylko tam, gdzie skraca długości dróg.
+
+    Args:
+        distances (numpy.ndarray): tablica float64 [z, y, x] długości dróg sprzed zmiany; aktualizowana w miejscu.
+            Długość 0 oznacza źródło dźwięku (punkt startowy, który nie musi być wodny).
+        passable (numpy.ndarray): tablica logiczna [z, y, x] sześcianów, przez które fala przechodzi po zmianie.
+        changed (numpy.ndarray): tablica logiczna [z, y, x] sześcianów, których przechodniość się zmieniła.
+        tolerance (float): względna tolerancja porównywania długości dróg (np. odtworzonych z natężeń float32).
+
+    Returns:
+        numpy.ndarray: tablica logiczna [z, y, x] sześcianów, których długość drogi została przeliczona.
+
+    """
+
+    height, width, length = distances.shape
+    flat = distances.reshape(-1)
+    open_ = passable.reshape(-1)
+    steps = [(dx, dy, dz, sqrt(dx ** 2 + dy ** 2 + dz ** 2)) for dx, dy, dz in NEIGHBOUR_OFFSETS]
+
+    def neighbours(index):
+        z, rest = divmod(index, width * length)
+        y, x = divmod(rest, length)
+        for dx, dy, dz, step_length in steps:
+            if 0 <= x + dx < length and 0 <= y + dy < width and 0 <= z + dz < height:
+                yield index + (dz * width + dy) * length + dx, step_length
+
+    # 1. unieważnienie sześcianów, których wszystkie najkrótsze drogi prowadziły przez nowy teren
+    removed = np.flatnonzero((changed & ~passable).reshape(-1)).tolist()
+    invalid = set(index for index in removed if flat[index] != inf)
+    candidates = []
+    for index in invalid:
+        for neighbour, _ in neighbours(index):
+            if flat[neighbour] > flat[index] and flat[neighbour] != inf:
+                heappush(candidates, (flat[neighbour], neighbour))
+    while candidates:
+        distance, index = heappop(candidates)
+        if index in invalid:
+            continue
+        # poprzednicy sześcianu na najkrótszych drogach mają mniejsze długości, więc zostali już rozstrzygnięci
+        predecessors = [neighbour for neighbour, step_length in neighbours(index)
+                        if abs(flat[neighbour] + step_length - distance) <= tolerance * max(distance, 1)]
+        if predecessors and all(neighbour in invalid for neighbour in predecessors):
+            invalid.add(index)
+            for neighbour, _ in neighbours(index):
+                if flat[neighbour] > distance and flat[neighbour] != inf and neighbour not in invalid:
+                    heappush(candidates, (flat[neighbour], neighbour))
+
+    # 2. czoło fali z unieważnionych i nowych wodnych sześcianów
+    region = invalid | set(np.flatnonzero((changed & passable).reshape(-1)).tolist())
+    for index in region:
+        flat[index] = inf
+    front = []
+    for index in region:
+        if not open_[index]:
+            continue
+        best = min((flat[neighbour] + step_length for neighbour, step_length in neighbours(index)
+                    if neighbour not in region), default=inf)
+        if best < inf:
+            flat[index] = best
+            front.append((best, index))
+    heapify(front)
+    updated = set(region)
+    while front:
+        distance, index = heappop(front)
+        if distance > flat[index]:
+            continue  # sześcian został już osiągnięty krótszą drogą
+        for neighbour, step_length in neighbours(index):
+            if open_[neighbour] and distance + step_length < flat[neighbour] * (1 - 1e-12):
+                flat[neighbour] = distance + step_length
+                updated.add(neighbour)
+                heappush(front, (distance + step_length, neighbour))
+
+    recomputed = np.zeros(distances.size, dtype=bool)
+    recomputed[list(updated)] = True
+    return recomputed.reshape(distances.shape)
+
+
+def curve_dirty_columns(shape, ss_xy, y_slice, x_slice, prl_lw):
+    """ Funkcja wyznacza kolumny basenu, dla których wynik shortest_curve() może zależeć od terenu w prostokącie XY.
+
+    Kolejne wierzchołki łamanej nie oddalają się od celu w płaszczyźnie XY (w metryce taksówkowej), więc leżą w rombie
+    o środku w celu i promieniu równym odległości celu od źródła, a wybór każdego z nich sprawdza tylko kolumny
+    w prostopadłościanie wyboru (prl_lw) wokół poprzedniego wierzchołka. Kolumna jest "brudna", jeżeli prostokąt
+    leży w zasięgu tego rombu powiększonego o prostopadłościan wyboru.
+
+    Args:
+        shape (tuple): wymiary basenu (szerokość, długość) - (oś Y, oś X).
+        ss_xy (tuple|list): współrzędne (x, y) źródła dźwięku.
+        y_slice (slice): zakres prostokąta wzdłuż osi Y.
+        x_slice (slice): zakres prostokąta wzdłuż osi X.
+        prl_lw (tuple|list): wymiary prostopadłościanu wyboru wierzchołków łamanej.
+
+    Returns:
+        numpy.ndarray: tablica logiczna [y, x] kolumn do przeliczenia.
+
+    """
+
+    y, x = np.arange(shape[0])[:, None], np.arange(shape[1])[None, :]
+    # odległość kolumny od prostokąta wzdłuż każdej osi, pomniejszona o zasięg prostopadłościanu wyboru
+    x_gap = np.maximum(np.maximum(x_slice.start - x, x - (x_slice.stop - 1)) - prl_lw[0], 0)
+    y_gap = np.maximum(np.maximum(y_slice.start - y, y - (y_slice.stop - 1)) - prl_lw[1], 0)
+    return x_gap + y_gap <= np.abs(x - ss_xy[0]) + np.abs(y - ss_xy[1])
+
+
+def chunked_wavefront_distances(material, ss_xyz):
+    """ Funkcja zwraca długości najkrótszych dróg fali dźwiękowej od źródła dźwięku do wszystkich wodnych metrów
+    sześciennych basenu przechowywanego w blokach (Pool(storage='chunked')), nie wczytując całego basenu do pamięci.
+
+    Wynik jest taki sam jak wavefront_distances() dla całego basenu, ale czoło fali przechodzi basen blok po bloku:
+    dla bloku wraz z otaczającą go warstwą sąsiadów (halo) uruchamia się wavefront_distances(), startując z bieżących
+    długości dróg, a poprawione długości zapisują się z powrotem. Jeżeli poprawiła się długość któregoś sześcianu
+    na ścianie, krawędzi lub w narożniku bloku, to do kolejki trafia sąsiedni blok po tej stronie. Kolejka jest
+    uporządkowana według najkrótszej poprawionej długości (jak czoło fali), więc większość bloków przechodzi się raz;
+    obliczenia kończą się, gdy żaden blok nie poprawia już długości dróg.
+
+    Args:
+        material (ChunkedGrid): siatka uint8 [z, y, x] rodzajów materiału basenu (WATER, TERRAIN, SOURCE).
+        ss_xyz (tuple|list): współrzędne lokalizacji źródła dźwięku (sound source XYZ).
+
+    Returns:
+        ChunkedGrid: siatka float64 [z, y, x] długości dróg o tych samych blokach co material; inf dla sześcianów
+            nieosiągalnych lub niewodnych (poza samym źródłem, dla którego długość wynosi 0).
+
+    """
+
+    size = material.chunk_size
+    distances = ChunkedGrid(material.shape, np.float64, size, material.resident_chunks, inf,
+                            os.path.dirname(material.path))
+    distances[ss_xyz[2], ss_xyz[1], ss_xyz[0]] = 0.0
+
+    source_chunk = (ss_xyz[2] // size, ss_xyz[1] // size, ss_xyz[0] // size)
+    queue = [(0.0, source_chunk)]  # kolejka priorytetowa bloków (najkrótsza poprawiona długość, indeks bloku)
+    queued = {source_chunk: 0.0}
+    with phase('field_computation', total=None) as progress:
+        while queue:
+            key, index = heappop(queue)
+            if queued.get(index) != key:
+                continue  # blok trafił do kolejki ponownie z mniejszym kluczem i został już przeliczony
+            del queued[index]
+
+            # blok razem z halo (przyciętym do granic basenu)
+            inner = [slice(i * size, min((i + 1) * size, length)) for i, length in zip(index, material.shape)]
+            outer = tuple(slice(max(region.start - 1, 0), min(region.stop + 1, length))
+                          for region, length in zip(inner, material.shape))
+            inside = tuple(slice(region.start - halo.start, region.stop - halo.start)
+                           for region, halo in zip(inner, outer))
+
+            seeds = distances[outer]
+            local = wavefront_distances(material[outer] == WATER, None, seeds)
+            before = seeds[inside]
+            after = np.minimum(local[inside], before)
+            improved = after < before
+            if not improved.any():
+                progress.advance()
+                continue
+            distances[tuple(inner)] = after
+
+            # sąsiedni blok trafia do kolejki, jeżeli poprawiły się długości na zwróconej do niego granicy bloku
+            for dx, dy, dz in NEIGHBOUR_OFFSETS:
+                neighbour = (index[0] + dz, index[1] + dy, index[2] + dx)
+                if not all(0 <= i < n for i, n in zip(neighbour, material.chunks_shape)):
+                    continue
+                border = tuple(slice(0, 1) if d < 0 else slice(-1, None) if d > 0 else slice(None)
+                               for d in (dz, dy, dx))
+                changed = improved[border]
+                if changed.any():
+                    neighbour_key = float(after[border][changed].min())
+                    if neighbour_key < queued.get(neighbour, inf):
+                        queued[neighbour] = neighbour_key
+                        heappush(queue, (neighbour_key, neighbour))
+            progress.advance()  # blok przeliczony
+    return distances
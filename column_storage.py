@@ -0,0 +1,196 @@
+#  Basen zbudowany z mapy wysokości jest "dwuipółwymiarowy": w każdej kolumnie (x, y) sześciany poniżej dna h[y, x]
+#  są ziemne, a powyżej - wodne. Jedynymi wyjątkami są pojedyncze sześciany źródeł dźwięku. ColumnGrid przechowuje
+#  więc tylko wysokości dna kolumn i słownik wyjątków, zamiast tablicy height × width × length.
+
+import numpy as np
+
+# rodzaje materiału - te same wartości co w classes.py (WATER, TERRAIN, SOURCE)
+_WATER = 0
+_TERRAIN = 1
+
+
+def column_floors(material):
+    """ Wyznacza wysokości dna kolumn z tablicy rodzajów materiału: liczbę ziemnych sześcianów leżących w kolumnie
+    jeden na drugim, licząc od z = 0.
+
+    Args:
+        material (numpy.ndarray): tablica uint8 [z, y, x] rodzajów materiału.
+
+    Returns:
+        numpy.ndarray: tablica int64 [y, x] wysokości dna.
+
+    """
+
+    terrain = np.asarray(material) == _TERRAIN
+    floors = np.argmin(terrain, axis=0)
+    floors[terrain.all(axis=0)] = terrain.shape[0]  # kolumna w całości ziemna
+    return floors.astype(np.int64)
+
+
+class ColumnGrid:
+    """ Trójwymiarowa tablica uint8 [z, y, x] rodzajów materiału, opisana wysokościami dna kolumn (sześcian jest ziemny,
+    jeżeli z < floors[y, x], a wodny w przeciwnym przypadku) i słownikiem wyjątków {(z, y, x): rodzaj materiału}.
+
+    Pamięć siatki rośnie z liczbą kolumn (width × length), a nie z objętością basenu, więc wysokość basenu prawie
+    nic nie kosztuje. Odczyt pojedynczego sześcianu i najniższego wodnego sześcianu kolumny (min_water_z()) trwa O(1)
+    (wyjątków jest tyle, ile źródeł dźwięku).
+
+    Indeksowanie jest zgodne z ChunkedGrid: siatka[z, y, x] zwraca jeden element, siatka[z0:z1, y, :] - tablicę NumPy,
+    a numpy.asarray(siatka) buduje całą tablicę.
+
+    Attributes:
+        shape (tuple): wymiary siatki (z, y, x).
+        dtype (numpy.dtype): typ elementów (uint8).
+        floors (numpy.ndarray): tablica int64 [y, x] wysokości dna kolumn; zmiana tablicy (np. Pool().edit_terrain())
+            od razu zmienia teren siatki.
+        overrides (dict): wyjątki od modelu kolumn - rodzaje materiału według współrzędnych (z, y, x).
+
+    """
+
+    def __init__(self, floors, height, overrides=None):
+        """ Inicjalizacja siatki.
+
+        Args:
+            floors (numpy.ndarray): tablica [y, x] wysokości dna kolumn (używana bez kopiowania, jeżeli ma typ int64).
+            height (int): wysokość siatki (wymiar względem osi Z).
+            overrides (dict|None): początkowe wyjątki od modelu kolumn.
+
+        """
+
+        self.floors = np.asarray(floors, dtype=np.int64)
+        self.shape = (int(height),) + self.floors.shape
+        self.dtype = np.dtype(np.uint8)
+        self.overrides = {}
+        for (z, y, x), value in (overrides or {}).items():
+            self[z, y, x] = value
+
+    @classmethod
+    def from_material(cls, material):
+        """ Tworzy siatkę z pełnej tablicy rodzajów materiału; sześciany niezgodne z modelem kolumn stają się wyjątkami.
+
+        Args:
+            material (numpy.ndarray): tablica uint8 [z, y, x] rodzajów materiału.
+
+        Returns:
+            ColumnGrid: siatka o tej samej zawartości.
+
+        """
+
+        material = np.asarray(material)
+        floors = column_floors(material)
+        grid = cls(floors, material.shape[0])
+        expected = np.where(np.arange(material.shape[0])[:, None, None] < floors[None, :, :], _TERRAIN, _WATER)
+        for z, y, x in np.argwhere(material != expected).tolist():
+            grid.overrides[(z, y, x)] = int(material[z, y, x])
+        return grid
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1] * self.shape[2]
+
+    @property
+    def nbytes(self):
+        """ Przybliżona liczba bajtów siatki: tablica wysokości dna i wyjątki (klucz i wartość po ok. 100 bajtów). """
+
+        return self.floors.nbytes + 100 * len(self.overrides)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def is_water(self, x_position, y_position, z_position):
+        """ Sprawdza w czasie O(1), czy sześcian o podanych współrzędnych jest wodny. """
+
+        value = self.overrides.get((z_position, y_position, x_position))
+        if value is not None:
+            return value == _WATER
+        return bool(z_position >= self.floors[y_position, x_position])
+
+    def min_water_z(self, x_position, y_position, start=0):
+        """ Zwraca najniższy wodny sześcian kolumny (x, y), nie niższy niż start.
+
+        Args:
+            x_position (int): współrzędna kolumny względem osi X.
+            y_position (int): współrzędna kolumny względem osi Y.
+            start (int): najniższa brana pod uwagę współrzędna Z.
+
+        Returns:
+            int|None: współrzędna Z sześcianu albo None, jeżeli w kolumnie nie ma wodnego sześcianu.
+
+        """
+
+        z_position = max(start, int(self.floors[y_position, x_position]))
+        # powyżej dna sześcian może nie być wodny tylko jako wyjątek (źródło dźwięku), więc pętla wykonuje się
+        # co najwyżej tyle razy, ile jest wyjątków w kolumnie
+        while z_position < self.shape[0] and not self.is_water(x_position, y_position, z_position):
+            z_position += 1
+        return z_position if z_position < self.shape[0] else None
+
+    def _expected(self, z_position, y_position, x_position):
+        """ Rodzaj materiału sześcianu wynikający z samego modelu kolumn (bez wyjątków). """
+
+        return _TERRAIN if z_position < self.floors[y_position, x_position] else _WATER
+
+    def _normalise_column(self, y_position, x_position):
+        """ Wyznacza od nowa dno kolumny (x, y) i jej wyjątki, tak żeby poniżej dna były tylko ziemne sześciany. """
+
+        column = self[:, y_position, x_position]
+        for z_position in range(self.shape[0]):
+            self.overrides.pop((z_position, y_position, x_position), None)
+        floor = int(column_floors(column[:, None, None])[0, 0])
+        self.floors[y_position, x_position] = floor
+        for z_position in np.flatnonzero(column[floor:] != _WATER).tolist():
+            self.overrides[(z_position + floor, y_position, x_position)] = int(column[z_position + floor])
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 3 and all(isinstance(item, (int, np.integer)) for item in key):
+            z, y, x = key
+            if 0 <= z < self.shape[0] and 0 <= y < self.shape[1] and 0 <= x < self.shape[2]:
+                value = self.overrides.get((int(z), int(y), int(x)))
+                return self.dtype.type(self._expected(z, y, x) if value is None else value)
+
+        # obszar: indeksy wyznaczam na tablicy współrzędnych, a model kolumn i wyjątki nakładam tylko na wynik
+        z_index = np.arange(self.shape[0])
+        y_index, x_index = np.indices(self.shape[1:])
+        z_region = np.broadcast_to(z_index[:, None, None], self.shape)[key]
+        y_region = np.broadcast_to(y_index[None], self.shape)[key]
+        x_region = np.broadcast_to(x_index[None], self.shape)[key]
+        result = np.where(z_region < self.floors[y_region, x_region], _TERRAIN, _WATER).astype(self.dtype)
+        for (z, y, x), value in self.overrides.items():  # wyjątków jest tyle, ile źródeł dźwięku
+            result[(z_region == z) & (y_region == y) & (x_region == x)] = value
+        return result
+
+    def __setitem__(self, key, value):
+        if isinstance(key, tuple) and len(key) == 3 and all(isinstance(item, (int, np.integer)) for item in key):
+            z, y, x = (int(item) for item in key)
+            if not (0 <= z < self.shape[0] and 0 <= y < self.shape[1] and 0 <= x < self.shape[2]):
+                raise IndexError('ColumnGrid index out of range')
+            value = int(value)
+            if value == self._expected(z, y, x):
+                self.overrides.pop((z, y, x), None)
+            else:
+                self.overrides[(z, y, x)] = value
+                if z <= self.floors[y, x]:
+                    self._normalise_column(y, x)  # zmiana przy dnie mogła przesunąć dno kolumny
+            return
+
+        # obszar: każdy zmieniany sześcian niezgodny z modelem kolumn staje się wyjątkiem
+        z_index = np.arange(self.shape[0])
+        y_index, x_index = np.indices(self.shape[1:])
+        z_region = np.broadcast_to(z_index[:, None, None], self.shape)[key]
+        y_region = np.broadcast_to(y_index[None], self.shape)[key]
+        x_region = np.broadcast_to(x_index[None], self.shape)[key]
+        values = np.broadcast_to(np.asarray(value, dtype=self.dtype), z_region.shape)
+        for z, y, x, item in zip(z_region.ravel().tolist(), y_region.ravel().tolist(), x_region.ravel().tolist(),
+                                 values.ravel().tolist()):
+            self[z, y, x] = item
+
+    def __array__(self, dtype=None, copy=None):
+        array = np.where(np.arange(self.shape[0])[:, None, None] < self.floors[None, :, :], _TERRAIN, _WATER)
+        array = array.astype(self.dtype)
+        for (z, y, x), value in self.overrides.items():
+            array[z, y, x] = value
+        return array if dtype is None else array.astype(dtype)
@@ -0,0 +1,229 @@
+#  Trwała pamięć podręczna pól natężeń dźwięku. Zarządzanie z wiersza poleceń:
+#       python field_cache.py list                  lista zapisanych pól (od najdawniej używanego)
+#       python field_cache.py info                  liczba pól, łączny rozmiar i limit
+#       python field_cache.py prune [--max-size N]  usuwa najdawniej używane pola ponad limit (np. 500M, 2G)
+#       python field_cache.py clear                 usuwa wszystkie pola
+#  Katalog pamięci podręcznej można zmienić opcją --directory albo zmienną środowiskową WATER_SIM_CACHE.
+
+import os
+import json
+import hashlib
+import argparse
+from time import time
+from functools import lru_cache
+import numpy as np
+
+DEFAULT_DIRECTORY = os.environ.get('WATER_SIM_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'water_environment_simulation'))
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+@lru_cache(maxsize=64)
+def _file_digest(path, mtime_ns):
+    """ Zwraca skrót SHA-256 zawartości pliku; wynik jest zapamiętywany dla pary (ścieżka, czas modyfikacji). """
+
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def parse_size(size):
+    """ Zamienia rozmiar podany jako liczba bajtów albo z przyrostkiem K|M|G (np. '500M') na liczbę bajtów. """
+
+    size = str(size).strip().upper()
+    multipliers = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if size and size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+
+class FieldCache:
+    """ Trwała pamięć podręczna pól natężeń dźwięku, adresowana zawartością.
+
+    Każde pole zapisuje się jako osobny plik .npy, nazwany kluczem - skrótem SHA-256 zawartości mapy wysokości
+    i wszystkich parametrów, od których zależy wynik (patrz key()). Pliki wczytują się przez mapowanie do pamięci.
+    Łączny rozmiar pamięci podręcznej jest ograniczony: po każdym zapisie usuwane są najdawniej używane pola (LRU),
+    przy czym czas użycia pola to czas modyfikacji jego pliku, odświeżany przy każdym wczytaniu.
+
+    Attributes:
+        directory (str): katalog pamięci podręcznej.
+        max_bytes (int): maksymalny łączny rozmiar zapisanych pól w bajtach.
+        hits (int): liczba trafień (pól wczytanych z pamięci podręcznej) od utworzenia egzemplarza.
+        misses (int): liczba chybień od utworzenia egzemplarza.
+
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        """ Inicjalizacja pamięci podręcznej.
+
+        Args:
+            directory (str): katalog pamięci podręcznej; zostanie utworzony, jeżeli nie istnieje.
+            max_bytes (int|str): maksymalny łączny rozmiar zapisanych pól (w bajtach albo z przyrostkiem K|M|G).
+
+        """
+
+        self.directory = directory
+        self.max_bytes = parse_size(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, heightmap, height, ss_xyz, sound_intensity, enhanced_realism, engine, engine_version, dtype, lod=None,
+            line_of_sight=False):
+        """ Wyznacza klucz pola natężeń dźwięku.
+
+        Args:
+            heightmap (str): ścieżka mapy wysokości (do klucza trafia skrót jej zawartości, a nie ścieżka).
+            height (int): wysokość basenu.
+            ss_xyz (tuple|list): współrzędne źródła dźwięku.
+            sound_intensity (float|int): natężenie dźwięku produkowanego przez źródło dźwięku.
+            enhanced_realism (bool|None): tryb realizmu silnika (None, jeżeli silnik z niego nie korzysta).
+            engine (str): nazwa silnika.
+            engine_version (int): wersja silnika (classes.ENGINE_VERSIONS).
+            dtype (numpy.dtype|type): typ liczbowy przechowywanego pola.
+            lod (tuple|None): parametry pola wyznaczonego na zgrubnej siatce (downsample, refine_radius,
+                refine_tolerance); None dla pełnej rozdzielczości.
+            line_of_sight (bool): czy sześciany widoczne ze źródła dźwięku otrzymały odległość w linii prostej
+                (Pool().add_sound_source(line_of_sight=True)).
+
+        Returns:
+            str: klucz - szesnastkowy skrót SHA-256.
+
+        """
+
+        path = os.path.abspath(heightmap)
+        parameters = {'heightmap': _file_digest(path, os.stat(path).st_mtime_ns),
+                      'height': int(height),
+                      'sound_source': [int(coordinate) for coordinate in ss_xyz],
+                      'sound_intensity': sound_intensity,
+                      'enhanced_realism': enhanced_realism,
+                      'engine': engine,
+                      'engine_version': engine_version,
+                      'dtype': np.dtype(dtype).str}
+        if lod is not None:
+            parameters['lod'] = list(lod)  # klucze pól pełnej rozdzielczości pozostają bez zmian
+        if line_of_sight:
+            parameters['line_of_sight'] = True
+        return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        """ Zwraca ścieżkę pliku pola o podanym kluczu. """
+
+        return os.path.join(self.directory, key + '.npy')
+
+    def load(self, key):
+        """ Wczytuje pole o podanym kluczu.
+
+        Args:
+            key (str): klucz pola.
+
+        Returns:
+            numpy.ndarray|None: pole zmapowane do pamięci tylko do odczytu albo None, jeżeli go nie ma.
+
+        """
+
+        path = self.path(key)
+        try:
+            field = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # odświeżam czas użycia pola (LRU)
+        self.hits += 1
+        return field
+
+    def store(self, key, field):
+        """ Zapisuje pole pod podanym kluczem, po czym usuwa najdawniej używane pola ponad limit rozmiaru.
+
+        Args:
+            key (str): klucz pola.
+            field (numpy.ndarray): pole natężeń dźwięku [z, y, x].
+
+        """
+
+        path = self.path(key)
+        temporary_path = path + '.' + str(os.getpid()) + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.save(file, np.asarray(field))
+        os.replace(temporary_path, path)  # zapis atomowy - inne procesy nigdy nie zobaczą niepełnego pliku
+        self.prune(keep=key)
+
+    def entries(self):
+        """ Zwraca listę zapisanych pól, od najdawniej do najświeżej używanego.
+
+        Returns:
+            list: lista słowników z kluczem ('key'), rozmiarem w bajtach ('bytes') i czasem ostatniego użycia ('used').
+
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append({'key': name[:-4], 'bytes': stat.st_size, 'used': stat.st_mtime})
+        entries.sort(key=lambda entry: entry['used'])
+        return entries
+
+    def size(self):
+        """ Zwraca łączny rozmiar zapisanych pól w bajtach. """
+
+        return sum(entry['bytes'] for entry in self.entries())
+
+    def prune(self, max_bytes=None, keep=None):
+        """ Usuwa najdawniej używane pola, dopóki łączny rozmiar przekracza limit.
+
+        Args:
+            max_bytes (int|str|None): limit rozmiaru; jeżeli None - atrybut max_bytes.
+            keep (str|None): klucz pola, którego nie wolno usunąć (np. dopiero zapisanego).
+
+        Returns:
+            list: klucze usuniętych pól.
+
+        """
+
+        max_bytes = self.max_bytes if max_bytes is None else parse_size(max_bytes)
+        entries = self.entries()
+        total = sum(entry['bytes'] for entry in entries)
+        removed = []
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            try:
+                os.remove(self.path(entry['key']))
+            except FileNotFoundError:
+                pass  # pole usunął w międzyczasie inny proces
+            total -= entry['bytes']
+            removed.append(entry['key'])
+        return removed
+
+    def clear(self):
+        """ Usuwa wszystkie zapisane pola. """
+
+        return self.prune(max_bytes=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Zarządzanie pamięcią podręczną pól natężeń dźwięku.')
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY, help='katalog pamięci podręcznej')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='lista zapisanych pól')
+    subparsers.add_parser('info', help='liczba pól i łączny rozmiar')
+    prune_parser = subparsers.add_parser('prune', help='usuwa najdawniej używane pola ponad limit')
+    prune_parser.add_argument('--max-size', default=DEFAULT_MAX_BYTES, help='limit rozmiaru, np. 500M albo 2G')
+    subparsers.add_parser('clear', help='usuwa wszystkie pola')
+    args = parser.parse_args()
+
+    cache = FieldCache(args.directory)
+    if args.command == 'list':
+        for entry in cache.entries():
+            print('{}  {:>12} B  {:>10.0f} s ago'.format(entry['key'], entry['bytes'], time() - entry['used']))
+    elif args.command == 'info':
+        print('directory:', cache.directory)
+        print('fields:   ', len(cache.entries()))
+        print('size:     ', cache.size(), 'B')
+        print('limit:    ', cache.max_bytes, 'B')
+    elif args.command == 'prune':
+        print('removed', len(cache.prune(args.max_size)), 'fields')
+    else:
+        print('removed', len(cache.clear()), 'fields')
@@ -0,0 +1,129 @@
+#  Siatki trójkątów wizualizujące pole natężeń dźwięku: zamiast jednego obiektu Entity na sześcian (co zatrzymałoby
+#  ursina już przy kilku tysiącach sześcianów) warstwy basenu zamieniają się w płaszczyzny przekroju, złączone w jedną
+#  siatkę z kolorami w wierzchołkach. Moduł nie importuje ursina - tablice wierzchołków, trójkątów i kolorów można
+#  zbudować (i sprawdzić) bez okna; obiekt ursina buduje z nich FieldMesh (functions_for_visualisation.py).
+
+import numpy as np
+
+# skala kolorów: od najsłabszego (ciemnoniebieski) do najsilniejszego (czerwony) natężenia dźwięku, RGB w [0; 1]
+COLOUR_SCALE = np.array([[0.05, 0.05, 0.45],
+                         [0.0, 0.6, 0.9],
+                         [0.2, 0.85, 0.3],
+                         [1.0, 0.9, 0.1],
+                         [0.9, 0.1, 0.05]])
+
+
+def intensity_colours(values, alpha=0.6, low=None, high=None):
+    """ Funkcja zamienia natężenia dźwięku na kolory RGBA według skali COLOUR_SCALE.
+
+    Natężenie maleje z kwadratem odległości od źródła, dlatego skala jest logarytmiczna.
+
+    Args:
+        values (numpy.ndarray): natężenia dźwięku (NaN dla niezdefiniowanych).
+        alpha (float): przezroczystość kolorów zdefiniowanych natężeń (niezdefiniowane są całkowicie przezroczyste).
+        low (float|None): natężenie odpowiadające początkowi skali; jeżeli None - najmniejsze dodatnie natężenie.
+        high (float|None): natężenie odpowiadające końcowi skali; jeżeli None - największe natężenie.
+
+    Returns:
+        numpy.ndarray: tablica float32 o wymiarach values.shape + (4,).
+
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    positive = values[np.isfinite(values) & (values > 0)]
+    if low is None:
+        low = positive.min() if positive.size else 1.0
+    if high is None:
+        high = positive.max() if positive.size else 1.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = (np.log(np.maximum(values, low)) - np.log(low)) / max(np.log(high) - np.log(low), 1e-12)
+    position = np.clip(np.nan_to_num(position), 0, 1) * (len(COLOUR_SCALE) - 1)
+
+    colours = np.empty(values.shape + (4,), dtype=np.float32)
+    stops = np.arange(len(COLOUR_SCALE))
+    for channel in range(3):
+        colours[..., channel] = np.interp(position, stops, COLOUR_SCALE[:, channel])
+    colours[..., 3] = np.where(np.isnan(values), 0, alpha)
+    return colours
+
+
+def layer_mesh(field, z_position, z_scale=1, step=1, alpha=0.6, low=None, high=None):
+    """ Funkcja buduje siatkę jednej warstwy basenu: wierzchołki leżą w środkach sześcianów (co step-ty sześcian
+    wzdłuż osi X i Y), a czworokąt (dwa trójkąty) powstaje między czterema sąsiednimi wierzchołkami, jeżeli wszystkie
+    mają zdefiniowane natężenie dźwięku - teren i źródło dźwięku pozostają więc puste.
+
+    Note:
+        Współrzędne wierzchołków są w układzie sceny visualisation.py: (x - length / 2, (z + 0.5) * z_scale,
+        width - 1 - y - width / 2).
+
+    Args:
+        field (numpy.ndarray): pole natężeń dźwięku [z, y, x], np. Pool().sound_field().
+        z_position (int): współrzędna warstwy względem osi Z.
+        z_scale (float|int): współczynnik skalowania pionowej osi.
+        step (int): co który sześcian wzdłuż osi X i Y staje się wierzchołkiem (decymacja siatki).
+        alpha (float): przezroczystość kolorów.
+        low (float|None): natężenie odpowiadające początkowi skali kolorów (patrz intensity_colours()).
+        high (float|None): natężenie odpowiadające końcowi skali kolorów.
+
+    Returns:
+        tuple: (vertices, triangles, colours) - tablice float32 (N, 3), int32 (M, 3) i float32 (N, 4).
+
+    """
+
+    height, width, length = field.shape
+    values = np.asarray(field[z_position, ::step, ::step], dtype=np.float64)
+    rows, columns = values.shape
+    y, x = np.meshgrid(np.arange(rows) * step, np.arange(columns) * step, indexing='ij')
+    vertices = np.stack([x - length / 2,
+                         np.full(x.shape, (z_position + 0.5) * z_scale),
+                         width - 1 - y - width / 2], axis=-1).reshape(-1, 3).astype(np.float32)
+    colours = intensity_colours(values, alpha, low, high).reshape(-1, 4)
+
+    # czworokąty między sąsiednimi wierzchołkami, tylko tam, gdzie wszystkie cztery natężenia są zdefiniowane
+    index = np.arange(rows * columns).reshape(rows, columns)
+    defined = ~np.isnan(values)
+    quads = defined[:-1, :-1] & defined[:-1, 1:] & defined[1:, :-1] & defined[1:, 1:]
+    corner = index[:-1, :-1][quads]
+    triangles = np.concatenate([np.stack([corner, corner + columns, corner + 1], axis=1),
+                                np.stack([corner + 1, corner + columns, corner + columns + 1], axis=1)])
+    return vertices, triangles.astype(np.int32), colours
+
+
+def field_mesh_arrays(field, z_scale=1, layers=None, max_vertices=200000, alpha=0.6):
+    """ Funkcja łączy siatki wybranych warstw basenu (layer_mesh()) w jedną siatkę - jeden obiekt do narysowania
+    niezależnie od liczby sześcianów.
+
+    Args:
+        field (numpy.ndarray): pole natężeń dźwięku [z, y, x].
+        z_scale (float|int): współczynnik skalowania pionowej osi.
+        layers (list|range|None): współrzędne Z rysowanych warstw; jeżeli None - co czwarta warstwa.
+        max_vertices (int): górny limit liczby wierzchołków; siatki warstw są decymowane (parametr step), żeby
+            go nie przekroczyć.
+        alpha (float): przezroczystość kolorów.
+
+    Returns:
+        tuple: (vertices, triangles, colours) - jak w layer_mesh(); wspólna skala kolorów dla wszystkich warstw.
+
+    """
+
+    height, width, length = field.shape
+    layers = list(range(0, height, 4) if layers is None else layers)
+    step = 1
+    while len(layers) * -(-width // step) * -(-length // step) > max_vertices:
+        step += 1
+
+    finite = np.asarray(field, dtype=np.float64)
+    positive = finite[np.isfinite(finite) & (finite > 0)]
+    low, high = (positive.min(), positive.max()) if positive.size else (None, None)
+
+    vertices, triangles, colours = [], [], []
+    offset = 0
+    for z_position in layers:
+        layer_vertices, layer_triangles, layer_colours = layer_mesh(field, z_position, z_scale, step, alpha, low, high)
+        vertices.append(layer_vertices)
+        triangles.append(layer_triangles + offset)
+        colours.append(layer_colours)
+        offset += len(layer_vertices)
+    if not layers:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.int32), np.zeros((0, 4), np.float32)
+    return np.concatenate(vertices), np.concatenate(triangles), np.concatenate(colours)
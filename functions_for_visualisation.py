@@ -3,14 +3,25 @@ Created by Ivan Danylenko
 Date 18.11.21
 """
 
-from PIL import Image
-from time import time
+from time import time, perf_counter, sleep
 from functools import wraps
-from ursina import Entity, camera, held_keys
+from threading import Thread, Lock
+from queue import Queue
+from collections import deque
+from itertools import islice
+from ursina import Entity, Mesh, camera, held_keys
+from panda3d.core import TransparencyAttrib
+from heightmap_loader import get_max_height  # przeniesiona do heightmap_loader (import bez ursina)
+from field_mesh import field_mesh_arrays
+from classes import Submarine
+from trajectory_storage import TrajectoryReader
 
 # po raz pierwszy definiuję czas ostatniego wywołania funkcji z ograniczoną częstotliwością wywołań
 lastNewSubmarinePosUse = [time()]
 lastAddNewSubmarineUse = [time()]
+lastToggleFieldMeshUse = [time()]
+
+POSITION_INTERVAL = 0.15  # czas pokazywania jednego położenia łodzi podwodnej w sekundach
 
 
 def execution_frequency(cooldown, last_use):
@@ -35,67 +46,183 @@ def execution_frequency(cooldown, last_use):
     return _execution_frequency
 
 
-def get_max_height(heightmap):
-    """ Funkcja zwraca wartość wysokości najwyższego punktu, która wynika z mapy wysokości.
-
-    Args:
-        heightmap (str): ścieżka mapy wysokości (miejsce znajdowania się pliku).
+class RoutePlayback:
+    """ Odtwarzanie drogi łodzi podwodnej oddzielone od jej wyznaczania: droga wyznacza się w wątku pobocznym
+    i trafia partiami do kolejki positions (collections.deque), a pętla renderowania tylko pobiera z niej kolejne
+    położenia (take()), nie czekając na wyznaczenie całej drogi. Tak samo odtwarza się drogi zapisane w pliku dróg
+    (replay(), trajectory_storage.py) - wczytywane partiami, bez wczytywania całego pliku.
 
-    Returns:
-        (int): wysokość najwyższego punktu, wynikająca z mapy wysokości
-            (wartość kanału R najjaśniejszego piksela na obrazie).
+    Attributes:
+        pool (Pool): basen, w którym pływa łódź podwodna.
+        batch (int): liczba ruchów łodzi wyznaczanych naraz przed przekazaniem ich do kolejki.
+        positions (collections.deque): kolejka wyznaczonych, jeszcze nie pokazanych położeń (x, y, z).
+        computing (bool): True, dopóki wątek poboczny wyznacza bieżącą drogę.
+        error (Exception|None): błąd, przez który nie udało się wyznaczyć (odtworzyć) bieżącej drogi; pętla
+            renderowania odbiera go przez pop_error().
 
     """
 
-    pixel_alpha = []
-    for pixel in list(Image.open(heightmap, 'r').getdata()):
-        pixel_alpha.append(round(pixel[0]))
-    return max(pixel_alpha)
+    def __init__(self, pool, batch=32):
+        """ Inicjalizacja i uruchomienie wątku pobocznego.
+
+        Args:
+            pool (Pool): basen z wyznaczonym polem natężeń dźwięku.
+            batch (int): liczba ruchów łodzi wyznaczanych naraz.
+
+        """
+
+        self.pool = pool
+        self.batch = batch
+        self.positions = deque()
+        self.computing = False
+        self.error = None
+        self._generation = 0  # numer bieżącej drogi; wątek porzuca drogę, jeżeli w międzyczasie zażądano nowej
+        self._lock = Lock()
+        self._requests = Queue()
+        Thread(target=self._work, daemon=True).start()
+
+    def request(self, x_position=None, y_position=None, z_position=None):
+        """ Zleca wyznaczenie drogi nowej łodzi podwodnej (współrzędne jak w Submarine(); brakujące - losowe).
+        Niepokazane położenia poprzedniej drogi są porzucane. """
+
+        with self._lock:
+            self._generation += 1
+            self.positions.clear()
+            self.computing = True
+            self.error = None
+            self._requests.put((self._generation, 'route', (x_position, y_position, z_position)))
+
+    def replay(self, path, index):
+        """ Zleca odtworzenie drogi zapisanej w pliku dróg (TrajectoryWriter). Niepokazane położenia poprzedniej
+        drogi są porzucane.
+
+        Args:
+            path (str): ścieżka pliku dróg.
+            index (int): numer drogi w pliku.
+
+        """
+
+        with self._lock:
+            self._generation += 1
+            self.positions.clear()
+            self.computing = True
+            self.error = None
+            self._requests.put((self._generation, 'replay', (path, index)))
+
+    def _work(self):
+        """ Pętla wątku pobocznego: wyznacza (albo odczytuje z pliku) zlecone drogi partiami po batch ruchów. """
+
+        while True:
+            generation, kind, arguments = self._requests.get()
+            if generation != self._generation:
+                continue  # zlecenie zastąpiło już nowsze
+            try:
+                if kind == 'replay':
+                    path, index = arguments
+                    with TrajectoryReader(path) as reader:
+                        self._stream(generation, reader.positions(index, self.batch))
+                else:
+                    submarine = Submarine(self.pool, *arguments)
+                    with self._lock:
+                        if generation != self._generation:
+                            continue
+                        self.pool.submarine = submarine
+                    self._stream(generation, submarine.steps(True))
+            except Exception as error:
+                # błąd jednego zlecenia nie może zatrzymać wątku - kolejne zlecenia muszą się dalej wykonywać
+                with self._lock:
+                    if generation == self._generation:
+                        self.computing = False
+                        self.error = error
+
+    def _stream(self, generation, steps):
+        """ Przekazuje do kolejki kolejne położenia drogi, partiami po batch ruchów, dopóki droga się nie skończy
+        albo nie zostanie zażądana nowa. """
+
+        while generation == self._generation:
+            moved = list(islice(steps, self.batch))
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self.positions.extend(moved)
+                if len(moved) < self.batch:  # droga się skończyła - łódź "dopłynęła"
+                    self.computing = False
+                    return
+            sleep(0)  # oddaję wątkowi renderowania GIL między partiami
+
+    def take(self, budget=0.002, count=1):
+        """ Pobiera z kolejki co najwyżej count położeń, nie przekraczając budżetu czasu klatki.
+
+        Args:
+            budget (float): maksymalny czas pobierania w sekundach.
+            count (int): maksymalna liczba pobieranych położeń.
+
+        Returns:
+            tuple|None: ostatnie pobrane położenie (x, y, z) albo None, jeżeli kolejka jest pusta.
+
+        """
+
+        deadline = perf_counter() + budget
+        position = None
+        while count and self.positions and perf_counter() < deadline:
+            position = self.positions.popleft()
+            count -= 1
+        return position
 
+    def pop_error(self):
+        """ Zwraca błąd bieżącej drogi (None, jeżeli go nie było) i go zapomina, żeby zgłosić go tylko raz. """
 
-@execution_frequency(cooldown=0.15, last_use=lastNewSubmarinePosUse)
-def new_submarine_pos(submarine: Entity, positions, pool, z_scale):
-    """ Nadaje obiektowi który występuje na ekranie w roli łodzi podwodnej wartość pierwszej pozycji z listy i następnie
-    usuwa tę warość z tablicy.
+        with self._lock:
+            error, self.error = self.error, None
+        return error
+
+
+def new_submarine_pos(submarine: Entity, playback: RoutePlayback, pool, z_scale, budget=0.002):
+    """ Nadaje obiektowi który występuje na ekranie w roli łodzi podwodnej wartość kolejnej pozycji z kolejki
+    wyznaczonych położeń.
+
+    Note:
+        Funkcja wywołuje się w każdej klatce. Dopóki wciśnięty jest klawisz Q, łódź przechodzi do kolejnego
+        położenia co POSITION_INTERVAL sekund; jeżeli klatka trwała dłużej, zaległe położenia pobierają się naraz,
+        ale nie dłużej niż przez budget sekund.
 
     Args:
         submarine (Entity): obiektowi który występuje na ekranie w roli łodzi podwodnej.
-        positions (list): zbiór punktów które odwiedziła łódź podwodna.
+        playback (RoutePlayback): odtwarzanie drogi łodzi podwodnej.
         pool (Pool): basen do którego jest przypisana łódż podwodna.
         z_scale (float|int): współczynnik skalowania pionowej osi.
+        budget (float): maksymalny czas pobierania położeń w jednej klatce w sekundach.
 
     """
 
-    if positions:
-        if held_keys['q'] != 0:
-            submarine.position = (positions[0][0] - pool.length / 2,
-                                  (positions[0][2] + 0.5) * z_scale,
-                                  pool.width - 1 - positions[0][1] - pool.width / 2)
-            positions.pop(0)
+    error = playback.pop_error()
+    if error is not None:
+        print('Submarine route failed: {}: {}'.format(type(error).__name__, error))
+    now = time()
+    if held_keys['q'] == 0:
+        lastNewSubmarinePosUse[0] = now - POSITION_INTERVAL  # po wciśnięciu Q łódź od razu przechodzi dalej
+        return
+    due = int((now - lastNewSubmarinePosUse[0]) / POSITION_INTERVAL)  # liczba zaległych położeń
+    if due:
+        lastNewSubmarinePosUse[0] += due * POSITION_INTERVAL
+        position = playback.take(budget, due)
+        if position is not None:
+            submarine.position = (position[0] - pool.length / 2,
+                                  (position[2] + 0.5) * z_scale,
+                                  pool.width - 1 - position[1] - pool.width / 2)
 
 
 @execution_frequency(cooldown=0.5, last_use=lastAddNewSubmarineUse)
-def add_new_submarine(pool, positions):
-    """ Funkcja zamienia starą łódź podwodną w basenie nową, wywołuje metodę Pool().submarine.move() i
-    zmienia listę odwiedzonych punktów przez poprzedną łódż na wynik wykonania tej metody, jednocześnie zwrazając
-    jej wartość.
+def add_new_submarine(playback: RoutePlayback):
+    """ Funkcja zleca wyznaczenie drogi nowej łodzi podwodnej na losowych współrzędnych; droga wyznacza się w wątku
+    pobocznym (RoutePlayback), więc pętla renderowania nie czeka na nią.
 
     Args:
-        pool (Pool): basen w którym wystąpi zamiana łodzi podwodnej.
-        positions (list): lista pozycji, które odwiedziła stara łódź podwodna.
-
-    Returns:
-        (list): lista punktów, które odwiedziła nowa łódź podwodna.
+        playback (RoutePlayback): odtwarzanie drogi łodzi podwodnej.
 
     """
     if held_keys['n'] != 0:
-        pool.add_submarine()
-        new_positions = pool.submarine.move(True)
-        while positions:
-            positions.pop()
-        for pos in new_positions:
-            positions.append(pos)
-        return positions
+        playback.request()
 
 
 def change_camera_pos():
@@ -109,3 +236,66 @@ def change_camera_pos():
         camera.position = camera.position[0] - 1, camera.position[1], camera.position[2]
     if held_keys['d'] != 0:
         camera.position = camera.position[0] + 1, camera.position[1], camera.position[2]
+
+
+class FieldMesh:
+    """ Wizualizacja pola natężeń dźwięku: wybrane warstwy basenu jako płaszczyzny przekroju z kolorami w wierzchołkach,
+    złączone w jeden obiekt Entity (patrz field_mesh.py). Siatka buduje się od nowa tylko wtedy, gdy zmieniło się pole
+    natężeń (Pool().field_version), i tylko gdy jest widoczna.
+
+    Attributes:
+        pool (Pool): basen, którego pole jest wizualizowane.
+        entity (Entity): obiekt sceny z siatką pola.
+        version (int|None): wersja pola, z której zbudowano siatkę.
+
+    """
+
+    def __init__(self, pool, z_scale, layers=None, max_vertices=200000, alpha=0.6, visible=True):
+        """ Inicjalizacja wizualizacji pola.
+
+        Args:
+            pool (Pool): basen z wyznaczonym polem natężeń dźwięku.
+            z_scale (float|int): współczynnik skalowania pionowej osi.
+            layers (list|range|None): współrzędne Z rysowanych warstw; jeżeli None - co czwarta warstwa.
+            max_vertices (int): górny limit liczby wierzchołków siatki (większe baseny są decymowane).
+            alpha (float): przezroczystość płaszczyzn.
+            visible (bool): czy pole jest widoczne od razu (ukryte buduje się dopiero przy pierwszym pokazaniu).
+
+        """
+
+        self.pool = pool
+        self.z_scale = z_scale
+        self.layers = layers
+        self.max_vertices = max_vertices
+        self.alpha = alpha
+        self.version = None
+        self.entity = Entity(double_sided=True, enabled=visible)
+        self.entity.setTransparency(TransparencyAttrib.MAlpha)  # przezroczystość wynika z kolorów wierzchołków
+        self.update()
+
+    def update(self):
+        """ Buduje siatkę od nowa, jeżeli pole natężeń zmieniło się od ostatniej budowy (wywoływane w update()). """
+
+        if not self.entity.enabled or self.version == self.pool.field_version:
+            return
+        if self.pool.lazy_field is not None:
+            self.pool.lazy_field.fill()
+        vertices, triangles, colours = field_mesh_arrays(self.pool.sound_field(), self.z_scale, self.layers,
+                                                         self.max_vertices, self.alpha)
+        self.entity.model = Mesh(vertices=vertices.tolist(), triangles=triangles.tolist(), colors=colours.tolist(),
+                                 mode='triangle', static=True)
+        self.version = self.pool.field_version
+
+    def toggle(self):
+        """ Pokazuje albo ukrywa pole (ukryte pole nie jest przebudowywane). """
+
+        self.entity.enabled = not self.entity.enabled
+        self.update()
+
+
+@execution_frequency(cooldown=0.3, last_use=lastToggleFieldMeshUse)
+def toggle_field_mesh(field_mesh: FieldMesh):
+    """ Po naciśnięciu klawiszy F pokazuje albo ukrywa wizualizację pola natężeń dźwięku. """
+
+    if held_keys['f'] != 0:
+        field_mesh.toggle()
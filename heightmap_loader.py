@@ -0,0 +1,75 @@
+import os
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def _decode_heightmap(path, mtime_ns):
+    """ Dekoduje mapę wysokości do tablicy; wynik jest zapamiętywany dla pary (ścieżka, czas modyfikacji).
+
+    Args:
+        path (str): bezwzględna ścieżka mapy wysokości.
+        mtime_ns (int): czas ostatniej modyfikacji pliku - część klucza pamięci podręcznej, dzięki czemu zmieniony
+            plik zostanie zdekodowany ponownie.
+
+    Returns:
+        numpy.ndarray: tablica tylko do odczytu.
+
+    """
+
+    from PIL import Image  # PIL importuje się dopiero przy pierwszym dekodowaniu mapy wysokości
+
+    pixels = np.asarray(Image.open(path, 'r'))
+    if pixels.ndim == 3:
+        pixels = pixels[:, :, 0]  # wysokość wynika z kanału R
+    heights = pixels.astype(np.int32)
+    heights.flags.writeable = False  # tablica jest współdzielona przez wszystkich użytkowników pamięci podręcznej
+    return heights
+
+
+def load_heightmap(heightmap):
+    """ Wczytuje mapę wysokości jako dwuwymiarową tablicę wysokości dna h[y, x].
+
+    Obrazek dekoduje się tylko raz: kolejne wywołania dla tego samego, niezmienionego pliku zwracają tę samą tablicę.
+
+    Args:
+        heightmap (str): ścieżka mapy wysokości (miejsce znajdowania się pliku).
+
+    Returns:
+        numpy.ndarray: tablica int32 tylko do odczytu o wymiarach (szerokość, długość) - (oś Y, oś X),
+            zawierająca wartości kanału R pikseli.
+
+    """
+
+    path = os.path.abspath(heightmap)
+    return _decode_heightmap(path, os.stat(path).st_mtime_ns)
+
+
+def get_max_height(heightmap):
+    """ Funkcja zwraca wartość wysokości najwyższego punktu, która wynika z mapy wysokości.
+
+    Args:
+        heightmap (str): ścieżka mapy wysokości (miejsce znajdowania się pliku).
+
+    Returns:
+        (int): wysokość najwyższego punktu, wynikająca z mapy wysokości
+            (wartość kanału R najjaśniejszego piksela na obrazie).
+
+    """
+
+    return int(load_heightmap(heightmap).max())
+
+
+def terrain_mask(heights, height):
+    """ Buduje trójwymiarową maskę terenu: sześcian (x, y, z) jest ziemny, jeżeli z < h[y, x].
+
+    Args:
+        heights (numpy.ndarray): tablica wysokości dna h[y, x], np. wynik load_heightmap().
+        height (int): wysokość basenu.
+
+    Returns:
+        numpy.ndarray: tablica logiczna [z, y, x] o wymiarach (height, szerokość, długość).
+
+    """
+
+    return np.arange(height)[:, None, None] < heights[None, :, :]
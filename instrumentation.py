@@ -0,0 +1,209 @@
+#  Pomiary czasu faz symulacji i liczniki gorących ścieżek. Domyślnie nic nie jest mierzone ani wypisywane;
+#  pomiar włącza się kontekstem profilera:
+#
+#       from instrumentation import Profiler, ConsoleReporter
+#       with Profiler(callbacks=[ConsoleReporter()]) as profiler:
+#           pool = Pool(65, 'Heightmaps/heightmap20.jpg')
+#           pool.add_sound_source(enhanced_realism=False)
+#       profiler.summary()                  czas, liczba elementów i wywołań każdej fazy oraz liczniki
+#       profiler.export('events.jsonl')     wszystkie zdarzenia jako JSON Lines
+#
+#  Fazy (PHASES): fill - wypełnienie basenu, neighbour_linking - referencje między sąsiadami, terrain_carving -
+#  wyznaczenie terenu z mapy wysokości, obstacle_sizing - wymiary prostopadłościanu wyboru (przeszkody),
+#  field_computation - pole natężeń dźwięku, routing - ruch łodzi podwodnych.
+#  Liczniki (COUNTERS): shortest_curve_calls - wywołania shortest_curve(), candidates_scanned - kolumny kandydatów na
+#  wierzchołek łamanej sprawdzone w shortest_curve(), field_cache_hits / field_cache_misses - trafienia i chybienia
+#  trwałej pamięci podręcznej pól (FieldCache).
+
+import sys
+import json
+from time import perf_counter, time
+
+PHASES = ('fill', 'neighbour_linking', 'terrain_carving', 'obstacle_sizing', 'field_computation', 'routing')
+COUNTERS = ('shortest_curve_calls', 'candidates_scanned', 'field_cache_hits', 'field_cache_misses')
+
+_profilers = []  # aktywne profilery; pusta lista oznacza, że pomiar jest wyłączony
+
+
+class Profiler:
+    """ Profiler faz symulacji: w obrębie swojego kontekstu (with) zbiera zdarzenia faz i postępu oraz liczniki.
+
+    Zdarzenia to słowniki z kluczem 'event':
+        'phase_start' - początek fazy ('phase', 'time' - czas uniksowy, 'total' - oczekiwana liczba elementów),
+        'progress' - postęp fazy ('phase', 'done', 'total', 'elapsed_s', 'eta_s'),
+        'phase_end' - koniec fazy ('phase', 'elapsed_s', 'items'),
+        'counters' - stan liczników przy wyjściu z kontekstu ('counters').
+
+    Attributes:
+        callbacks (list): funkcje wywoływane z każdym zdarzeniem (np. ConsoleReporter()).
+        events (list): wszystkie zebrane zdarzenia.
+        counters (dict): liczniki gorących ścieżek (nazwa: wartość).
+
+    """
+
+    def __init__(self, callbacks=()):
+        """ Inicjalizacja profilera.
+
+        Args:
+            callbacks (list|tuple): funkcje przyjmujące słownik zdarzenia, wywoływane przy każdym zdarzeniu.
+
+        """
+
+        self.callbacks = list(callbacks)
+        self.events = []
+        self.counters = {}
+
+    def __enter__(self):
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _profilers.remove(self)
+        self.emit({'event': 'counters', 'counters': dict(self.counters)})
+
+    def emit(self, event):
+        """ Zapisuje zdarzenie i przekazuje je wszystkim funkcjom callbacks. """
+
+        self.events.append(event)
+        for callback in self.callbacks:
+            callback(event)
+
+    def summary(self):
+        """ Zwraca podsumowanie zebranych zdarzeń.
+
+        Returns:
+            dict: {'phases': {faza: {'calls', 'elapsed_s', 'items'}}, 'counters': {licznik: wartość}}.
+
+        """
+
+        phases = {}
+        for event in self.events:
+            if event['event'] == 'phase_end':
+                phase = phases.setdefault(event['phase'], {'calls': 0, 'elapsed_s': 0.0, 'items': 0})
+                phase['calls'] += 1
+                phase['elapsed_s'] += event['elapsed_s']
+                phase['items'] += event['items']
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def export(self, path):
+        """ Zapisuje wszystkie zdarzenia do pliku w formacie JSON Lines (jedno zdarzenie w wierszu). """
+
+        with open(path, 'w', encoding='utf-8') as file:
+            for event in self.events:
+                file.write(json.dumps(event) + '\n')
+
+
+class Phase:
+    """ Mierzona faza symulacji (zwracana przez phase()); advance() zgłasza postęp. """
+
+    __slots__ = ('name', 'total', 'items', 'start', 'profilers')
+
+    def __init__(self, name, total, profilers):
+        self.name = name
+        self.total = total
+        self.items = 0
+        self.profilers = profilers
+
+    def __enter__(self):
+        self.start = perf_counter()
+        for profiler in self.profilers:
+            profiler.emit({'event': 'phase_start', 'phase': self.name, 'time': time(), 'total': self.total})
+        return self
+
+    def __exit__(self, *exc_info):
+        event = {'event': 'phase_end', 'phase': self.name, 'elapsed_s': perf_counter() - self.start,
+                 'items': self.items}
+        for profiler in self.profilers:
+            profiler.emit(dict(event))
+
+    def advance(self, items=1):
+        """ Zgłasza wykonanie kolejnych elementów fazy (np. warstwy basenu). """
+
+        self.items += items
+        elapsed = perf_counter() - self.start
+        eta = None
+        if self.total:
+            eta = elapsed / self.items * (self.total - self.items) if self.items else None
+        event = {'event': 'progress', 'phase': self.name, 'done': self.items, 'total': self.total,
+                 'elapsed_s': elapsed, 'eta_s': eta}
+        for profiler in self.profilers:
+            profiler.emit(dict(event))
+
+
+class _QuietPhase:
+    """ Faza zwracana przez phase(), gdy żaden profiler nie jest aktywny - nic nie mierzy. """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def advance(self, items=1):
+        pass
+
+
+_QUIET_PHASE = _QuietPhase()
+
+
+def phase(name, total=None):
+    """ Zwraca kontekst mierzący fazę symulacji we wszystkich aktywnych profilerach.
+
+    Args:
+        name (str): nazwa fazy (PHASES).
+        total (int|None): oczekiwana liczba elementów fazy (do wyznaczenia ETA).
+
+    Returns:
+        Phase|_QuietPhase: kontekst z metodą advance(); bez aktywnych profilerów - kontekst, który nic nie robi.
+
+    """
+
+    if not _profilers:
+        return _QUIET_PHASE
+    return Phase(name, total, list(_profilers))
+
+
+def count(name, value=1):
+    """ Zwiększa licznik (COUNTERS) we wszystkich aktywnych profilerach; bez aktywnych profilerów nic nie robi. """
+
+    for profiler in _profilers:
+        profiler.counters[name] = profiler.counters.get(name, 0) + value
+
+
+def active():
+    """ Zwraca True, jeżeli jakiś profiler jest aktywny. """
+
+    return bool(_profilers)
+
+
+class ConsoleReporter:
+    """ Funkcja zdarzeń profilera, wypisująca postęp faz w czytelnej postaci (np. na stderr). """
+
+    def __init__(self, stream=None):
+        """ Inicjalizacja.
+
+        Args:
+            stream (file|None): strumień wyjściowy; jeżeli None - sys.stderr.
+
+        """
+
+        self.stream = stream
+
+    def __call__(self, event):
+        stream = self.stream or sys.stderr
+        if event['event'] == 'phase_start':
+            print(event['phase'] + '...', file=stream)
+        elif event['event'] == 'progress':
+            line = '\t{} {}'.format(event['phase'], event['done'])
+            if event['total']:
+                line += '/{} ({:.0f}%)'.format(event['total'], 100 * event['done'] / event['total'])
+            if event['eta_s'] is not None:
+                line += ', ETA {:.1f} s'.format(event['eta_s'])
+            print(line, file=stream)
+        elif event['event'] == 'phase_end':
+            print('{}: {:.3f} s, {} items'.format(event['phase'], event['elapsed_s'], event['items']), file=stream)
+        elif event['event'] == 'counters' and event['counters']:
+            print(', '.join('{}: {}'.format(name, value) for name, value in sorted(event['counters'].items())),
+                  file=stream)
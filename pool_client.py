@@ -0,0 +1,109 @@
+#  Klient lokalnej usługi zapytań o baseny (pool_service.py). Przykład:
+#       with PoolClient(socket_path='/tmp/pools.sock') as client:
+#           pool = {'heightmap': 'Heightmaps/heightmap15.jpg', 'source': [3, 4]}
+#           client.intensity(pool, [[0, 0, 60], [14, 14, 60]])
+#           client.routes(pool, [[0, 0, 60]])
+#  Klient nie importuje classes.py - wystarczy mu biblioteka standardowa i NumPy.
+
+import json
+import socket
+import numpy as np
+
+
+class PoolClient:
+    """ Synchroniczny klient usługi zapytań o baseny: jedno połączenie, żądania wysyłane po kolei.
+
+    Attributes:
+        timeout (float|None): limit czasu oczekiwania na odpowiedź w sekundach (None - bez limitu; pierwsze zapytanie
+            o basen czeka na jego budowę).
+
+    """
+
+    def __init__(self, socket_path=None, host='127.0.0.1', port=8765, timeout=None):
+        """ Inicjalizacja klienta i połączenie z usługą.
+
+        Args:
+            socket_path (str|None): ścieżka gniazda Unix usługi; jeżeli None - połączenie TCP z host:port.
+            host (str): adres usługi TCP.
+            port (int): port usługi TCP.
+            timeout (float|None): limit czasu oczekiwania na odpowiedź w sekundach.
+
+        """
+
+        if socket_path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socket_path)
+        else:
+            self._socket = socket.create_connection((host, port))
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.timeout = timeout
+        self._socket.settimeout(timeout)
+        self._file = self._socket.makefile('rwb')
+        self._next_id = 0
+
+    def request(self, op, **parameters):
+        """ Wysyła żądanie i czeka na odpowiedź.
+
+        Args:
+            op (str): nazwa operacji (patrz pool_service.py).
+            **parameters: parametry operacji.
+
+        Returns:
+            wynik operacji ('result' odpowiedzi).
+
+        Raises:
+            RuntimeError: jeżeli usługa zwróciła błąd.
+
+        """
+
+        self._next_id += 1
+        self._file.write(json.dumps(dict(parameters, id=self._next_id, op=op)).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('The pool service closed the connection')
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def build(self, pool):
+        """ Buduje basen (albo znajduje go w pamięci usługi) i zwraca jego wymiary, źródło dźwięku i pełny opis. """
+
+        return self.request('build', pool=pool)
+
+    def intensity(self, pool, points):
+        """ Zwraca listę natężeń dźwięku w punktach [[x, y, z], ...] (None - niezdefiniowane). """
+
+        return self.request('intensity', pool=pool, points=[[int(value) for value in point] for point in points])
+
+    def routes(self, pool, starts, max_steps=None):
+        """ Zwraca drogi łodzi podwodnych (listy punktów [x, y, z], jak Submarine().move(True)) z kolejnych punktów
+        startowych [x, y] albo [x, y, z]; None dla łodzi, które nigdy nie "dopłyną". """
+
+        return self.request('routes', pool=pool, starts=[[int(value) for value in start] for start in starts],
+                            max_steps=max_steps)
+
+    def field_slice(self, pool, axis='z', index=0):
+        """ Zwraca przekrój pola natężeń dźwięku prostopadły do osi axis ('z', 'y' albo 'x') jako tablicę float64
+        (NaN - niezdefiniowane). """
+
+        values = self.request('slice', pool=pool, axis=axis, index=int(index))
+        return np.array([[np.nan if value is None else value for value in row] for row in values], dtype=np.float64)
+
+    def stats(self):
+        """ Zwraca opisy basenów w pamięci usługi, liczbę trafień i chybień. """
+
+        return self.request('stats')
+
+    def close(self):
+        """ Zamyka połączenie. """
+
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,358 @@
+#  Lokalna usługa zapytań o baseny: długo działający serwer asyncio trzyma w pamięci ograniczoną liczbę gotowych
+#  basenów (LRU) i odpowiada na pytania o natężenie dźwięku, drogi łodzi podwodnych i przekroje pola bez budowania
+#  basenu od nowa. Uruchomienie:
+#       python pool_service.py [--socket ścieżka | --port N] [--max-pools N] [--workers N] [--directory katalog]
+#  Klient: pool_client.py (PoolClient).
+#
+#  Protokół: każde żądanie i każda odpowiedź to jeden wiersz JSON. Żądanie: {"id": ..., "op": ..., parametry},
+#  odpowiedź: {"id": ..., "result": ...} albo {"id": ..., "error": opis}. Operacje:
+#       build      {"pool": opis}                                    buduje basen (albo znajduje go w pamięci)
+#       intensity  {"pool": opis, "points": [[x, y, z], ...]}        natężenia dźwięku (null - niezdefiniowane)
+#       routes     {"pool": opis, "starts": [[x, y(, z)], ...],      drogi łodzi podwodnych (jak Submarine().move(True));
+#                   "max_steps": N|null}                             null dla łodzi, które nigdy nie "dopłyną"
+#       slice      {"pool": opis, "axis": "z"|"y"|"x", "index": N}   przekrój pola natężeń (null - niezdefiniowane)
+#       stats      {}                                                baseny w pamięci, trafienia, chybienia
+#  Opis basenu ("pool") to słownik z kluczami jak w scenariuszu batch.py: heightmap, height (domyślnie maksymalna
+#  wysokość terenu + 1), storage, engine, enhanced_realism, downsample, sound_intensity, source, line_of_sight i seed
+#  (ziarno losowania współrzędnych źródła, domyślnie 0). Ten sam opis zawsze wskazuje ten sam basen.
+#
+#  Budowa basenu (źródło dźwięku, pole natężeń, tablica kolejnych kroków) odbywa się w puli procesów; proces poboczny
+#  zapisuje basen jako migawkę (Pool().save()), a serwer mapuje ją do pamięci (Pool.load()), więc basenu nie trzeba
+#  przesyłać między procesami. Zapytania do basenów w pamięci to odczyty tablic, bez obliczeń.
+
+import os
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+SPEC_DEFAULTS = {'height': None,
+                 'storage': 'arrays',
+                 'engine': 'wavefront',
+                 'enhanced_realism': True,
+                 'downsample': 1,
+                 'sound_intensity': 1000,
+                 'source': None,
+                 'line_of_sight': False,
+                 'seed': 0}
+AXES = {'z': 0, 'y': 1, 'x': 2}
+
+
+def normalise_spec(spec):
+    """ Uzupełnia opis basenu wartościami domyślnymi i wyznacza jego klucz.
+
+    Args:
+        spec (dict): opis basenu (patrz nagłówek modułu).
+
+    Returns:
+        tuple: (pełny opis basenu, klucz - szesnastkowy skrót SHA-256 opisu i czasu modyfikacji mapy wysokości).
+
+    Raises:
+        ValueError: jeżeli opis nie podaje mapy wysokości albo zawiera nieznane klucze.
+
+    """
+
+    assert 'heightmap' in spec, ValueError('The pool description must define heightmap.')
+    unknown = set(spec) - set(SPEC_DEFAULTS) - {'heightmap'}
+    assert not unknown, ValueError('Unknown pool description keys: ' + ', '.join(sorted(unknown)))
+    # wynik zapamiętuje się dla pary (opis, czas modyfikacji mapy wysokości) - kolejne zapytania o ten sam basen
+    # nie wczytują mapy wysokości ani nie liczą skrótu od nowa
+    mtime_ns = os.stat(os.path.abspath(spec['heightmap'])).st_mtime_ns
+    return _normalise_spec(json.dumps(spec, sort_keys=True), mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _normalise_spec(description, mtime_ns):
+    """ Wyznacza pełny opis basenu i jego klucz z opisu zapisanego jako JSON (patrz normalise_spec()). """
+
+    spec = dict(SPEC_DEFAULTS, **json.loads(description))
+    spec['heightmap'] = os.path.abspath(spec['heightmap'])
+    if spec['height'] is None:
+        from heightmap_loader import get_max_height
+        spec['height'] = get_max_height(spec['heightmap']) + 1
+    described = dict(spec, mtime_ns=mtime_ns)  # zmieniona mapa wysokości - nowy klucz
+    return spec, hashlib.sha256(json.dumps(described, sort_keys=True).encode()).hexdigest()
+
+
+def _build_snapshot(spec, path):
+    """ Buduje basen według opisu i zapisuje go jako migawkę (wywoływane w procesie pobocznym).
+
+    Args:
+        spec (dict): pełny opis basenu (normalise_spec()).
+        path (str): ścieżka pliku migawki; jeżeli plik istnieje, basen się nie buduje.
+
+    Returns:
+        str: ścieżka pliku migawki.
+
+    """
+
+    if os.path.exists(path):
+        return path  # basen zbudowany przy poprzednim uruchomieniu usługi z tym samym katalogiem
+    from classes import Pool
+
+    random.seed(spec['seed'])  # losowe współrzędne źródła są powtarzalne
+    pool = Pool(spec['height'], spec['heightmap'], storage=spec['storage'])
+    pool.add_sound_source(spec['sound_intensity'], *(spec['source'] or [None, None, None]),
+                          enhanced_realism=spec['enhanced_realism'], engine=spec['engine'],
+                          downsample=spec['downsample'], line_of_sight=spec['line_of_sight'])
+    pool.build_flow_field()  # drogi łodzi to później odczyt z tablicy (Pool().trace())
+    pool.save(path)
+    return path
+
+
+def _jsonable(values):
+    """ Zamienia tablicę natężeń na zagnieżdżone listy, w których niezdefiniowane natężenia (NaN) to None. """
+
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def _trace_routes(pool, starts, max_steps):
+    """ Odczytuje drogi łodzi podwodnych z tablicy kolejnych kroków basenu (operacja 'routes' usługi). """
+
+    from classes import Submarine
+
+    routes = []
+    for start in starts:
+        submarine = Submarine(pool, *start)  # brakujące z wyznacza się tak jak w Submarine()
+        position = (submarine.x_position, submarine.y_position, submarine.z_position)
+        if pool.steps_to_source(*position) < 0:
+            routes.append(None)
+            continue
+        route = pool.trace(*position)
+        routes.append([list(step) for step in (route if max_steps is None else route[:max_steps + 1])])
+    return routes
+
+
+def _check_points(pool, points):
+    """ Sprawdza, czy punkty (tablica (N, 3) współrzędnych x, y, z) leżą w basenie - ujemne indeksy NumPy
+    wskazywałyby po cichu sześciany z drugiego końca basenu. """
+
+    shape = np.array([pool.length, pool.width, pool.height])
+    outside = ((points < 0) | (points >= shape)).any(axis=1)
+    assert not outside.any(), ValueError('Point {} lies outside the pool (length, width, height = {})'.format(
+        points[np.argmax(outside)].tolist(), shape.tolist()))
+
+
+class PoolService:
+    """ Usługa zapytań o baseny trzymane w pamięci.
+
+    Attributes:
+        max_pools (int): maksymalna liczba basenów w pamięci; przy przekroczeniu usuwa się najdawniej używany (LRU).
+        directory (str): katalog migawek zbudowanych basenów.
+        pools (collections.OrderedDict): baseny w pamięci według kluczy (od najdawniej do najświeżej używanego).
+        hits (int): liczba zapytań do basenów, które były już w pamięci.
+        misses (int): liczba zapytań, które wymagały wczytania lub budowy basenu.
+
+    """
+
+    def __init__(self, max_pools=4, workers=None, directory=None):
+        """ Inicjalizacja usługi.
+
+        Args:
+            max_pools (int): maksymalna liczba basenów w pamięci (co najmniej 1).
+            workers (int|None): liczba procesów budujących baseny; None - liczba procesorów.
+            directory (str|None): katalog migawek; jeżeli None - katalog tymczasowy, usuwany przy zamknięciu usługi.
+                Podany katalog przetrwa zamknięcie usługi, a zbudowane baseny wczytają się przy kolejnym uruchomieniu.
+
+        Raises:
+            ValueError: jeżeli max_pools jest mniejsze od 1.
+
+        """
+
+        assert max_pools >= 1, ValueError('The max_pools parameter must be at least 1.')
+        self.max_pools = max_pools
+        self._temporary = None
+        if directory is None:
+            from tempfile import TemporaryDirectory
+            self._temporary = TemporaryDirectory(prefix='pool_service_')
+            directory = self._temporary.name
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pools = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}  # klucz: zadanie wczytania basenu - równoczesne zapytania o ten sam basen budują go raz
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    async def pool(self, spec):
+        """ Zwraca basen według opisu: z pamięci albo (przy pierwszym zapytaniu) zbudowany w procesie pobocznym.
+
+        Args:
+            spec (dict): opis basenu.
+
+        Returns:
+            Pool: basen w trybie 'arrays' z polem natężeń i tablicą kolejnych kroków.
+
+        """
+
+        spec, key = normalise_spec(spec)
+        pool = self.pools.get(key)
+        if pool is not None:
+            self.hits += 1
+            self.pools.move_to_end(key)
+            return pool
+        self.misses += 1
+        if key not in self._pending:
+            self._pending[key] = asyncio.ensure_future(self._load(spec, key))
+        try:
+            return await asyncio.shield(self._pending[key])
+        finally:
+            if self._pending.get(key) is not None and self._pending[key].done():
+                del self._pending[key]
+
+    async def _load(self, spec, key):
+        """ Buduje basen w procesie pobocznym, mapuje jego migawkę do pamięci i dodaje go do LRU. """
+
+        from classes import Pool
+
+        path = os.path.join(self.directory, key + '.pool')
+        path = await asyncio.get_running_loop().run_in_executor(self._executor, _build_snapshot, spec, path)
+        pool = Pool.load(path)
+        pool.service_spec = spec
+        self.pools[key] = pool
+        while len(self.pools) > self.max_pools:
+            self.pools.popitem(last=False)
+        return pool
+
+    async def build(self, pool):
+        """ Operacja 'build': wymiary basenu, współrzędne źródła dźwięku i pełny opis basenu. """
+
+        pool = await self.pool(pool)
+        source = pool.sound_source
+        return {'shape': [pool.height, pool.width, pool.length],
+                'sound_source': [source.x_position, source.y_position, source.z_position],
+                'spec': pool.service_spec}
+
+    async def intensity(self, pool, points):
+        """ Operacja 'intensity': natężenia dźwięku w punktach [[x, y, z], ...] (None - niezdefiniowane). """
+
+        pool = await self.pool(pool)
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 3)
+        _check_points(pool, points)
+        return _jsonable(pool.sound_intensity[points[:, 2], points[:, 1], points[:, 0]])
+
+    async def routes(self, pool, starts, max_steps=None):
+        """ Operacja 'routes': drogi łodzi podwodnych z kolejnych punktów startowych, co najwyżej max_steps ruchów
+        (None dla łodzi, które nigdy nie "dopłyną"). """
+
+        pool = await self.pool(pool)
+        assert all(len(start) in (2, 3) for start in starts), ValueError('A start must be [x, y] or [x, y, z]')
+        _check_points(pool, np.array([list(start) + [0] * (3 - len(start)) for start in starts],
+                                     dtype=np.int64).reshape(-1, 3))
+        # odczyt dróg z tablicy kolejnych kroków trwa tym dłużej, im więcej jest łodzi, więc wykonuje się w wątku
+        # pobocznym, żeby nie zatrzymywać obsługi innych połączeń (basen jest tylko czytany)
+        return await asyncio.get_running_loop().run_in_executor(None, _trace_routes, pool, starts, max_steps)
+
+    async def slice(self, pool, axis, index):
+        """ Operacja 'slice': przekrój pola natężeń dźwięku prostopadły do osi axis ('z', 'y' albo 'x'). """
+
+        assert axis in AXES, ValueError('The axis parameter must be one of ' + str(tuple(AXES)))
+        pool = await self.pool(pool)
+        size = pool.sound_intensity.shape[AXES[axis]]
+        assert 0 <= index < size, ValueError('Slice index {} out of range [0; {})'.format(index, size))
+        return _jsonable(np.take(pool.sound_intensity, index, axis=AXES[axis]))
+
+    async def stats(self):
+        """ Operacja 'stats': opisy basenów w pamięci (od najdawniej używanego), trafienia i chybienia. """
+
+        return {'pools': [pool.service_spec for pool in self.pools.values()],
+                'max_pools': self.max_pools,
+                'hits': self.hits,
+                'misses': self.misses,
+                'pending': len(self._pending)}
+
+    async def handle(self, request):
+        """ Wykonuje jedno żądanie.
+
+        Args:
+            request (dict): żądanie {'id': ..., 'op': ..., parametry}.
+
+        Returns:
+            dict: odpowiedź {'id': ..., 'result': ...} albo {'id': ..., 'error': opis}.
+
+        """
+
+        response = {'id': request.get('id')}
+        operations = {'build': self.build, 'intensity': self.intensity, 'routes': self.routes, 'slice': self.slice,
+                      'stats': self.stats}
+        try:
+            parameters = {key: value for key, value in request.items() if key not in ('id', 'op')}
+            operation = operations.get(request.get('op'))
+            assert operation is not None, ValueError('Unknown operation: ' + str(request.get('op')))
+            response['result'] = await operation(**parameters)
+        except Exception as error:
+            if isinstance(error, AssertionError) and error.args and isinstance(error.args[0], Exception):
+                error = error.args[0]  # walidacja w stylu assert warunek, ValueError(...) - zgłaszam właściwy błąd
+            response['error'] = '{}: {}'.format(type(error).__name__, error)
+        return response
+
+    async def _connection(self, reader, writer):
+        """ Obsługuje jedno połączenie: kolejne wiersze JSON to kolejne żądania. """
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle(json.loads(line))
+                except ValueError as error:
+                    response = {'id': None, 'error': 'ValueError: ' + str(error)}  # wiersz nie jest poprawnym JSON
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=None, host='127.0.0.1', port=0):
+        """ Uruchamia serwer i obsługuje połączenia aż do przerwania.
+
+        Args:
+            socket_path (str|None): ścieżka gniazda Unix; jeżeli None - serwer TCP na host:port.
+            host (str): adres serwera TCP.
+            port (int): port serwera TCP (0 - dowolny wolny port).
+
+        """
+
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self._connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self._connection, host, port)
+        for sock in server.sockets:
+            print('listening on', sock.getsockname(), flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """ Zamyka pulę procesów i usuwa katalog tymczasowy migawek. """
+
+        self.pools.clear()
+        self._executor.shutdown(cancel_futures=True)
+        if self._temporary is not None:
+            self._temporary.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lokalna usługa zapytań o baseny trzymane w pamięci.')
+    parser.add_argument('--socket', default=None, help='ścieżka gniazda Unix (domyślnie serwer TCP)')
+    parser.add_argument('--host', default='127.0.0.1', help='adres serwera TCP')
+    parser.add_argument('--port', type=int, default=8765, help='port serwera TCP')
+    parser.add_argument('--max-pools', type=int, default=4, help='maksymalna liczba basenów w pamięci')
+    parser.add_argument('--workers', type=int, default=None, help='liczba procesów budujących baseny')
+    parser.add_argument('--directory', default=None, help='katalog migawek zbudowanych basenów')
+    args = parser.parse_args()
+
+    service = PoolService(args.max_pools, args.workers, args.directory)
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,95 @@
+#  Binarny format migawek basenu (Pool().save() / Pool.load()). Plik składa się z:
+#       8 bajtów        sygnatura MAGIC
+#       uint32 (LE)     wersja formatu (FORMAT_VERSION)
+#       uint32 (LE)     długość nagłówka w bajtach
+#       nagłówek        JSON (UTF-8): {'arrays': {nazwa: {'dtype', 'shape', 'offset'}}, 'metadata': {...}}
+#       tablice         dane tablic w porządku C, każda od przesunięcia podzielnego przez ALIGNMENT
+#  Dzięki wyrównaniu i stałemu porządkowi danych tablice można zmapować do pamięci bez kopiowania (numpy.memmap).
+
+import os
+import json
+import struct
+import numpy as np
+
+MAGIC = b'WESPOOL\n'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = struct.Struct('<8sII')
+
+
+def _aligned(offset):
+    """ Zaokrągla przesunięcie w górę do wielokrotności ALIGNMENT. """
+
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path, arrays, metadata):
+    """ Zapisuje tablice i opis stanu do pliku migawki.
+
+    Args:
+        path (str): ścieżka pliku migawki.
+        arrays (dict): tablice według nazw (numpy.ndarray albo obiekty z metodą __array__).
+        metadata (dict): opis stanu, który da się zapisać jako JSON.
+
+    """
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # przesunięcia tablic zależą od długości nagłówka, a nagłówek - od przesunięć, dlatego nagłówek ma zapas
+    # miejsca, dopełniany spacjami
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'arrays': layout, 'metadata': metadata}).encode()
+    data_start = _aligned(_PREFIX.size + len(header) + 16 * len(layout) + 256)
+    for entry in layout.values():
+        entry['offset'] += data_start
+    header = json.dumps({'arrays': layout, 'metadata': metadata}).encode()
+    assert _PREFIX.size + len(header) <= data_start
+    header = header.ljust(data_start - _PREFIX.size, b' ')
+
+    temporary_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(layout[name]['offset'])
+            file.write(array.tobytes())
+    os.replace(temporary_path, path)  # zapis atomowy - inne procesy nigdy nie zobaczą niepełnego pliku
+
+
+def read_snapshot(path, mmap=True):
+    """ Wczytuje plik migawki.
+
+    Args:
+        path (str): ścieżka pliku migawki.
+        mmap (bool): jeżeli True - tablice mapują się do pamięci bez kopiowania, w trybie kopiowania przy zapisie
+            (zmiany tablic nie trafiają do pliku); w przeciwnym przypadku wczytują się do pamięci operacyjnej.
+
+    Returns:
+        tuple: (arrays, metadata) - tablice według nazw i opis stanu.
+
+    Raises:
+        ValueError: jeżeli plik nie jest migawką basenu albo ma nieobsługiwaną wersję formatu.
+
+    """
+
+    with open(path, 'rb') as file:
+        magic, version, header_length = _PREFIX.unpack(file.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(path + ' is not a pool snapshot')
+        if version > FORMAT_VERSION:
+            raise ValueError('Unsupported pool snapshot version {} (supported: {})'.format(version, FORMAT_VERSION))
+        header = json.loads(file.read(header_length))
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype, shape = np.dtype(entry['dtype']), tuple(entry['shape'])
+        if mmap and int(np.prod(shape)) > 0:
+            arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=entry['offset'], shape=shape)
+        else:
+            arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=entry['offset']).reshape(shape)
+    return arrays, header['metadata']
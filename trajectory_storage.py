@@ -0,0 +1,351 @@
+#  Zwarty format zapisu dróg łodzi podwodnych. Każdy ruch łodzi prowadzi do jednego z 26 sąsiednich sześcianów,
+#  więc drogę wystarczy zapisać jako punkt początkowy i jeden bajt na ruch - indeks przesunięcia w NEIGHBOUR_OFFSETS
+#  (ta sama kolejność co tablica change w Pool().__init__()). Plik składa się z:
+#       8 bajtów        sygnatura MAGIC
+#       uint32 (LE)     wersja formatu (FORMAT_VERSION)
+#       partie          dopisywane jedna za drugą; każda partia to:
+#           uint32 (LE)     liczba dróg w partii
+#           uint64 (LE)     łączna liczba ruchów dróg partii
+#           tablica dróg    dla każdej drogi: int32 x, y, z punktu początkowego i uint32 liczba ruchów (RECORD)
+#           ruchy           kody ruchów (uint8) kolejnych dróg, bez przerw
+#  Drogi dopisuje się partiami (TrajectoryWriter), a czyta w dowolnej kolejności (TrajectoryReader) - ruchy są
+#  mapowane do pamięci, więc w pamięci operacyjnej trzyma się tylko tablica dróg (16 bajtów na drogę).
+
+import os
+import struct
+from itertools import islice
+import numpy as np
+from classes import NEIGHBOUR_OFFSETS
+
+MAGIC = b'WESTRAJ\n'
+FORMAT_VERSION = 1
+RECORD = np.dtype([('start', '<i4', (3,)), ('steps', '<u4')])
+_PREFIX = struct.Struct('<8sI')
+_CHUNK = struct.Struct('<IQ')
+
+# przesunięcia (dx, dy, dz) według kodów ruchów i kody ruchów według przesunięć (255 - to nie jest ruch do sąsiada)
+OFFSETS = np.array(NEIGHBOUR_OFFSETS, dtype=np.int64)
+_CODES = np.full((3, 3, 3), 255, dtype=np.uint8)
+_CODES[tuple((OFFSETS + 1).T)] = np.arange(len(OFFSETS))
+
+
+def _batches(iterator, size=65536):
+    """ Generator tablic (N, 3) kolejnych punktów iteratora, po co najwyżej size punktów. """
+
+    while True:
+        part = np.array(list(islice(iterator, size)), dtype=np.int64).reshape(-1, 3)
+        if not len(part):
+            return
+        yield part
+
+
+def encode_steps(positions):
+    """ Zamienia drogę na punkt początkowy i kody ruchów.
+
+    Args:
+        positions: kolejne punkty (x, y, z) drogi - tablica (N, 3), lista albo dowolny iterator, np. generator
+            Submarine().steps(); iterator jest czytany partiami, więc cała droga nigdy nie trafia do pamięci
+            jako lista krotek.
+
+    Returns:
+        tuple: (start, codes) - punkt początkowy (x, y, z) albo None dla pustej drogi i tablica uint8 kodów ruchów.
+
+    Raises:
+        ValueError: jeżeli dwa kolejne punkty drogi nie są sąsiednimi sześcianami.
+
+    """
+
+    if isinstance(positions, np.ndarray):
+        positions = positions.reshape(-1, 3).astype(np.int64)
+        if not len(positions):
+            return None, np.zeros(0, dtype=np.uint8)
+        first, parts = positions[0], [positions[1:]]
+    else:
+        iterator = iter(positions)
+        first = next(iterator, None)
+        if first is None:
+            return None, np.zeros(0, dtype=np.uint8)
+        parts = _batches(iterator)
+
+    start = tuple(int(value) for value in first)
+    previous = np.array([start], dtype=np.int64)
+    codes = []
+    for part in parts:
+        deltas = np.diff(np.concatenate([previous, part]), axis=0)
+        previous = part[-1:]
+        if deltas.size and np.abs(deltas).max() > 1:
+            raise ValueError('Consecutive trajectory positions must be neighbouring cubic metres')
+        part_codes = _CODES[tuple((deltas + 1).T)]
+        if (part_codes == 255).any():
+            raise ValueError('Consecutive trajectory positions must be neighbouring cubic metres')
+        codes.append(part_codes)
+    return start, np.concatenate(codes) if codes else np.zeros(0, dtype=np.uint8)
+
+
+def decode_steps(start, codes):
+    """ Odtwarza punkty drogi z punktu początkowego i kodów ruchów.
+
+    Args:
+        start (tuple|numpy.ndarray): punkt początkowy (x, y, z).
+        codes (numpy.ndarray): kody ruchów (uint8).
+
+    Returns:
+        numpy.ndarray: tablica int64 (len(codes) + 1, 3) kolejnych punktów drogi, łącznie z początkowym.
+
+    """
+
+    positions = np.empty((len(codes) + 1, 3), dtype=np.int64)
+    positions[0] = start
+    np.cumsum(OFFSETS[np.asarray(codes)], axis=0, out=positions[1:])
+    positions[1:] += positions[0]
+    return positions
+
+
+def _scan(file, path):
+    """ Czyta nagłówki partii pliku dróg.
+
+    Returns:
+        tuple: (records, offsets, end) - tablica RECORD wszystkich dróg, przesunięcia (w bajtach od początku pliku)
+            ich pierwszych ruchów i koniec ostatniej pełnej partii (niepełną partię, np. po przerwanym zapisie,
+            się pomija).
+
+    Raises:
+        ValueError: jeżeli plik nie jest plikiem dróg albo ma nieobsługiwaną wersję formatu.
+
+    """
+
+    prefix = file.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size or _PREFIX.unpack(prefix)[0] != MAGIC:
+        raise ValueError(path + ' is not a trajectory file')
+    version = _PREFIX.unpack(prefix)[1]
+    if version > FORMAT_VERSION:
+        raise ValueError('Unsupported trajectory file version {} (supported: {})'.format(version, FORMAT_VERSION))
+
+    size = os.fstat(file.fileno()).st_size
+    records, offsets = [], []
+    end = _PREFIX.size
+    while end + _CHUNK.size <= size:
+        count, steps = _CHUNK.unpack(file.read(_CHUNK.size))
+        data_start = end + _CHUNK.size + count * RECORD.itemsize
+        if data_start + steps > size:
+            break
+        chunk = np.frombuffer(file.read(count * RECORD.itemsize), dtype=RECORD)
+        records.append(chunk)
+        offsets.append(data_start + np.concatenate([[0], np.cumsum(chunk['steps'], dtype=np.int64)[:-1]]))
+        end = data_start + steps
+        file.seek(end)
+    if not records:
+        return np.zeros(0, dtype=RECORD), np.zeros(0, dtype=np.int64), end
+    return np.concatenate(records), np.concatenate(offsets).astype(np.int64), end
+
+
+class TrajectoryWriter:
+    """ Dopisuje drogi łodzi podwodnych do pliku dróg, partiami po chunk_size dróg.
+
+    Przykład:
+        with TrajectoryWriter('routes.traj') as writer:
+            writer.add(Submarine(pool).steps(True))
+
+    Attributes:
+        path (str): ścieżka pliku dróg.
+        chunk_size (int): liczba dróg w jednej partii.
+        count (int): liczba dróg w pliku, łącznie z jeszcze niezapisanymi.
+
+    """
+
+    def __init__(self, path, chunk_size=4096, append=True):
+        """ Inicjalizacja i otwarcie pliku.
+
+        Args:
+            path (str): ścieżka pliku dróg.
+            chunk_size (int): liczba dróg w jednej partii.
+            append (bool): jeżeli True i plik istnieje - nowe drogi dopisują się za istniejącymi; w przeciwnym
+                przypadku plik tworzy się od nowa.
+
+        """
+
+        assert chunk_size >= 1, ValueError('Parameter "chunk_size" must be greater integer than 0.')
+        self.path = path
+        self.chunk_size = chunk_size
+        self._records = []
+        self._codes = []
+        if append and os.path.exists(path):
+            self._file = open(path, 'r+b')
+            records, _, end = _scan(self._file, path)
+            self._file.truncate(end)  # pomijam niepełną ostatnią partię
+            self._file.seek(end)
+            self.count = len(records)
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_PREFIX.pack(MAGIC, FORMAT_VERSION))
+            self.count = 0
+
+    def add(self, positions):
+        """ Dodaje drogę (patrz encode_steps()).
+
+        Args:
+            positions: kolejne punkty (x, y, z) drogi, np. wynik Submarine().move() albo generator
+                Submarine().steps().
+
+        Returns:
+            int: numer drogi w pliku.
+
+        Raises:
+            ValueError: jeżeli droga jest pusta albo dwa kolejne punkty drogi nie są sąsiednimi sześcianami.
+
+        """
+
+        start, codes = encode_steps(positions)
+        if start is None:
+            raise ValueError('Trajectory must contain at least one position')
+        self._records.append((start, len(codes)))
+        self._codes.append(codes)
+        self.count += 1
+        if len(self._records) >= self.chunk_size:
+            self.flush()
+        return self.count - 1
+
+    def add_fleet(self, trajectories, arrival_steps=None):
+        """ Dodaje drogi wszystkich łodzi floty (wynik Fleet().move()).
+
+        Args:
+            trajectories (numpy.ndarray): tablica (T, N, 3) współrzędnych łodzi w kolejnych krokach.
+            arrival_steps (numpy.ndarray|None): liczba ruchów każdej łodzi do dopłynięcia (-1 - nie dopłynęła);
+                drogę łodzi przycina się do chwili dopłynięcia. Jeżeli None - chwilę dopłynięcia wyznacza się
+                z samej trajektorii: po dopłynięciu łódź stoi w miejscu, więc drogę przycina się do ostatniego ruchu.
+
+        Returns:
+            range: numery dodanych dróg w pliku.
+
+        """
+
+        first = self.count
+        for boat in range(trajectories.shape[1]):
+            if arrival_steps is None:
+                moving = np.flatnonzero((trajectories[1:, boat] != trajectories[:-1, boat]).any(axis=1))
+                last = int(moving[-1]) + 1 if len(moving) else 0
+            elif arrival_steps[boat] >= 0:
+                last = int(arrival_steps[boat])
+            else:
+                last = len(trajectories) - 1
+            self.add(trajectories[:last + 1, boat])
+        return range(first, self.count)
+
+    def flush(self):
+        """ Zapisuje niezapisane drogi jako jedną partię. """
+
+        if not self._records:
+            return
+        records = np.empty(len(self._records), dtype=RECORD)
+        records['start'] = [start for start, _ in self._records]
+        records['steps'] = [steps for _, steps in self._records]
+        codes = np.concatenate(self._codes)
+        self._file.write(_CHUNK.pack(len(records), len(codes)))
+        self._file.write(records.tobytes())
+        self._file.write(codes.tobytes())
+        self._file.flush()
+        self._records, self._codes = [], []
+
+    def close(self):
+        """ Zapisuje niezapisane drogi i zamyka plik. """
+
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryReader:
+    """ Odczyt dróg z pliku dróg w dowolnej kolejności, bez wczytywania całego pliku: reader[i] odtwarza i-tą drogę
+    (tablica int64 (N, 3)), a positions(i) oddaje jej punkty po kolei.
+
+    Note:
+        Czytelnik widzi drogi zapisane w chwili otwarcia pliku.
+
+    Attributes:
+        path (str): ścieżka pliku dróg.
+        records (numpy.ndarray): tablica RECORD punktów początkowych i liczb ruchów wszystkich dróg.
+
+    """
+
+    def __init__(self, path):
+        """ Inicjalizacja i odczyt nagłówków partii.
+
+        Args:
+            path (str): ścieżka pliku dróg.
+
+        Raises:
+            ValueError: jeżeli plik nie jest plikiem dróg albo ma nieobsługiwaną wersję formatu.
+
+        """
+
+        self.path = path
+        with open(path, 'rb') as file:
+            self.records, self._offsets, end = _scan(file, path)
+        self._data = np.memmap(path, dtype=np.uint8, mode='r', shape=(end,))
+
+    def __len__(self):
+        return len(self.records)
+
+    def _index(self, index):
+        """ Sprawdza numer drogi i zamienia ujemny numer na nieujemny. """
+
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Trajectory index out of range')
+        return index
+
+    def start(self, index):
+        """ Zwraca punkt początkowy (x, y, z) drogi. """
+
+        return tuple(int(value) for value in self.records['start'][self._index(index)])
+
+    def codes(self, index):
+        """ Zwraca kody ruchów drogi (tablica uint8 zmapowana z pliku, bez kopiowania). """
+
+        index = self._index(index)
+        offset = self._offsets[index]
+        return self._data[offset:offset + self.records['steps'][index]]
+
+    def __getitem__(self, index):
+        return decode_steps(self.records['start'][self._index(index)], self.codes(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def positions(self, index, batch=4096):
+        """ Generator punktów drogi (krotek (x, y, z), jak Submarine().move()), odtwarzanych partiami po batch ruchów -
+        także bardzo długą drogę można odtworzyć bez wczytywania jej w całości.
+
+        Args:
+            index (int): numer drogi.
+            batch (int): liczba ruchów odtwarzanych naraz.
+
+        """
+
+        codes = self.codes(index)
+        position = np.array(self.records['start'][self._index(index)], dtype=np.int64)
+        yield tuple(int(value) for value in position)
+        for begin in range(0, len(codes), batch):
+            part = decode_steps(position, codes[begin:begin + batch])
+            position = part[-1]
+            yield from (tuple(point) for point in part[1:].tolist())
+
+    def close(self):
+        """ Zwalnia mapowanie pliku. """
+
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -9,27 +9,35 @@ Date 09.11.21
 #       ZOOM:                                               Scroll
 #       Pokazać kolejne położenie łodzi podwodnej:          Press Q (delay 0.15s)
 #       Tworzenie nowej łodzi podwodnej:                    Hold N for 0.5s (delay 0.5s) then press Q 1 time
+#       Pokazać/ukryć pole natężeń dźwięku:                 Press F (delay 0.3s)
 #  Uwaga: nowa łódź podwodna generuje się na losowych współrzędnych
 
 from ursina import *
 from classes import Pool
+from field_cache import FieldCache
+from instrumentation import Profiler, ConsoleReporter
 from functions_for_visualisation import *
 
 
 def update():
     # definiowanie łodzi podwodnej i wyznaczanie jej położeń w drodze do źródła dźwięku
-    add_new_submarine(pool, submarine_positions)
-    new_submarine_pos(submarine, submarine_positions, pool, z_scale)  # wyznaczanie położenia łodźi do wizualizacji
+    add_new_submarine(playback)  # droga nowej łodzi wyznacza się w wątku pobocznym
+    new_submarine_pos(submarine, playback, pool, z_scale)  # kolejne położenia łodzi z kolejki, w budżecie czasu klatki
     change_camera_pos()  # zarządzanie kamerą
+    toggle_field_mesh(field_mesh)  # pokazywanie i ukrywanie pola natężeń dźwięku
+    field_mesh.update()  # siatka pola buduje się od nowa tylko po zmianie natężeń
 
 
 heightmap = 'Heightmaps/heightmap_demonstration.jpg'  # ścieżka mapy wysokości
 z_scale = 1  # współczynnik skalowania wizualizacji pionowej osi
+max_height = get_max_height(heightmap)  # wysokość najwyższego punktu terenu
 
 # tworzenie wodnego środowiska, źródła dźwięku oraz łodzi podwodnej
-pool = Pool(get_max_height(heightmap) + 1, heightmap)  # basen jed o wysokości wyższej o 1 od maksymalnej wysokości terenu
-pool.add_sound_source(enhanced_realism=True)
-pool.add_submarine()
+with Profiler(callbacks=[ConsoleReporter()]):  # postęp budowy basenu i wyznaczania pola na konsoli
+    pool = Pool(max_height + 1, heightmap)  # basen jed o wysokości wyższej o 1 od maksymalnej wysokości terenu
+    pool.add_sound_source(enhanced_realism=True, cache=FieldCache())  # pole wczytuje się z dysku, jeżeli już je wyznaczono
+    pool.build_flow_field()  # ruchy kolejnych łodzi podwodnych to odczyty z gotowej tablicy kroków
+    pool.add_submarine()
 
 # wyciągam wymiary basenu
 length = pool.length
@@ -47,9 +55,9 @@ submarine_pos = (pool.submarine.x_position - length / 2,
 app = Ursina()
 window.color = color.white
 window.fullscreen = True
-camera.position = (get_max_height(heightmap) * 6 / 108 * z_scale,
-                   get_max_height(heightmap) * 33 / 108 * z_scale,
-                   - get_max_height(heightmap) * 207 / 108 * z_scale)  # początkowe położenie kamery zależy od wysokości basenu
+camera.position = (max_height * 6 / 108 * z_scale,
+                   max_height * 33 / 108 * z_scale,
+                   - max_height * 207 / 108 * z_scale)  # początkowe położenie kamery zależy od wysokości basenu
 
 # dodaję oświetlenie
 AmbientLight(color=(0.5, 0.5, 0.5, 1))
@@ -71,12 +79,15 @@ Entity(model='sphere', position=submarine_pos, color=color.green).add_script(Smo
                                                                                           offset=(0, 0, 0)))
 # imitacja wody - półprzezroczysty niebieski sześcian o wymiarach basenu
 Entity(model='cube', scale=(landschaft.scale[0],
-                            get_max_height(heightmap) * landschaft.scale[1] + 2,
+                            max_height * landschaft.scale[1] + 2,
                             landschaft.scale[2]),
-       color=color.blue, alpha=0.15, position=(0, get_max_height(heightmap) * landschaft.scale[1] / 2, 0))
+       color=color.blue, alpha=0.15, position=(0, max_height * landschaft.scale[1] / 2, 0))
+# pole natężeń dźwięku - co czwarta warstwa basenu jako jedna siatka z kolorami w wierzchołkach (ukryta na początku)
+field_mesh = FieldMesh(pool, z_scale, visible=False)
 
-# wyznaczanie wszystkich punktów, odwiedzonych przez pierwszą submarynę, w drodze do źródła dźwięku
-submarine_positions = pool.submarine.move(True)
+# wyznaczanie punktów, odwiedzonych przez pierwszą submarynę, w drodze do źródła dźwięku - w wątku pobocznym
+playback = RoutePlayback(pool)
+playback.request(pool.submarine.x_position, pool.submarine.y_position, pool.submarine.z_position)
 
 # mouse.visible = False
 EditorCamera()  # możliwość zarządzania kamerą myszką